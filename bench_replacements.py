@@ -0,0 +1,81 @@
+# bench_replacements.py
+# Caption replacement benchmark: the compiled one-pass Replacer
+# (core/caption.py) against the old loop of one str.replace per rule.
+#
+#   python bench_replacements.py                       # 100, 250, 500, 1000 rules
+#   python bench_replacements.py --rules 1000 --caption-kb 4 --runs 200
+
+import argparse
+import random
+import string
+import time
+from typing import Any, Dict, List
+
+from core.caption import Replacer
+
+
+def make_rules(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))))
+    return [{"from": w, "to": w.upper()} for w in sorted(words)]
+
+
+def make_caption(rules: List[Dict[str, Any]], size: int, rng: random.Random) -> str:
+    """About `size` chars of filler words with ~5% rule words mixed in."""
+    parts: List[str] = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.05:
+            word = rng.choice(rules)["from"]
+        else:
+            word = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+        parts.append(word)
+        length += len(word) + 1
+    return " ".join(parts)
+
+
+def replace_loop(text: str, rules: List[Dict[str, Any]]) -> str:
+    """Former process_caption step: K rules → K rewrites of the caption."""
+    for rule in rules:
+        if rule["from"]:
+            text = text.replace(rule["from"], rule["to"])
+    return text
+
+
+def timed(fn, runs: int) -> float:
+    """Mean microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark caption replacements")
+    parser.add_argument("--rules", type=int, nargs="+", default=[100, 250, 500, 1000])
+    parser.add_argument("--caption-kb", type=float, default=4.0)
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'rules':>6} {'compile ms':>11} {'loop us':>10} {'one-pass us':>12} {'speedup':>8}")
+    for count in args.rules:
+        rules = make_rules(count, rng)
+        caption = make_caption(rules, int(args.caption_kb * 1024), rng)
+
+        start = time.perf_counter()
+        replacer = Replacer(rules)
+        compile_ms = (time.perf_counter() - start) * 1e3
+
+        loop_us = timed(lambda: replace_loop(caption, rules), args.runs)
+        pass_us = timed(lambda: replacer.apply(caption), args.runs)
+        print(
+            f"{count:>6} {compile_ms:>11.1f} {loop_us:>10.0f} {pass_us:>12.0f} "
+            f"{loop_us / pass_us:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
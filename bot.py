@@ -9,8 +9,11 @@ from pyrogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineK
 from pyrogram.enums import ParseMode
 
 from config import Config
-from database import db, ensure_user, is_admin, get_dashboard_counts
+from database import db, adb, is_admin
 from core.job_worker import job_worker_loop
+from core.loop_monitor import loop_monitor
+from core.stats_buffer import stats_buffer
+from core.job_control import job_controls
 
 # Logging setup
 logging.basicConfig(
@@ -35,8 +38,8 @@ app = Client(
 
 
 # ==================== HELPERS ====================
-def build_dashboard_text(user_id: int, first_name: str = "Admin") -> str:
-    counts = get_dashboard_counts(user_id)
+async def build_dashboard_text(user_id: int, first_name: str = "Admin") -> str:
+    counts = await adb.get_dashboard_counts(user_id)
     return f"""
 **👋 Welcome {first_name}!**
 
@@ -80,14 +83,14 @@ async def start_handler(client: Client, message: Message):
     user = message.from_user
     user_id = user.id
 
-    ensure_user(user_id)
+    await adb.ensure_user(user_id)
 
     if not is_admin(user_id):
         return await message.reply(
             "❌ **Access Denied**\n\nYou are not authorized to use this bot."
         )
 
-    text = build_dashboard_text(user_id, user.first_name)
+    text = await build_dashboard_text(user_id, user.first_name)
     await message.reply(
         text,
         reply_markup=dashboard_keyboard(),
@@ -109,7 +112,7 @@ async def dashboard_callbacks(client: Client, query: CallbackQuery):
     data = query.data
 
     if data in ["dash:home", "dash:refresh"]:
-        text = build_dashboard_text(user_id, query.from_user.first_name)
+        text = await build_dashboard_text(user_id, query.from_user.first_name)
         await query.message.edit_text(
             text,
             reply_markup=dashboard_keyboard(),
@@ -144,7 +147,7 @@ async def dashboard_callbacks(client: Client, query: CallbackQuery):
         return
 
     if data == "dash:stats":
-        counts = get_dashboard_counts(user_id)
+        counts = await adb.get_dashboard_counts(user_id)
         text = f"""
 **📊 Statistics Overview**
 
@@ -208,10 +211,15 @@ async def main():
     asyncio.create_task(job_worker_loop(app))
     logger.info("✅ Job worker started")
 
+    asyncio.create_task(loop_monitor.run())
+    asyncio.create_task(stats_buffer.run())
+    asyncio.create_task(job_controls.watch())
+
     logger.info("Bot is up and running. Press Ctrl+C to stop.")
     await idle()
 
     logger.info("Stopping bot...")
+    await stats_buffer.flush()
     await app.stop()
 
 
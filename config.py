@@ -31,6 +31,7 @@ class Config:
         "inline_buttons": [],
         "media_types": ["photo", "video", "document", "audio", "animation", "voice"],
         "forward_tag": False,
+        "batch_forward": True,
         "delay": 1.0,
         "anti_duplicate": True,
         "future_new_posts": False,
@@ -41,4 +42,75 @@ class Config:
     DEFAULT_SLEEP_MINUTES = 30
 
     # ==================== JOB DEFAULTS ====================
-    DEFAULT_ACCOUNT_STRATEGY = "sequential"   # sequential | manual
\ No newline at end of file
+    DEFAULT_ACCOUNT_STRATEGY = "sequential"   # sequential | manual
+
+    # ==================== ENGINE TUNING ====================
+    # How many 200-message batches the fetcher may keep ready ahead of the sender
+    PREFETCH_BATCHES = int(os.getenv("PREFETCH_BATCHES", 2))
+    # Threads that run blocking PyMongo calls for async code (database.adb)
+    DB_THREADS = int(os.getenv("DB_THREADS", 16))
+    # Write-behind stats: flush after N buffered updates or every T seconds
+    STATS_FLUSH_EVERY = int(os.getenv("STATS_FLUSH_EVERY", 50))
+    STATS_FLUSH_SECONDS = float(os.getenv("STATS_FLUSH_SECONDS", 5))
+    # Credit user-account sends every N messages (1 = after each send)
+    ACCOUNT_CREDIT_BATCH = int(os.getenv("ACCOUNT_CREDIT_BATCH", 1))
+    # Seconds between batched status polls for jobs running in this process
+    JOB_WATCH_SECONDS = float(os.getenv("JOB_WATCH_SECONDS", 3))
+    # Log event-loop lag percentiles every N seconds (0 = off)
+    LOOP_LAG_LOG_SECONDS = int(os.getenv("LOOP_LAG_LOG_SECONDS", 60))
+    # In-memory duplicate cache (Bloom filter + LRU per target)
+    DUP_CACHE_MAX_MB = int(os.getenv("DUP_CACHE_MAX_MB", 64))
+    DUP_BLOOM_FP_RATE = float(os.getenv("DUP_BLOOM_FP_RATE", 0.01))
+    DUP_BLOOM_MIN_CAPACITY = int(os.getenv("DUP_BLOOM_MIN_CAPACITY", 50000))
+    DUP_LRU_SIZE = int(os.getenv("DUP_LRU_SIZE", 5000))
+    # Every N seconds a lookup first pulls the records created since the
+    # last sync (other processes' marks); re-read this far back to cover
+    # late inserts
+    DUP_CACHE_SYNC_SECONDS = float(os.getenv("DUP_CACHE_SYNC_SECONDS", 30))
+    DUP_CACHE_SYNC_OVERLAP_SECONDS = float(os.getenv("DUP_CACHE_SYNC_OVERLAP_SECONDS", 10))
+    # Duplicate records layout: "full" (unique_file_id strings) or
+    # "compact" (64-bit hashes, see migrate_duplicates.py)
+    DUP_STORAGE = os.getenv("DUP_STORAGE", "full").lower()
+    # On-disk duplicate index (target setting "dup_local_index")
+    DUP_LOCAL_DIR = os.getenv("DUP_LOCAL_DIR", "dup_index")
+    DUP_LOCAL_COMPACT_EVERY = int(os.getenv("DUP_LOCAL_COMPACT_EVERY", 50000))
+    # Job scheduler: fallback poll interval when Mongo has no change streams,
+    # and how often running jobs are fully re-scanned as a safety net
+    JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 5))
+    JOB_FULL_SCAN_SECONDS = float(os.getenv("JOB_FULL_SCAN_SECONDS", 300))
+    # A future_new_posts job is dispatched again this long after a pass ends
+    FUTURE_POSTS_RECHECK_SECONDS = float(os.getenv("FUTURE_POSTS_RECHECK_SECONDS", 60))
+    # Job leases: a worker must renew its lease within this many seconds, or
+    # another worker takes the job over. WORKER_ID defaults to host:pid.
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 30))
+    WORKER_ID = os.getenv("WORKER_ID")
+    # Send pacing (core/rate_limiter.py): msg/s per bot or user account,
+    # msg/s per channel chat, msg/min per group chat, burst per chat
+    BOT_SEND_RATE = float(os.getenv("BOT_SEND_RATE", 30))
+    USER_SEND_RATE = float(os.getenv("USER_SEND_RATE", 3))
+    CHAT_SEND_RATE = float(os.getenv("CHAT_SEND_RATE", 1))
+    GROUP_SEND_PER_MINUTE = float(os.getenv("GROUP_SEND_PER_MINUTE", 20))
+    CHAT_SEND_BURST = float(os.getenv("CHAT_SEND_BURST", 3))
+    # AIMD on those rates: every successful send adds RATE_INCREASE x the
+    # ceiling, a FloodWait multiplies the rate by RATE_DECREASE; the message
+    # that hit it is retried up to FLOOD_RETRIES times
+    RATE_INCREASE = float(os.getenv("RATE_INCREASE", 0.02))
+    RATE_DECREASE = float(os.getenv("RATE_DECREASE", 0.5))
+    MIN_SEND_RATE = float(os.getenv("MIN_SEND_RATE", 0.05))
+    FLOOD_RETRIES = int(os.getenv("FLOOD_RETRIES", 5))
+    # Retry queue of failed sends (failed_sends): first retry after
+    # SEND_RETRY_BASE_SECONDS, doubling per attempt; dead letter after
+    # SEND_MAX_ATTEMPTS. A running job looks for due retries at most every
+    # SEND_RETRY_SCAN_SECONDS.
+    SEND_RETRY_BASE_SECONDS = float(os.getenv("SEND_RETRY_BASE_SECONDS", 60))
+    SEND_MAX_ATTEMPTS = int(os.getenv("SEND_MAX_ATTEMPTS", 5))
+    SEND_RETRY_SCAN_SECONDS = float(os.getenv("SEND_RETRY_SCAN_SECONDS", 60))
+    # Sends in flight per target at once (a target's `send_window` setting
+    # overrides it, up to MAX_SEND_WINDOW). 1 sends strictly one by one, in
+    # source order; more overlaps the round trips and results are committed
+    # in order, but messages sent together may arrive slightly reordered
+    SEND_WINDOW = int(os.getenv("SEND_WINDOW", 1))
+    MAX_SEND_WINDOW = int(os.getenv("MAX_SEND_WINDOW", 10))
+    # A running job re-reads its targets at most every PROFILE_REFRESH_SECONDS
+    # and picks up changed settings at the next checkpoint
+    PROFILE_REFRESH_SECONDS = float(os.getenv("PROFILE_REFRESH_SECONDS", 15))
\ No newline at end of file
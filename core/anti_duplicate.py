@@ -1,32 +1,62 @@
 # core/anti_duplicate.py
+#
+# Duplicate checks for the forwarder. Targets with an open on-disk index
+# (core.dup_store) are answered locally; all others go through the Bloom
+# cache (core.dup_cache) to Mongo.
 
-from typing import Optional
+from typing import List, Set
 from pyrogram.types import Message
-from database import is_duplicate, mark_as_forwarded
+from database import adb
 from core.filters import get_unique_file_id
+from core.dup_cache import dup_cache
+from core.dup_store import local_dup_store
 
 
-def check_and_mark_duplicate(
+async def resolve_new_unique_ids(
     user_id: int,
     target_chat_id: int,
-    message: Message,
+    messages: List[Message],
     anti_duplicate_enabled: bool
-) -> bool:
+) -> Set[str]:
     """
-    Returns True  → This message is DUPLICATE (should skip)
-    Returns False → Not duplicate (safe to forward)
+    Duplicate check for a whole fetch batch; nothing is marked here (sent
+    ids are marked by mark_batch_forwarded()). Returns the unique_file_ids
+    of `messages` that were NOT forwarded yet; a media message whose id is
+    missing from the result is a duplicate.
     """
     if not anti_duplicate_enabled:
-        return False
+        return set()
 
-    unique_id = get_unique_file_id(message)
-    if not unique_id:
-        # No media → cannot check duplicate
-        return False
+    unique_ids = [uid for uid in map(get_unique_file_id, messages) if uid]
+    if not unique_ids:
+        return set()
 
-    if is_duplicate(user_id, target_chat_id, unique_id):
-        return True  # Duplicate → skip
+    if local_dup_store.active(user_id, target_chat_id):
+        return local_dup_store.filter_new(user_id, target_chat_id, unique_ids)
 
-    # Mark it now (before sending) to avoid race conditions
-    mark_as_forwarded(user_id, target_chat_id, unique_id)
-    return False
\ No newline at end of file
+    return await dup_cache.filter_new(user_id, target_chat_id, unique_ids)
+
+
+async def mark_batch_forwarded(
+    user_id: int,
+    target_chat_id: int,
+    unique_ids: List[str],
+    ttl_days: int = 0
+) -> int:
+    """Mark all unique ids of a sent batch in one write."""
+    if local_dup_store.active(user_id, target_chat_id):
+        return await local_dup_store.add(user_id, target_chat_id, unique_ids, ttl_days)
+
+    inserted = await adb.mark_many_as_forwarded(user_id, target_chat_id, unique_ids, ttl_days)
+    dup_cache.remember(user_id, target_chat_id, unique_ids)
+    return inserted
+
+
+async def get_duplicate_count(user_id: int, target_chat_id: int) -> int:
+    """
+    Records of a target. With an open local index that is the larger of the
+    index and Mongo: write-behinds may still be on their way, and an index
+    built before they existed holds ids Mongo never got.
+    """
+    stored = await adb.get_duplicate_count(user_id, target_chat_id)
+    return max(stored, local_dup_store.count(user_id, target_chat_id))
@@ -1,55 +1,258 @@
 # core/caption.py
 
+import logging
 import re
-from typing import Dict, Any, Optional, List
+import sys
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple, Pattern
+from pyrogram.enums import MessageEntityType
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 
+from core.entities import RichText, parse_html
+from core.filters import trie_pattern
 
-def process_caption(message: Message, settings: Dict[str, Any]) -> Optional[str]:
+logger = logging.getLogger(__name__)
+
+# Text replacements are compiled once per rule list into a Replacer, which
+# rewrites a caption in one pass: at each position the longest match of any
+# rule wins (earlier rule on a tie) and replaced text is never matched again.
+# A rule is {"from", "to"} plus optional flags:
+#   regex        "from" is a regular expression, "to" may use \1 / \g<name>
+#   ignore_case  match regardless of case
+#   whole_word   match only where "from" is not part of a longer word
+# Literal rules with the same flags share one trie regex, so the work per
+# position doesn't grow with the number of rules.
+
+REPLACER_CACHE_SIZE = 256
+
+
+def _bounded(pattern: str, whole_word: bool) -> str:
+    return rf"(?<!\w)(?:{pattern})(?!\w)" if whole_word else pattern
+
+
+class _Matcher:
+    """One regex rule, or all literal rules sharing the same flags."""
+
+    def __init__(
+        self,
+        pattern: Pattern,
+        table: Optional[Dict[str, Tuple[int, str]]] = None,
+        index: int = 0,
+        template: str = ""
+    ):
+        self.pattern = pattern
+        self.table = table            # literal rules: matched text → (rule index, to)
+        self.index = index
+        self.template = template
+
+    def resolve(self, match: re.Match) -> Tuple[int, str]:
+        """(rule index, replacement text) for a match of this matcher."""
+        if self.table is None:
+            try:
+                return self.index, match.expand(self.template)
+            except (re.error, IndexError):
+                return self.index, self.template
+        text = match.group()
+        key = text.lower() if self.pattern.flags & re.IGNORECASE else text
+        return self.table.get(key, (sys.maxsize, text))      # unchanged
+
+
+class Replacer:
+    """A target's replacement rules, compiled. Build with compile_replacements()."""
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.matchers: List[_Matcher] = []
+        literals: Dict[Tuple[bool, bool], Dict[str, Tuple[int, str]]] = {}
+        for index, rule in enumerate(rules):
+            old = rule.get("from", "")
+            if not old:
+                continue
+            new = rule.get("to", "")
+            ignore_case = bool(rule.get("ignore_case"))
+            whole_word = bool(rule.get("whole_word"))
+            if rule.get("regex"):
+                try:
+                    pattern = re.compile(
+                        _bounded(old, whole_word), re.IGNORECASE if ignore_case else 0
+                    )
+                except re.error as e:
+                    logger.warning(f"Skipping replacement rule {old!r}: {e}")
+                    continue
+                self.matchers.append(_Matcher(pattern, index=index, template=new))
+            else:
+                key = old.lower() if ignore_case else old
+                table = literals.setdefault((ignore_case, whole_word), {})
+                table.setdefault(key, (index, new))
+
+        for (ignore_case, whole_word), table in literals.items():
+            pattern = re.compile(
+                _bounded(trie_pattern(list(table), longest=True), whole_word),
+                re.IGNORECASE if ignore_case else 0
+            )
+            self.matchers.append(_Matcher(pattern, table=table))
+
+    def __bool__(self) -> bool:
+        return bool(self.matchers)
+
+    def edits(self, text: str) -> List[Tuple[int, int, str]]:
+        """(start, end, replacement) of every match in one left-to-right pass."""
+        if not (self.matchers and text):
+            return []
+        if len(self.matchers) == 1:
+            # One matcher (e.g. only plain rules): the regex engine drives
+            matcher = self.matchers[0]
+            return [
+                (match.start(), match.end(), matcher.resolve(match)[1])
+                for match in matcher.pattern.finditer(text)
+            ]
+
+        # Next match of every matcher at or after `pos`
+        found = [m.pattern.search(text) for m in self.matchers]
+        result: List[Tuple[int, int, str]] = []
+        pos = 0
+        while pos <= len(text):
+            best: Optional[Tuple[int, int, int]] = None
+            best_match, replacement = None, ""
+            for i, match in enumerate(found):
+                if match is not None and match.start() < pos:
+                    match = found[i] = self.matchers[i].pattern.search(text, pos)
+                if match is None:
+                    continue
+                index, new = self.matchers[i].resolve(match)
+                # leftmost, then longest, then the earlier rule
+                rank = (match.start(), match.start() - match.end(), index)
+                if best is None or rank < best:
+                    best, best_match, replacement = rank, match, new
+            if best_match is None:
+                break
+
+            start, end = best_match.span()
+            result.append((start, end, replacement))
+            # after an empty match, keep the character and move on
+            pos = end if end > start else start + 1
+        return result
+
+    def apply(self, text: str) -> str:
+        """Rewrite `text` in one left-to-right pass."""
+        if not (self.matchers and text):
+            return text
+        if len(self.matchers) == 1:
+            matcher = self.matchers[0]
+            return matcher.pattern.sub(lambda match: matcher.resolve(match)[1], text)
+        out: List[str] = []
+        pos = 0
+        for start, end, new in self.edits(text):
+            out.append(text[pos:start])
+            out.append(new)
+            pos = end
+        out.append(text[pos:])
+        return "".join(out)
+
+
+_replacers: "OrderedDict[Tuple, Replacer]" = OrderedDict()
+
+
+def compile_replacements(settings: Dict[str, Any]) -> Replacer:
+    """The compiled replacement rules of a target's settings (cached, LRU)."""
+    rules = settings.get("replacements", [])
+    key = tuple(
+        (
+            r.get("from", ""), r.get("to", ""), bool(r.get("regex")),
+            bool(r.get("ignore_case")), bool(r.get("whole_word"))
+        )
+        for r in rules
+    )
+    replacer = _replacers.get(key)
+    if replacer is None:
+        replacer = _replacers[key] = Replacer(rules)
+        if len(_replacers) > REPLACER_CACHE_SIZE:
+            _replacers.popitem(last=False)
+    else:
+        _replacers.move_to_end(key)
+    return replacer
+
+
+LINK_RE = re.compile(
+    r"https?://\S+|www\.\S+|t\.me/\S+|telegram\.me/\S+|telegram\.dog/\S+",
+    re.IGNORECASE
+)
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+SPACES_RE = re.compile(r"[ \t]{2,}")
+PLACEHOLDER_RE = re.compile(re.escape("{caption}"))
+
+
+def compile_template(settings: Dict[str, Any]) -> Optional[RichText]:
+    """The caption template parsed from its HTML; None if templates are off."""
+    if not settings.get("caption_enabled", False):
+        return None
+    return parse_html(settings.get("caption_template", "{caption}"))
+
+
+def message_text(message: Message) -> RichText:
+    """A message's caption, or its text, with the formatting it has."""
+    if message.caption:
+        return RichText.from_message(message.caption, message.caption_entities)
+    return RichText.from_message(message.text or "", message.entities)
+
+
+def rewrite_caption(
+    original: RichText,
+    replacer: Optional[Replacer] = None,
+    remove_links: bool = False,
+    template: Optional[RichText] = None
+) -> Optional[RichText]:
     """
-    Process caption according to target settings.
-    Returns final caption string or None.
+    Caption steps with prepared settings (see core.target_profile). Works on
+    text + entities, so the source formatting is kept.
+    Returns the final caption or None.
     """
-    original = message.caption or message.text or ""
 
     # 1. Start with original
     caption = original
 
-    # 2. Text Replacements
-    if settings.get("replace_enabled", False):
-        replacements: List[Dict[str, str]] = settings.get("replacements", [])
-        for rule in replacements:
-            old = rule.get("from", "")
-            new = rule.get("to", "")
-            if old:
-                caption = caption.replace(old, new)
+    # 2. Text Replacements (one pass, see Replacer)
+    if replacer:
+        caption = caption.edit(replacer.edits(caption.text))
 
     # 3. Remove Links
-    if settings.get("remove_links", False):
-        # Remove http/https/t.me/telegram.me links
-        caption = re.sub(
-            r"https?://\S+|www\.\S+|t\.me/\S+|telegram\.me/\S+|telegram\.dog/\S+",
-            "",
-            caption,
-            flags=re.IGNORECASE
-        )
+    if remove_links:
+        # Remove http/https/t.me/telegram.me links, and links behind words
+        caption = caption.without(MessageEntityType.TEXT_LINK)
+        caption = caption.edit((m.start(), m.end(), "") for m in LINK_RE.finditer(caption.text))
         # Clean extra spaces/newlines
-        caption = re.sub(r"\n{3,}", "\n\n", caption)
-        caption = re.sub(r"[ \t]{2,}", " ", caption)
+        caption = caption.edit(
+            (m.start(), m.end(), "\n\n") for m in BLANK_LINES_RE.finditer(caption.text)
+        )
+        caption = caption.edit((m.start(), m.end(), " ") for m in SPACES_RE.finditer(caption.text))
         caption = caption.strip()
 
     # 4. Caption Template
-    if settings.get("caption_enabled", False):
-        template = settings.get("caption_template", "{caption}")
-        caption = template.replace("{caption}", caption)
+    if template is not None:
+        caption = template.edit(
+            (m.start(), m.end(), caption) for m in PLACEHOLDER_RE.finditer(template.text)
+        )
 
     # If final caption is empty → return None (so no caption is sent)
-    if not caption or not caption.strip():
+    if not caption.text.strip():
         return None
 
     return caption
 
 
+def process_caption(message: Message, settings: Dict[str, Any]) -> Optional[str]:
+    """
+    Process caption according to target settings.
+    Returns final caption text (formatting: see rewrite_caption) or None.
+    """
+    caption = rewrite_caption(
+        message_text(message),
+        compile_replacements(settings) if settings.get("replace_enabled", False) else None,
+        settings.get("remove_links", False),
+        compile_template(settings)
+    )
+    return caption.text if caption else None
+
+
 def build_inline_keyboard(settings: Dict[str, Any]) -> Optional[InlineKeyboardMarkup]:
     """
     Build InlineKeyboardMarkup from settings.
@@ -0,0 +1,255 @@
+# core/dup_cache.py
+#
+# In-process duplicate cache in front of the `duplicates` collection.
+# Almost every anti-duplicate lookup is a miss, yet each one cost a Mongo
+# round trip. Per (user, target) we keep a Bloom filter of every known
+# unique_file_id (streamed from Mongo when a job starts) plus an LRU of ids
+# confirmed recently. Mongo is only asked when the Bloom filter says "maybe".
+#
+# Other processes (bot, other workers, other jobs on the same target) keep
+# writing records while a cache is in use. At most every
+# DUP_CACHE_SYNC_SECONDS a lookup first pulls the records created since the
+# last sync, minus DUP_CACHE_SYNC_OVERLAP_SECONDS for inserts that became
+# visible late, with one indexed range query. In between, lookups are
+# answered locally; a "definitely new" answer may then miss another
+# process's marks from the last sync interval (this process's own marks are
+# remembered right away).
+#
+# The caches of all targets share one memory budget (DUP_CACHE_MAX_MB); the
+# least recently used target cache is dropped first and simply reloaded the
+# next time a job needs it.
+#
+# Caches hold the stored form of an id (database.duplicate_key), i.e. the
+# 64-bit hash when the compact duplicates layout is used.
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Iterable, Optional, List, Set, Tuple, Union
+
+from config import Config
+from database import adb, duplicate_key
+
+logger = logging.getLogger(__name__)
+
+LOAD_PAGE_SIZE = 10_000
+LRU_ENTRY_BYTES = 120          # rough cost of one cached id string + dict slot
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.num_bits = max(
+            64, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))
+        )
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: Union[str, int]):
+        digest = hashlib.blake2b(str(item).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: Union[str, int]) -> None:
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def update(self, items: Iterable[Union[str, int]]) -> None:
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: Union[str, int]) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def estimated_fp_rate(self) -> float:
+        """Theoretical false-positive rate for the current fill level."""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class TargetDupCache:
+    def __init__(self, capacity: int):
+        self.bloom = BloomFilter(capacity, Config.DUP_BLOOM_FP_RATE)
+        self.recent: "OrderedDict[Union[str, int], None]" = OrderedDict()
+        self.synced_at = datetime.now(timezone.utc)     # records read up to here
+        self.next_sync = time.monotonic() + Config.DUP_CACHE_SYNC_SECONDS
+
+        self.lookups = 0
+        self.bloom_negatives = 0      # answered locally: definitely new
+        self.lru_hits = 0             # answered locally: known duplicate
+        self.db_checks = 0            # "maybe" → asked Mongo
+        self.false_positives = 0      # Mongo said: not a duplicate after all
+
+    def remember(self, key: Union[str, int]) -> None:
+        if key not in self.bloom:
+            self.bloom.add(key)
+        self.recent[key] = None
+        self.recent.move_to_end(key)
+        while len(self.recent) > Config.DUP_LRU_SIZE:
+            self.recent.popitem(last=False)
+
+    @property
+    def nbytes(self) -> int:
+        return self.bloom.nbytes + len(self.recent) * LRU_ENTRY_BYTES
+
+    @property
+    def saturated(self) -> bool:
+        return self.bloom.count > self.bloom.capacity
+
+    def report(self) -> Dict[str, Any]:
+        observed = self.false_positives / self.db_checks if self.db_checks else 0.0
+        return {
+            "items": self.bloom.count,
+            "kib": self.nbytes // 1024,
+            "lookups": self.lookups,
+            "local": self.bloom_negatives + self.lru_hits,
+            "db_checks": self.db_checks,
+            "fp_estimated": self.bloom.estimated_fp_rate(),
+            "fp_observed": observed,
+        }
+
+
+class DuplicateCache:
+    def __init__(self, max_bytes: int = Config.DUP_CACHE_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        # (user_id, target_chat_id) -> cache, least recently used first
+        self._caches: "OrderedDict[Tuple[int, int], TargetDupCache]" = OrderedDict()
+
+    def _get(self, user_id: int, target_chat_id: int) -> Optional[TargetDupCache]:
+        key = (user_id, target_chat_id)
+        cache = self._caches.get(key)
+        if cache is not None:
+            self._caches.move_to_end(key)
+        return cache
+
+    def _evict(self) -> None:
+        total = sum(c.nbytes for c in self._caches.values())
+        while total > self.max_bytes and len(self._caches) > 1:
+            key, cache = self._caches.popitem(last=False)
+            total -= cache.nbytes
+            logger.info(f"Dup cache: evicted {key} ({cache.nbytes // 1024} KiB)")
+
+    async def load(self, user_id: int, target_chat_id: int) -> None:
+        """
+        (Re)build the target's cache by streaming its unique ids from Mongo.
+        Called when a job starts; records written later are picked up by
+        _sync(). Hashing runs in a worker thread, page by page.
+        """
+        expected = await adb.get_duplicate_count(user_id, target_chat_id)
+        cache = TargetDupCache(capacity=max(expected * 2, Config.DUP_BLOOM_MIN_CAPACITY))
+
+        loop = asyncio.get_running_loop()
+        last_id = None
+        while True:
+            page = await adb.get_duplicate_ids_page(
+                user_id, target_chat_id, after=last_id, limit=LOAD_PAGE_SIZE
+            )
+            await loop.run_in_executor(None, cache.bloom.update, page)
+            if len(page) < LOAD_PAGE_SIZE:
+                break
+            last_id = page[-1]
+
+        self._caches[(user_id, target_chat_id)] = cache
+        self._caches.move_to_end((user_id, target_chat_id))
+        self._evict()
+        logger.info(
+            f"Dup cache loaded for target {target_chat_id}: "
+            f"{cache.bloom.count} ids, {cache.nbytes // 1024} KiB"
+        )
+
+    def drop(self, user_id: int, target_chat_id: int) -> None:
+        """Forget a target (its duplicates were cleared or it was deleted)."""
+        self._caches.pop((user_id, target_chat_id), None)
+
+    async def _sync(self, user_id: int, target_chat_id: int) -> Optional[TargetDupCache]:
+        """
+        The target's cache; once the sync interval is up, with the records
+        written since the last sync added.
+        """
+        cache = self._get(user_id, target_chat_id)
+        if cache is None or time.monotonic() < cache.next_sync:
+            return cache
+        cache.next_sync = time.monotonic() + Config.DUP_CACHE_SYNC_SECONDS
+        now = datetime.now(timezone.utc)
+        since = cache.synced_at - timedelta(seconds=Config.DUP_CACHE_SYNC_OVERLAP_SECONDS)
+        keys = await adb.get_duplicate_ids_since(user_id, target_chat_id, since)
+        cache.synced_at = now
+        for key in keys:
+            if key not in cache.bloom:
+                cache.bloom.add(key)
+        if cache.saturated:
+            logger.info(f"Dup cache for target {target_chat_id} saturated → dropping")
+            self.drop(user_id, target_chat_id)
+            return None
+        return cache
+
+    async def filter_new(
+        self,
+        user_id: int,
+        target_chat_id: int,
+        unique_ids: List[str]
+    ) -> Set[str]:
+        """
+        Batch lookup: the subset of unique_ids not forwarded yet.
+        Only the Bloom "maybe" ids go to Mongo, in a single $in query.
+        """
+        cache = await self._sync(user_id, target_chat_id)
+        if cache is None:
+            return set(await adb.get_new_unique_ids(user_id, target_chat_id, unique_ids))
+
+        new: Set[str] = set()
+        maybe: List[str] = []
+        for unique_id in dict.fromkeys(unique_ids):
+            key = duplicate_key(unique_id)
+            cache.lookups += 1
+            if key in cache.recent:
+                cache.lru_hits += 1
+            elif key not in cache.bloom:
+                cache.bloom_negatives += 1
+                new.add(unique_id)
+            else:
+                maybe.append(unique_id)
+
+        if maybe:
+            cache.db_checks += len(maybe)
+            not_found = set(await adb.get_new_unique_ids(user_id, target_chat_id, maybe))
+            cache.false_positives += len(not_found)
+            for unique_id in maybe:
+                if unique_id not in not_found:
+                    cache.remember(duplicate_key(unique_id))
+            new |= not_found
+        return new
+
+    def remember(self, user_id: int, target_chat_id: int, unique_ids: List[str]) -> None:
+        """Record ids that were just marked as forwarded."""
+        cache = self._get(user_id, target_chat_id)
+        if cache is None:
+            return
+        for unique_id in unique_ids:
+            cache.remember(duplicate_key(unique_id))
+        if cache.saturated:
+            # Past its design capacity the FP rate climbs; rebuild on next load
+            logger.info(f"Dup cache for target {target_chat_id} saturated → dropping")
+            self.drop(user_id, target_chat_id)
+        else:
+            self._evict()
+
+    def report(self, user_id: int, target_chat_id: int) -> Optional[Dict[str, Any]]:
+        cache = self._caches.get((user_id, target_chat_id))
+        return cache.report() if cache else None
+
+
+# Process-wide cache shared by all jobs
+dup_cache = DuplicateCache()
@@ -0,0 +1,429 @@
+# core/dup_store.py
+#
+# Optional on-disk duplicate index for very large targets (setting
+# "dup_local_index"). Per (user, target) there are two files in DUP_LOCAL_DIR:
+#
+#   <user>_<target>.idx  sorted array of signed 64-bit fingerprints
+#                        (database.duplicate_hash), memory-mapped; a lookup
+#                        is a binary search, no network round trip
+#   <user>_<target>.log  append log of fingerprints added since the last
+#                        compaction, also held in memory as a set
+#
+# Once the log reaches DUP_LOCAL_COMPACT_EVERY entries it is merged into a new
+# .idx file in a worker thread and swapped in. The index is seeded from Mongo
+# the first time a target is opened and can be exported back (compact layout).
+#
+# Lookups are answered locally, but every added id is still written to Mongo
+# behind the index (write_behind / drain), so Mongo stays the full record.
+# The files are local to one machine: bot and worker must share DUP_LOCAL_DIR,
+# and an ephemeral filesystem loses them (they are rebuilt from Mongo).
+#
+# Several processes (bot, N workers) may use one target's index at once.
+# <user>_<target>.lock is flock'ed around every file access: appends and the
+# compaction swap take it exclusively, a refresh takes it shared. Before a
+# lookup, append or compaction an index re-reads what other processes wrote:
+# the log tail past its last read offset, or the whole state if the .idx file
+# was swapped by someone else's compaction.
+
+import asyncio
+import glob
+import heapq
+import logging
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:        # Windows: one process per DUP_LOCAL_DIR
+    fcntl = None
+
+from config import Config
+from database import adb, duplicate_hash, COMPACT_DUPLICATES
+
+logger = logging.getLogger(__name__)
+
+RECORD = array("q").itemsize     # 8 bytes per fingerprint
+IMPORT_PAGE_SIZE = 10_000
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    """Identity of a file version; changes when it is replaced."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class FingerprintIndex:
+    def __init__(self, directory: str, user_id: int, target_chat_id: int):
+        base = os.path.join(directory, f"{user_id}_{target_chat_id}")
+        self.idx_path = base + ".idx"
+        self.log_path = base + ".log"
+        self.lock_path = base + ".lock"
+
+        self._mm: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+        self._idx_stamp: Optional[Tuple[int, int, int]] = None   # .idx mapped
+        self._log: Set[int] = set()
+        self._log_offset = 0              # bytes of the log read into _log
+        self._log_file = None
+        self._lock_file = None
+        self._compacting = False
+
+    # ---------- lifecycle ----------
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.idx_path)
+
+    def open(self) -> None:
+        self._lock_file = open(self.lock_path, "ab")
+        self._log_file = open(self.log_path, "ab")
+        with self._locked(exclusive=False):
+            self._refresh()
+
+    def _map(self) -> None:
+        self._idx_stamp = _stamp(self.idx_path)
+        if self._idx_stamp is None or self._idx_stamp[2] == 0:
+            return
+        with open(self.idx_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm).cast("q")
+
+    def _unmap(self) -> None:
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._idx_stamp = None
+
+    def close(self) -> None:
+        self._unmap()
+        for f in (self._log_file, self._lock_file):
+            if f:
+                f.close()
+        self._log_file = self._lock_file = None
+
+    def __len__(self) -> int:
+        return (len(self._view) if self._view is not None else 0) + len(self._log)
+
+    # ---------- other processes ----------
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        if fcntl is None or self._lock_file is None:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        """Pick up other processes' appends and compactions (lock held)."""
+        if _stamp(self.idx_path) != self._idx_stamp:
+            # Compacted (or deleted) elsewhere: the log was rewritten with it
+            self._unmap()
+            self._map()
+            self._log, self._log_offset = set(), 0
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            st = None
+        if self._log_file and (st is None or st.st_ino != os.fstat(self._log_file.fileno()).st_ino):
+            # Deleted elsewhere: don't keep appending to the unlinked file
+            self._log_file.close()
+            self._log_file = open(self.log_path, "ab")
+        size = st.st_size if st else 0
+        if size < self._log_offset:
+            self._log, self._log_offset = set(), 0
+        # a torn last record (crash mid-write) is ignored
+        usable = size - (size - self._log_offset) % RECORD
+        if usable > self._log_offset:
+            with open(self.log_path, "rb") as f:
+                f.seek(self._log_offset)
+                self._log.update(array("q", f.read(usable - self._log_offset)))
+            self._log_offset = usable
+
+    def refresh(self) -> None:
+        """Re-read what other processes wrote since the last lookup."""
+        with self._locked(exclusive=False):
+            self._refresh()
+
+    # ---------- lookups ----------
+
+    def __contains__(self, fingerprint: int) -> bool:
+        if fingerprint in self._log:
+            return True
+        view = self._view
+        if view is None:
+            return False
+        i = bisect_left(view, fingerprint)
+        return i < len(view) and view[i] == fingerprint
+
+    def add(self, fingerprints: Iterable[int]) -> int:
+        """Append new fingerprints to the log. Returns how many were new."""
+        fingerprints = set(fingerprints)
+        with self._locked(exclusive=True):
+            self._refresh()
+            new = array("q", (fp for fp in fingerprints if fp not in self))
+            if new:
+                # Drop a torn record first, or every later one is misaligned
+                self._log_file.truncate(self._log_offset)
+                self._log_file.write(new.tobytes())
+                self._log_file.flush()
+                self._log.update(new)
+                self._log_offset += len(new) * RECORD
+        return len(new)
+
+    @property
+    def needs_compaction(self) -> bool:
+        return len(self._log) >= Config.DUP_LOCAL_COMPACT_EVERY and not self._compacting
+
+    # ---------- compaction ----------
+
+    def _write_merged(self, snapshot: List[int]) -> str:
+        """
+        Merge the .idx file with `snapshot` (sorted) into a temp file. Maps
+        the file itself: the loop thread may remap its view meanwhile.
+        """
+        tmp_path = f"{self.idx_path}.{os.getpid()}.tmp"
+        mm = view = None
+        if os.path.exists(self.idx_path) and os.path.getsize(self.idx_path):
+            with open(self.idx_path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(mm).cast("q")
+        try:
+            with open(tmp_path, "wb") as f:
+                chunk = array("q")
+                last = None
+                for fp in heapq.merge(view if view is not None else (), snapshot):
+                    if fp == last:
+                        continue
+                    last = fp
+                    chunk.append(fp)
+                    if len(chunk) >= 65536:
+                        f.write(chunk.tobytes())
+                        chunk = array("q")
+                f.write(chunk.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            if view is not None:
+                view.release()
+                mm.close()
+        return tmp_path
+
+    async def compact(self) -> None:
+        """Merge the log into the sorted file (in a thread), then swap it in."""
+        if self._compacting:
+            return
+        self._compacting = True
+        try:
+            with self._locked(exclusive=True):
+                self._refresh()
+                snapshot = sorted(self._log)
+                stamp = self._idx_stamp
+            loop = asyncio.get_running_loop()
+            tmp_path = await loop.run_in_executor(None, self._write_merged, snapshot)
+
+            # Swap on the loop thread, so no lookup sees a half-swapped state
+            with self._locked(exclusive=True):
+                self._refresh()
+                if self._idx_stamp != stamp:
+                    # Another process compacted meanwhile; its log kept ours
+                    os.remove(tmp_path)
+                    return
+                self._unmap()
+                os.replace(tmp_path, self.idx_path)
+                self._map()
+
+                # Keep what was appended (here or elsewhere) since the snapshot
+                merged = set(snapshot)
+                remaining = array("q", (fp for fp in self._log if fp not in merged))
+                self._log_file.truncate(0)
+                self._log_file.write(remaining.tobytes())
+                self._log_file.flush()
+                self._log = set(remaining)
+                self._log_offset = len(remaining) * RECORD
+            logger.info(f"Dup index compacted: {self.idx_path} ({len(self)} fingerprints)")
+        finally:
+            self._compacting = False
+
+    def delete_files(self) -> None:
+        # The .lock file stays: another process may hold it
+        if self._lock_file is None and os.path.isdir(os.path.dirname(self.lock_path)):
+            self._lock_file = open(self.lock_path, "ab")
+        with self._locked(exclusive=True):
+            for path in [self.idx_path, self.log_path] + glob.glob(self.idx_path + ".*.tmp"):
+                if os.path.exists(path):
+                    os.remove(path)
+        self.close()
+
+
+class LocalDuplicateStore:
+    """Registry of the fingerprint indexes opened by this process."""
+
+    def __init__(self, directory: str = Config.DUP_LOCAL_DIR):
+        self.directory = directory
+        self._indexes: Dict[Tuple[int, int], FingerprintIndex] = {}
+        self._writes: Set[asyncio.Future] = set()
+
+    def get(self, user_id: int, target_chat_id: int) -> Optional[FingerprintIndex]:
+        """The open index of a target, or None if it uses Mongo."""
+        return self._indexes.get((user_id, target_chat_id))
+
+    def active(self, user_id: int, target_chat_id: int) -> bool:
+        """True if the target's duplicates are handled by an open local index."""
+        return (user_id, target_chat_id) in self._indexes
+
+    async def open(
+        self,
+        user_id: int,
+        target_chat_id: int,
+        seed: bool = True
+    ) -> FingerprintIndex:
+        """Open (and on first use seed from Mongo) a target's index."""
+        key = (user_id, target_chat_id)
+        index = self._indexes.get(key)
+        if index is not None:
+            return index
+
+        os.makedirs(self.directory, exist_ok=True)
+        index = FingerprintIndex(self.directory, user_id, target_chat_id)
+        seed = seed and not index.exists
+        index.open()
+        self._indexes[key] = index
+
+        if seed:
+            try:
+                imported = await self.import_from_mongo(user_id, target_chat_id)
+            except Exception:
+                # Half-seeded index would miss duplicates → start over next time
+                self.delete(user_id, target_chat_id)
+                raise
+            logger.info(f"Dup index for {target_chat_id} seeded with {imported} fingerprints")
+        return index
+
+    async def add(
+        self,
+        user_id: int,
+        target_chat_id: int,
+        unique_ids: List[str],
+        ttl_days: int = 0
+    ) -> int:
+        index = self.get(user_id, target_chat_id)
+        if index is None:
+            return 0
+        added = index.add(duplicate_hash(uid) for uid in unique_ids)
+        if added:
+            self.write_behind(user_id, target_chat_id, unique_ids, ttl_days)
+        if index.needs_compaction:
+            await index.compact()
+        return added
+
+    def write_behind(
+        self,
+        user_id: int,
+        target_chat_id: int,
+        unique_ids: List[str],
+        ttl_days: int = 0
+    ) -> None:
+        """Record ids in Mongo in the background; drain() waits for them."""
+        task = asyncio.ensure_future(
+            adb.mark_many_as_forwarded(user_id, target_chat_id, list(unique_ids), ttl_days)
+        )
+        self._writes.add(task)
+        task.add_done_callback(self._written)
+
+    def _written(self, task: asyncio.Future) -> None:
+        self._writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Dup write-behind to Mongo failed: {task.exception()}")
+
+    async def drain(self) -> None:
+        """Wait until every write-behind has reached Mongo."""
+        if self._writes:
+            await asyncio.gather(*list(self._writes), return_exceptions=True)
+
+    def filter_new(self, user_id: int, target_chat_id: int, unique_ids: List[str]) -> Set[str]:
+        """The ids of `unique_ids` not in the target's open index."""
+        index = self.get(user_id, target_chat_id)
+        if index is None:
+            return set(unique_ids)
+        index.refresh()
+        return {uid for uid in unique_ids if duplicate_hash(uid) not in index}
+
+    def count(self, user_id: int, target_chat_id: int) -> int:
+        """Fingerprints in the target's open index (0 if none is open)."""
+        index = self.get(user_id, target_chat_id)
+        return len(index) if index is not None else 0
+
+    def release(self, user_id: int, target_chat_id: int) -> None:
+        """Close a target's index (setting turned off); its files are kept."""
+        index = self._indexes.pop((user_id, target_chat_id), None)
+        if index is not None:
+            index.close()
+
+    def delete(self, user_id: int, target_chat_id: int) -> None:
+        """Drop a target's index files (target deleted / duplicates cleared)."""
+        index = self._indexes.pop((user_id, target_chat_id), None)
+        if index is None:
+            index = FingerprintIndex(self.directory, user_id, target_chat_id)
+        index.delete_files()
+
+    # ---------- bulk transfer ----------
+
+    async def import_from_mongo(self, user_id: int, target_chat_id: int) -> int:
+        """Add every record of the `duplicates` layout in use to the index."""
+        index = await self.open(user_id, target_chat_id, seed=False)
+        imported = 0
+        last_key = None
+        while True:
+            page = await adb.get_duplicate_ids_page(
+                user_id, target_chat_id, after=last_key, limit=IMPORT_PAGE_SIZE
+            )
+            if not page:
+                break
+            fingerprints = page if COMPACT_DUPLICATES else [duplicate_hash(k) for k in page]
+            imported += index.add(fingerprints)
+            last_key = page[-1]
+            if len(page) < IMPORT_PAGE_SIZE:
+                break
+        await index.compact()
+        return imported
+
+    async def export_to_mongo(self, user_id: int, target_chat_id: int) -> int:
+        """
+        Write the index back to Mongo. Only the compact layout can take it:
+        fingerprints cannot be turned back into unique_file_id strings.
+        """
+        if not COMPACT_DUPLICATES:
+            raise ValueError("Export needs DUP_STORAGE=compact")
+
+        index = await self.open(user_id, target_chat_id)
+        await index.compact()
+        view = index._view if index._view is not None else ()
+
+        exported = 0
+        for start in range(0, len(view), IMPORT_PAGE_SIZE):
+            batch = list(view[start:start + IMPORT_PAGE_SIZE])
+            exported += await adb.add_duplicate_hashes(user_id, target_chat_id, batch)
+        return exported
+
+    def close(self) -> None:
+        for index in self._indexes.values():
+            index.close()
+        self._indexes.clear()
+
+
+# Process-wide store
+local_dup_store = LocalDuplicateStore()
@@ -0,0 +1,208 @@
+# core/entities.py
+#
+# Formatted text as Telegram sends it: plain text plus entities (bold,
+# links, spoilers, ...). Captions are rewritten on text + entities and sent
+# with explicit entities, so the source formatting survives and nothing is
+# re-parsed per send.
+#
+# Telegram counts entity offsets in UTF-16 code units; a RichText keeps
+# them as Python string indexes (code points) while it is edited and
+# converts at the edges (from_message / to_entities).
+
+import copy
+from bisect import bisect_right
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from pyrogram.enums import MessageEntityType
+from pyrogram.types import MessageEntity
+
+# (start, end, entity) in code points
+Span = Tuple[int, int, MessageEntity]
+
+
+def _utf16_len(ch: str) -> int:
+    return 2 if ord(ch) > 0xFFFF else 1
+
+
+class RichText:
+    """Text with entities; edit() returns a new RichText, entities shifted."""
+
+    __slots__ = ("text", "spans")
+
+    def __init__(self, text: str = "", spans: Optional[List[Span]] = None):
+        self.text = text
+        self.spans = spans or []
+
+    @classmethod
+    def from_message(
+        cls,
+        text: str,
+        entities: Optional[Sequence[MessageEntity]]
+    ) -> "RichText":
+        """From a message's text / caption and its (UTF-16) entities."""
+        text = str(text or "")
+        if not entities:
+            return cls(text)
+        # code point index at every UTF-16 offset
+        index: List[int] = []
+        for i, ch in enumerate(text):
+            index.extend([i] * _utf16_len(ch))
+        index.append(len(text))
+        last = len(index) - 1
+        spans = [
+            (index[min(e.offset, last)], index[min(e.offset + e.length, last)], e)
+            for e in entities
+        ]
+        return cls(text, [s for s in spans if s[1] > s[0]])
+
+    def to_entities(self) -> List[MessageEntity]:
+        """Entities with UTF-16 offsets, for caption_entities / entities."""
+        if not self.spans:
+            return []
+        offsets = [0]
+        for ch in self.text:
+            offsets.append(offsets[-1] + _utf16_len(ch))
+        entities = []
+        for start, end, entity in sorted(self.spans, key=lambda s: (s[0], -s[1])):
+            entity = copy.copy(entity)
+            entity.offset = offsets[start]
+            entity.length = offsets[end] - offsets[start]
+            entities.append(entity)
+        return entities
+
+    def without(self, *types: MessageEntityType) -> "RichText":
+        return RichText(self.text, [s for s in self.spans if s[2].type not in types])
+
+    def edit(self, edits: Iterable[Tuple[int, int, Union[str, "RichText"]]]) -> "RichText":
+        """
+        Replace text ranges. `edits` are (start, end, new) sorted and not
+        overlapping; `new` may carry entities of its own. An entity that
+        starts or ends inside a replaced range is stretched to cover the
+        replacement; one that ends up empty is dropped.
+        """
+        edits = list(edits)
+        if not edits:
+            return self
+
+        text = self.text
+        pieces: List[str] = []
+        starts: List[int] = []          # old start of each edit
+        ends: List[int] = []            # old end
+        new_starts: List[int] = []
+        new_ends: List[int] = []
+        inserted: List[Span] = []
+        pos = length = 0
+        for start, end, new in edits:
+            pieces.append(text[pos:start])
+            length += start - pos
+            new_text = new.text if isinstance(new, RichText) else new
+            if isinstance(new, RichText):
+                inserted.extend((length + s, length + e, ent) for s, e, ent in new.spans)
+            starts.append(start)
+            ends.append(end)
+            new_starts.append(length)
+            pieces.append(new_text)
+            length += len(new_text)
+            new_ends.append(length)
+            pos = end
+        pieces.append(text[pos:])
+
+        def moved(p: int, is_start: bool) -> int:
+            i = bisect_right(starts, p) - 1
+            if i < 0:
+                return p
+            start, end = starts[i], ends[i]
+            if p == start and start == end:
+                # insertion point: the inserted text stays outside
+                return new_ends[i] if is_start else new_starts[i]
+            if p == start:
+                return new_starts[i]
+            if p < end:
+                return new_starts[i] if is_start else new_ends[i]
+            return new_ends[i] + (p - end)
+
+        spans = []
+        for start, end, entity in self.spans:
+            start, end = moved(start, True), moved(end, False)
+            if end > start:
+                spans.append((start, end, entity))
+        return RichText("".join(pieces), spans + inserted)
+
+    def strip(self) -> "RichText":
+        text = self.text
+        stripped = text.strip()
+        if not stripped:
+            return RichText()
+        lead = len(text) - len(text.lstrip())
+        trail = lead + len(stripped)
+        edits = []
+        if lead:
+            edits.append((0, lead, ""))
+        if trail < len(text):
+            edits.append((trail, len(text), ""))
+        return self.edit(edits)
+
+
+# ---------- HTML (caption templates) ----------
+
+_HTML_TAGS: Dict[str, MessageEntityType] = {
+    "b": MessageEntityType.BOLD,
+    "strong": MessageEntityType.BOLD,
+    "i": MessageEntityType.ITALIC,
+    "em": MessageEntityType.ITALIC,
+    "u": MessageEntityType.UNDERLINE,
+    "ins": MessageEntityType.UNDERLINE,
+    "s": MessageEntityType.STRIKETHROUGH,
+    "strike": MessageEntityType.STRIKETHROUGH,
+    "del": MessageEntityType.STRIKETHROUGH,
+    "code": MessageEntityType.CODE,
+    "pre": MessageEntityType.PRE,
+    "a": MessageEntityType.TEXT_LINK,
+    "spoiler": MessageEntityType.SPOILER,
+    "tg-spoiler": MessageEntityType.SPOILER,
+    "blockquote": MessageEntityType.BLOCKQUOTE,
+}
+
+
+class _TemplateParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces: List[str] = []
+        self.length = 0
+        self.open: List[Tuple[str, int, Dict[str, Any]]] = []
+        self.spans: List[Span] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag == "br":
+            self.handle_data("\n")
+        elif tag in _HTML_TAGS:
+            self.open.append((tag, self.length, dict(attrs)))
+
+    def handle_endtag(self, tag: str) -> None:
+        for i in range(len(self.open) - 1, -1, -1):
+            if self.open[i][0] == tag:
+                _, start, attrs = self.open.pop(i)
+                if self.length > start:
+                    entity = MessageEntity(type=_HTML_TAGS[tag], offset=0, length=0)
+                    if tag == "a":
+                        entity.url = attrs.get("href") or ""
+                    elif tag == "pre":
+                        entity.language = attrs.get("language")
+                    self.spans.append((start, self.length, entity))
+                return
+
+    def handle_data(self, data: str) -> None:
+        self.pieces.append(data)
+        self.length += len(data)
+
+
+def parse_html(markup: str) -> RichText:
+    """
+    Telegram-style HTML (b, i, u, s, code, pre, a, spoiler, blockquote) to
+    a RichText. Unknown tags are dropped, their text is kept.
+    """
+    parser = _TemplateParser()
+    parser.feed(markup)
+    parser.close()
+    return RichText("".join(parser.pieces), parser.spans)
@@ -1,68 +1,211 @@
 # core/filters.py
 
 import re
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
 from pyrogram.types import Message
 from pyrogram.enums import MessageMediaType
 
 
+# Filter settings of a target are compiled once into a FilterProgram:
+#   block words + whitelist  one regex, a trie of the lower-cased words so
+#                            each text position costs one walk down the
+#                            trie, matched in a single pass over the text
+#   media types              a bitset over MessageMediaType
+# Programs are cached by the filter settings themselves, so changed
+# settings simply compile a new program.
+
+PROGRAM_CACHE_SIZE = 256
+
+MEDIA_BITS = {t.value: 1 << i for i, t in enumerate(MessageMediaType)}
+
+
+def trie_pattern(words: List[str], longest: bool = False) -> str:
+    """
+    Regex matching any of `words` at one position, with common prefixes
+    factored out. By default a word that is a prefix of others ends the
+    branch (the shorter one already matches); `longest` keeps the longer
+    words and matches the longest one.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            if "" in node and not longest:
+                break
+            node = node.setdefault(ch, {})
+        else:
+            if not longest:
+                node.clear()
+            node[""] = {}
+    return _node_pattern(trie)
+
+
+def _node_pattern(node: Dict[str, Any]) -> str:
+    parts = []
+    while True:
+        end = "" in node
+        children = sorted(ch for ch in node if ch)
+        if not children:
+            break
+        if len(children) == 1 and not end:
+            # plain run of characters, no group needed
+            parts.append(re.escape(children[0]))
+            node = node[children[0]]
+            continue
+        group = "(?:" + "|".join(re.escape(ch) + _node_pattern(node[ch]) for ch in children) + ")"
+        parts.append(group + "?" if end else group)
+        break
+    return "".join(parts)
+
+
+class FilterProgram:
+    """A target's filter settings, compiled. Build with compile_filters()."""
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.media_mask = 0
+        for media_type in settings.get("media_types", []):
+            self.media_mask |= MEDIA_BITS.get(media_type, 0)
+
+        # lower-cased word → word as configured (for the skip reason)
+        self.block_words = {w.lower(): w for w in reversed(settings.get("block_words", []))}
+        self.whitelist_mode = settings.get("whitelist_mode", False)
+        whitelist = [w.lower() for w in settings.get("whitelist", [])] if self.whitelist_mode else []
+        self.whitelist_empty = self.whitelist_mode and not whitelist
+
+        self.block = re.compile(trie_pattern(list(self.block_words))) if self.block_words else None
+        self.white = re.compile(trie_pattern(whitelist)) if whitelist else None
+        # Both lists: a lookahead tries the block words, then the whitelist,
+        # at every position of the text
+        self.both = None
+        if self.block and self.white:
+            self.both = re.compile(
+                f"(?=(?P<block>{self.block.pattern})|(?P<white>{self.white.pattern}))"
+            )
+
+    def media_allowed(self, message: Message) -> bool:
+        return bool(MEDIA_BITS.get(message.media.value, 0) & self.media_mask)
+
+    def check_message(self, message: Message) -> tuple[bool, str]:
+        """
+        Check if a message should be forwarded based on all filters.
+        Returns (should_process: bool, reason: str)
+        """
+
+        # 1. Empty / deleted message
+        if message.empty:
+            return False, "deleted"
+
+        # 2. Media Type Filter (pure text messages always pass it)
+        if message.media and not self.media_allowed(message):
+            return False, f"media_type:{message.media.value}"
+
+        # 3. Word filters on the caption / text
+        return self.check_text(message.caption or message.text or "")
+
+    def check_text(self, text_content: str) -> tuple[bool, str]:
+        """
+        Block-word and whitelist checks on a caption / text, in one pass.
+        Returns (should_process: bool, reason: str)
+        """
+        text_lower = text_content.lower() if text_content else ""
+
+        # 4. Block Words (and the first whitelist hit on the way)
+        whitelisted = False
+        if text_lower:
+            blocked = None
+            if self.both:
+                for match in self.both.finditer(text_lower):
+                    blocked = match.group("block")
+                    if blocked is not None:
+                        break
+                    # Whitelisted: only block words can still matter
+                    whitelisted = True
+                    found = self.block.search(text_lower, match.start() + 1)
+                    blocked = found.group() if found else None
+                    break
+            elif self.block:
+                found = self.block.search(text_lower)
+                blocked = found.group() if found else None
+            elif self.white:
+                whitelisted = self.white.search(text_lower) is not None
+            if blocked is not None:
+                return False, f"blocked_word:{self.block_words[blocked]}"
+
+        # 5. Whitelist Mode
+        if self.whitelist_mode:
+            if self.whitelist_empty:
+                # Whitelist mode ON but empty list → block everything
+                return False, "whitelist_empty"
+            if not text_lower:
+                # No text + whitelist mode → usually skip
+                return False, "whitelist_no_text"
+            if not whitelisted:
+                return False, "whitelist_miss"
+
+        return True, "ok"
+
+    def filter_album(self, messages: List[Message]) -> tuple[List[Message], str]:
+        """
+        Filter an album as one unit.
+        Word filters run once on the album caption (Telegram keeps it on one item),
+        the media type filter runs per item.
+        Returns (items to forward, reason) – an empty list means skip the album.
+        """
+        caption = next((m.caption for m in messages if m.caption), "")
+        ok, reason = self.check_text(caption)
+        if not ok:
+            return [], reason
+
+        kept = [m for m in messages if not m.empty and m.media and self.media_allowed(m)]
+        if not kept:
+            return [], "media_type:album"
+        return kept, "ok"
+
+
+_programs: "OrderedDict[Tuple, FilterProgram]" = OrderedDict()
+
+
+def compile_filters(settings: Dict[str, Any]) -> FilterProgram:
+    """The compiled filters for a target's settings (cached, LRU)."""
+    key = (
+        tuple(settings.get("media_types", [])),
+        tuple(settings.get("block_words", [])),
+        bool(settings.get("whitelist_mode", False)),
+        tuple(settings.get("whitelist", [])),
+    )
+    program = _programs.get(key)
+    if program is None:
+        program = _programs[key] = FilterProgram(settings)
+        if len(_programs) > PROGRAM_CACHE_SIZE:
+            _programs.popitem(last=False)
+    else:
+        _programs.move_to_end(key)
+    return program
+
+
 def should_process_message(message: Message, settings: Dict[str, Any]) -> tuple[bool, str]:
     """
     Check if a message should be forwarded based on all filters.
     Returns (should_process: bool, reason: str)
     """
+    return compile_filters(settings).check_message(message)
 
-    # 1. Empty / deleted message
-    if message.empty:
-        return False, "deleted"
 
-    # 2. Media Type Filter
-    allowed_media = settings.get("media_types", [])
-    if message.media:
-        media_type = message.media.value  # e.g. "photo", "video", "document"
-        if media_type not in allowed_media:
-            return False, f"media_type:{media_type}"
-    else:
-        # Pure text message
-        if "text" not in allowed_media and not any(
-            t in allowed_media for t in ["photo", "video", "document", "audio", "sticker"]
-        ):
-            # If user only selected media types and this is pure text → skip
-            # (optional strictness)
-            pass
-
-    # 3. Get text content for word filters
-    text_content = ""
-    if message.caption:
-        text_content = message.caption
-    elif message.text:
-        text_content = message.text
-
-    text_lower = text_content.lower() if text_content else ""
-
-    # 4. Block Words
-    block_words = settings.get("block_words", [])
-    if block_words and text_lower:
-        for word in block_words:
-            if word.lower() in text_lower:
-                return False, f"blocked_word:{word}"
-
-    # 5. Whitelist Mode
-    if settings.get("whitelist_mode", False):
-        whitelist = settings.get("whitelist", [])
-        if not whitelist:
-            # Whitelist mode ON but empty list → block everything
-            return False, "whitelist_empty"
+def check_text_filters(text_content: str, settings: Dict[str, Any]) -> tuple[bool, str]:
+    """
+    Block-word and whitelist checks on a caption / text.
+    Returns (should_process: bool, reason: str)
+    """
+    return compile_filters(settings).check_text(text_content)
 
-        if text_lower:
-            matched = any(w.lower() in text_lower for w in whitelist)
-            if not matched:
-                return False, "whitelist_miss"
-        else:
-            # No text + whitelist mode → usually skip
-            return False, "whitelist_no_text"
 
-    return True, "ok"
+def filter_media_group(
+    messages: List[Message],
+    settings: Dict[str, Any]
+) -> tuple[List[Message], str]:
+    """Filter an album as one unit (see FilterProgram.filter_album)."""
+    return compile_filters(settings).filter_album(messages)
 
 
 def get_unique_file_id(message: Message) -> Optional[str]:
@@ -3,28 +3,70 @@
 
 import asyncio
 import logging
-from typing import Dict, Any, Optional, AsyncGenerator, Union, List, Callable, Awaitable, Tuple
+import time
+from collections import deque
+from enum import Enum
+from typing import Dict, Any, Optional, AsyncGenerator, Union, List, Set, Callable, Awaitable, Tuple, Deque
 
 from pyrogram import Client
-from pyrogram.types import Message
+from pyrogram.types import (
+    Message, InputMediaPhoto, InputMediaVideo,
+    InputMediaDocument, InputMediaAudio
+)
 from pyrogram.errors import (
     FloodWait, SlowmodeWait, 
-    UserDeactivated, AuthKeyUnregistered, SessionRevoked
+    UserDeactivated, AuthKeyUnregistered, SessionRevoked,
+    ChatWriteForbidden, ChannelPrivate, UserBannedInChannel, ChatAdminRequired
 )
 from pyrogram.enums import ParseMode
 
-from database import (
-    update_job_stats, set_job_status,
-    increment_account_forwarded, increment_stats,
-    JobStatus, AccountStatus
-)
-from core.filters import should_process_message
-from core.caption import process_caption, build_inline_keyboard
-from core.anti_duplicate import check_and_mark_duplicate
+from config import Config
+from database import adb, JobStatus, AccountStatus, AccountStrategy, PoolStrategy
+from core.filters import get_unique_file_id
+from core.stats_buffer import stats_buffer
+from core.job_control import JobControl, job_controls
+from core.dup_cache import dup_cache
+from core.dup_store import local_dup_store
+from core.rate_limiter import rate_scheduler
+from core.target_profile import TargetProfile
+from core.anti_duplicate import resolve_new_unique_ids, mark_batch_forwarded
 
 logger = logging.getLogger(__name__)
 
 
+FETCH_BATCH_SIZE = 200
+BATCH_FORWARD_SIZE = 100      # Telegram accepts up to 100 ids per forward request
+
+# Pushed by the fetcher when the range is exhausted (or fetching failed)
+_END_OF_RANGE = object()
+
+# The sender can't post to the target (kicked, banned, lost its rights)
+_NO_WRITE_ACCESS = (ChatWriteForbidden, ChannelPrivate, UserBannedInChannel, ChatAdminRequired)
+
+
+class Delivery(Enum):
+    """Outcome of one send (FanOutRun._deliver)."""
+    DONE = "done"              # delivered, or failed and queued for a retry
+    DONE_STOP = "done_stop"    # delivered, but the run stops (limit hit, paused)
+    NOT_SENT = "not_sent"      # not delivered, the run stops: resume on it
+
+
+class PrefetchMetrics:
+    """How long the sender sat idle waiting for the fetcher."""
+
+    def __init__(self):
+        self.batches = 0
+        self.fetch_seconds = 0.0     # total time spent inside get_messages
+        self.wait_seconds = 0.0      # total time the consumer blocked on the queue
+        self.stalls = 0              # how many times the queue was empty on get
+
+    def summary(self) -> str:
+        return (
+            f"batches={self.batches} fetch={self.fetch_seconds:.1f}s "
+            f"sender_wait={self.wait_seconds:.1f}s stalls={self.stalls}"
+        )
+
+
 class ForwardStats:
     def __init__(self):
         self.fetched = 0
@@ -33,43 +75,1195 @@ class ForwardStats:
         self.skipped_filter = 0
         self.skipped_duplicate = 0
         self.errors = 0
+        self.prefetch = PrefetchMetrics()
 
 
-async def custom_iter_messages(
+async def _fetch_batches(
     client: Client,
     chat_id: Union[int, str],
     limit: int,
-    offset: int = 0
-) -> AsyncGenerator[Message, None]:
+    offset: int,
+    queue: asyncio.Queue,
+    metrics: PrefetchMetrics
+) -> None:
+    """
+    Producer side of custom_iter_messages.
+    Fetches 200-id batches and parks them on the bounded queue, so the next
+    get_messages round trip overlaps with the sends of the current batch.
+    """
     current = offset
     while True:
-        batch_size = min(200, limit - current)
+        batch_size = min(FETCH_BATCH_SIZE, limit - current)
         if batch_size <= 0:
-            return
+            break
 
         message_ids = list(range(current + 1, current + batch_size + 1))
+        started = time.monotonic()
         try:
             messages = await client.get_messages(chat_id, message_ids)
         except Exception as e:
             logger.error(f"Error fetching messages: {e}")
-            return
+            break
+        metrics.fetch_seconds += time.monotonic() - started
+        metrics.batches += 1
 
         if not isinstance(messages, list):
             messages = [messages]
 
-        for msg in messages:
-            if msg is None or getattr(msg, "empty", False):
-                current += 1
+        await queue.put(messages)
+        current += batch_size
+
+    await queue.put(_END_OF_RANGE)
+
+
+async def custom_iter_messages(
+    client: Client,
+    chat_id: Union[int, str],
+    limit: int,
+    offset: int = 0,
+    prefetch: int = Config.PREFETCH_BATCHES,
+    metrics: Optional[PrefetchMetrics] = None
+) -> AsyncGenerator[Message, None]:
+    """
+    Yield messages offset+1 .. limit in order.
+    Up to `prefetch` batches are fetched ahead of the consumer.
+    """
+    metrics = metrics or PrefetchMetrics()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, prefetch))
+    producer = asyncio.create_task(
+        _fetch_batches(client, chat_id, limit, offset, queue, metrics)
+    )
+
+    try:
+        while True:
+            if queue.empty():
+                metrics.stalls += 1
+            started = time.monotonic()
+            batch = await queue.get()
+            metrics.wait_seconds += time.monotonic() - started
+
+            if batch is _END_OF_RANGE:
+                return
+
+            for msg in batch:
+                if msg is None or getattr(msg, "empty", False):
+                    continue
+                yield msg
+    finally:
+        # Consumer stopped early (cancel / pause / crash) → stop fetching too
+        producer.cancel()
+
+
+class TargetLane:
+    """One target of a fan-out run: its profile, resume cursor and stats."""
+
+    def __init__(self, target: Dict[str, Any], cursor: int):
+        self.chat_id = target["chat_id"]
+        # Prepared settings; replaced as a whole when they change
+        self.profile = TargetProfile.build(target)
+        self.cursor = cursor          # last source msg id handled for this target
+        self.saved_cursor = cursor    # last cursor written to the job document
+        self.stats = ForwardStats()
+
+        # Batch mode (profile.batch_mode): ids waiting for one forward call
+        self.pending: List[Message] = []
+        self.pending_unique_ids: List[str] = []
+
+        # Anti-duplicate, resolved once per fetch batch: ids of the current
+        # batch not forwarded yet, and ids sent but not recorded yet
+        self.new_unique_ids: Set[str] = set()
+        self.sent_unique_ids: List[str] = []
+
+        # Sends awaiting Telegram, oldest first: (first msg id, task).
+        # Committed strictly in this order (FanOutRun._commit)
+        self.in_flight: Deque[Tuple[int, asyncio.Future]] = deque()
+        # First msg ids of sends retrying after a FloodWait, and of sends
+        # held behind them; later sends to this target wait until they are
+        # through (`released` is set whenever one leaves)
+        self.flooded: Set[int] = set()
+        self.held: Set[int] = set()
+        self.released = asyncio.Event()
+
+        # Failed sends not written to the retry queue yet (job runs only)
+        self.failed: List[int] = []
+        self.failed_error = ""
+
+    def safe_cursor(self) -> int:
+        """Highest msg id that may be persisted: nothing unsent at or below it."""
+        safe = self.cursor
+        if self.pending:
+            safe = min(safe, self.pending[0].id - 1)
+        if self.in_flight:
+            safe = min(safe, self.in_flight[0][0] - 1)
+        if self.failed:
+            # overlapping sends fail out of order
+            safe = min(safe, min(self.failed) - 1)
+        return safe
+
+
+async def _send_message(
+    client: Client,
+    source_chat_id: Union[int, str],
+    lane: TargetLane,
+    message: Message
+) -> None:
+    """Deliver a single source message to the lane's target chat."""
+    target_chat_id = lane.chat_id
+
+    if lane.profile.forward_tag:
+        await client.forward_messages(
+            chat_id=target_chat_id,
+            from_chat_id=source_chat_id,
+            message_ids=message.id
+        )
+        return
+
+    # Sent with explicit entities: formatting kept, nothing parsed
+    final_caption = lane.profile.caption(message)
+    caption = final_caption.text if final_caption else None
+    entities = final_caption.to_entities() if final_caption else None
+    reply_markup = lane.profile.keyboard
+
+    if message.media:
+        media = getattr(message, message.media.value, None)
+        if media and hasattr(media, "file_id"):
+            await client.send_cached_media(
+                chat_id=target_chat_id,
+                file_id=media.file_id,
+                caption=caption,
+                parse_mode=ParseMode.DISABLED,
+                caption_entities=entities,
+                reply_markup=reply_markup
+            )
+        else:
+            await client.copy_message(
+                chat_id=target_chat_id,
+                from_chat_id=source_chat_id,
+                message_id=message.id,
+                caption=caption,
+                parse_mode=ParseMode.DISABLED,
+                caption_entities=entities,
+                reply_markup=reply_markup
+            )
+    else:
+        if final_caption is None:
+            caption, entities = message.text or "", message.entities
+        await client.send_message(
+            chat_id=target_chat_id,
+            text=caption,
+            parse_mode=ParseMode.DISABLED,
+            entities=entities,
+            reply_markup=reply_markup,
+            disable_web_page_preview=True
+        )
+
+
+_ALBUM_INPUT_TYPES = {
+    "photo": InputMediaPhoto,
+    "video": InputMediaVideo,
+    "document": InputMediaDocument,
+    "audio": InputMediaAudio,
+}
+
+
+async def _send_album(
+    client: Client,
+    source_chat_id: Union[int, str],
+    lane: TargetLane,
+    items: List[Message]
+) -> None:
+    """
+    Deliver an album with a single request.
+    The (processed) caption goes on the first item only; albums can't carry
+    inline buttons, so those are dropped.
+    """
+    target_chat_id = lane.chat_id
+
+    if lane.profile.forward_tag:
+        await client.forward_messages(
+            chat_id=target_chat_id,
+            from_chat_id=source_chat_id,
+            message_ids=[m.id for m in items]
+        )
+        return
+
+    carrier = next((m for m in items if m.caption), items[0])
+    final_caption = lane.profile.caption(carrier)
+    caption = final_caption.text if final_caption else ""
+    entities = final_caption.to_entities() if final_caption else None
+
+    media = []
+    for m in items:
+        kind = m.media.value
+        input_cls = _ALBUM_INPUT_TYPES.get(kind)
+        file = getattr(m, kind, None)
+        if input_cls is None or file is None:
+            break
+        first = not media
+        media.append(input_cls(
+            file.file_id,
+            caption=caption if first else "",
+            parse_mode=ParseMode.DISABLED,
+            caption_entities=entities if first else None
+        ))
+    else:
+        await client.send_media_group(chat_id=target_chat_id, media=media)
+        return
+
+    # Media kind that Telegram doesn't allow in albums → send item by item
+    for m in items:
+        await _send_message(client, source_chat_id, lane, m)
+
+
+async def group_media(
+    messages: AsyncGenerator[Message, None]
+) -> AsyncGenerator[List[Message], None]:
+    """
+    Collect consecutive messages that share a media_group_id into one unit.
+    Everything else is yielded as a unit of one.
+    """
+    album: List[Message] = []
+    async for msg in messages:
+        group_id = getattr(msg, "media_group_id", None)
+        if album and group_id != album[0].media_group_id:
+            yield album
+            album = []
+        if group_id:
+            album.append(msg)
+            continue
+        yield [msg]
+
+    if album:
+        yield album
+
+
+class Shard:
+    """A client sending for a run: one of the job's bots or accounts."""
+
+    def __init__(
+        self,
+        client: Client,
+        account_id: Optional[str] = None,
+        bot_id: Optional[str] = None
+    ):
+        self.client = client
+        self.account_id = account_id
+        self.bot_id = bot_id
+        self.uncredited = 0           # sends not yet booked on the account / bot
+        self.no_access: Set[int] = set()   # target chats it can't post to
+
+    @property
+    def label(self) -> str:
+        return f"bot {self.bot_id}" if self.bot_id else f"account {self.account_id}"
+
+
+class FanOutRun:
+    """
+    State of one forward_to_targets() call: the sending shards (one client,
+    which can change on account rotation, or several accounts in parallel
+    mode), the target lanes and unsaved progress.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        user_id: int,
+        source_chat_id: Union[int, str],
+        lanes: List[TargetLane],
+        cancel_flag: Optional[Dict] = None,
+        job_id: Optional[str] = None,
+        account_id: Optional[str] = None,
+        account_ids: Optional[List[str]] = None,
+        strategy: str = "sequential",
+        get_new_client_callback: Optional[
+            Callable[[int, List[str], str], Awaitable[Tuple[Optional[Client], Optional[str]]]]
+        ] = None,
+        control: Optional[JobControl] = None,
+        bot_id: Optional[str] = None,
+        shards: Optional[List[Shard]] = None,
+        pool_strategy: str = PoolStrategy.CAPACITY.value,
+    ):
+        self.reader = client          # fetches the source; used if no shard is left
+        self.user_id = user_id
+        self.source_chat_id = source_chat_id
+        self.lanes = lanes
+        self.cancel = cancel_flag or {}
+        self.control = control
+        self.job_id = job_id
+        self.account_ids = account_ids
+        self.strategy = strategy
+        self.get_new_client_callback = get_new_client_callback
+
+        # Parallel mode (several accounts, or a bot pool): every message goes
+        # out through one of the shards, picked by pool_strategy; each target
+        # still receives its messages in order
+        self.parallel = strategy == AccountStrategy.PARALLEL.value or bool(shards)
+        self.shards = [Shard(client, account_id, bot_id)] + list(shards or [])
+        self.pool_strategy = pool_strategy
+        self.next_shard = 0           # round-robin position
+
+        self.results = {lane.chat_id: lane.stats for lane in lanes}
+        self.target_inc: Dict[int, Dict[str, int]] = {}
+        self.last_retry_scan: Optional[float] = None
+        self.last_profile_check: Optional[float] = None
+
+    @property
+    def client(self) -> Client:
+        return self.shards[0].client if self.shards else self.reader
+
+    # ---------- progress ----------
+
+    def _bump(self, lane: TargetLane, key: str, count: int = 1) -> None:
+        inc = self.target_inc.setdefault(lane.chat_id, {})
+        inc[key] = inc.get(key, 0) + count
+
+    async def persist(self, fetched: int = 0) -> None:
+        """Hand pending counters and advanced cursors to the stats buffer."""
+        if not self.job_id:
+            self.target_inc = {}
+            return
+
+        cursors = {}
+        for lane in self.lanes:
+            safe = lane.safe_cursor()
+            if safe != lane.saved_cursor:
+                cursors[lane.chat_id] = safe
+                lane.saved_cursor = safe
+
+        if not (fetched or self.target_inc or cursors):
+            return
+
+        await stats_buffer.add_job(
+            self.user_id, self.job_id,
+            {"fetched": fetched} if fetched else {},
+            current_msg_id=min(lane.saved_cursor for lane in self.lanes),
+            target_increments=self.target_inc,
+            target_cursors=cursors
+        )
+        self.target_inc = {}
+
+    async def _sleep(self, seconds: float) -> None:
+        """Sleep, but wake up at once if the job gets paused / cancelled."""
+        if self.control:
+            await self.control.sleep(seconds)
+        elif seconds > 0:
+            await asyncio.sleep(seconds)
+
+    async def _permit(self, lane: TargetLane) -> Optional[Shard]:
+        """
+        Wait for a send permit (shared client + chat token buckets) on the
+        shard that gets one first. None → no shard left.
+        """
+        if not self.shards:
+            return None
+        shard = self.shards[0]
+        if len(self.shards) > 1:
+            shard = self._pick_shard(lane)
+        wait = rate_scheduler.reserve(shard.client, lane.chat_id, lane.profile.rate)
+        if wait > 0:
+            await self._sleep(wait)
+        return shard
+
+    def _pick_shard(self, lane: TargetLane) -> Shard:
+        """
+        capacity:    the shard whose permit comes first
+        round_robin: the next shard in turn that can send right away
+        A flood-limited shard has no permit for a while, so both fail over.
+        Shards that lost access to the target are skipped (unless all did:
+        the send then fails into the retry queue).
+        """
+        rate = lane.profile.rate
+        usable = [s for s in self.shards if lane.chat_id not in s.no_access] or self.shards
+        waits = [
+            rate_scheduler.peek(s.client, lane.chat_id, rate) if s in usable else float("inf")
+            for s in self.shards
+        ]
+        if self.pool_strategy == PoolStrategy.ROUND_ROBIN.value:
+            count = len(self.shards)
+            for step in range(count):
+                i = (self.next_shard + step) % count
+                if waits[i] == 0:
+                    self.next_shard = i + 1
+                    return self.shards[i]
+        return self.shards[waits.index(min(waits))]
+
+    def _stopped(self) -> bool:
+        return bool(self.control and self.control.stopped)
+
+    def _fail(self, lane: TargetLane, items: List[Message], error: Any) -> None:
+        """Count undelivered messages; job runs queue them for a retry."""
+        lane.stats.errors += len(items)
+        self._bump(lane, "errors", len(items))
+        if self.job_id:
+            lane.failed.extend(m.id for m in items)
+            lane.failed_error = str(error)
+
+    def _lose_access(self, shard: Shard, lane: TargetLane, e: Exception) -> bool:
+        """
+        The shard can't post to the lane's target: leave the target to the
+        other shards of the run. False → no other shard can post there.
+        """
+        others = [s for s in self.shards if s is not shard and lane.chat_id not in s.no_access]
+        if not others:
+            return False
+        shard.no_access.add(lane.chat_id)
+        logger.warning(
+            f"{shard.label} can't post to {lane.chat_id} ({type(e).__name__}), "
+            f"{len(others)} other shard(s) take over"
+        )
+        return True
+
+    def _flood(self, shard: Shard, lane: TargetLane, e: Exception, what: str) -> None:
+        """Back off the client / chat rates; the next permit waits out e.value."""
+        rate_scheduler.on_flood(
+            shard.client, lane.chat_id, e.value, slowmode=isinstance(e, SlowmodeWait)
+        )
+        logger.warning(
+            f"{type(e).__name__} {e.value}s on {what} → {lane.chat_id} "
+            f"({shard.label}), retrying"
+        )
+
+    # ---------- learned rates ----------
+
+    async def _sender_doc(self, shard: Shard) -> Optional[Dict[str, Any]]:
+        if shard.account_id:
+            return await adb.get_account(self.user_id, shard.account_id)
+        if shard.bot_id:
+            return await adb.get_bot(self.user_id, shard.bot_id)
+        return None
+
+    async def load_rates(self, shard: Optional[Shard] = None) -> None:
+        """Start at the rates the bot / accounts learned before."""
+        for shard in [shard] if shard else self.shards:
+            try:
+                rate_scheduler.seed(shard.client, await self._sender_doc(shard))
+            except Exception as e:
+                logger.warning(f"Could not load send rates: {e}")
+
+    async def save_rates(self, shard: Optional[Shard] = None) -> None:
+        """Store the current bot / account rates for the next run."""
+        chat_ids = [lane.chat_id for lane in self.lanes]
+        for shard in [shard] if shard else self.shards:
+            fields = rate_scheduler.learned(shard.client, chat_ids)
+            if not fields:
                 continue
-            yield msg
-            current += 1
+            try:
+                if shard.account_id:
+                    await adb.update_account(self.user_id, shard.account_id, fields)
+                elif shard.bot_id:
+                    await adb.update_bot(self.user_id, shard.bot_id, fields)
+            except Exception as e:
+                logger.warning(f"Could not save send rates: {e}")
 
+    # ---------- accounts ----------
 
-async def forward_messages(
+    async def _rotate_account(self, shard: Shard) -> bool:
+        """Switch a shard to the next available account. False if none is left."""
+        await self.flush_account_credit(shard)
+        if not (self.get_new_client_callback and self.account_ids):
+            return False
+        new_client, new_acc_id = await self.get_new_client_callback(
+            self.user_id, self.account_ids, self.strategy
+        )
+        if not (new_client and new_acc_id):
+            return False
+        await self.save_rates(shard)
+        shard.client = new_client
+        shard.account_id = new_acc_id
+        await self.load_rates(shard)
+        logger.info(f"Switched to account {new_acc_id}")
+        return True
+
+    async def _retire(self, shard: Shard) -> bool:
+        """
+        Take an exhausted / dead shard out of the run. Sequential mode rotates
+        it to the next account instead. False → no shard left.
+        """
+        if not self.parallel:
+            return await self._rotate_account(shard)
+        await self.flush_account_credit(shard)
+        await self.save_rates(shard)
+        if shard in self.shards:
+            self.shards.remove(shard)
+        logger.info(f"{shard.label} left the run, {len(self.shards)} shard(s) left")
+        return bool(self.shards) or await self.add_shards()
+
+    async def add_shards(self) -> bool:
+        """
+        Parallel mode: bring in job accounts that are available again (woke up
+        from their sleep cycle). Returns True if any shard is running.
+        """
+        if not (self.parallel and self.get_new_client_callback and self.account_ids):
+            return bool(self.shards)
+        await adb.wake_sleeping_accounts(self.user_id)
+        while True:
+            in_use = {s.account_id for s in self.shards}
+            free = [acc_id for acc_id in self.account_ids if acc_id not in in_use]
+            if not free:
+                break
+            new_client, new_acc_id = await self.get_new_client_callback(
+                self.user_id, free, self.strategy
+            )
+            if not (new_client and new_acc_id) or new_acc_id in in_use:
+                break
+            shard = Shard(new_client, new_acc_id)
+            self.shards.append(shard)
+            await self.load_rates(shard)
+            logger.info(f"Account {new_acc_id} joined the run ({len(self.shards)} shards)")
+        return bool(self.shards)
+
+    async def flush_account_credit(self, shard: Optional[Shard] = None) -> Optional[Dict[str, Any]]:
+        """Credit the sends not yet booked on a shard's account (all shards if None)."""
+        if shard is None:
+            for shard in self.shards:
+                await self.flush_account_credit(shard)
+            return None
+        count, shard.uncredited = shard.uncredited, 0
+        if not count:
+            return None
+        if shard.bot_id:
+            await adb.increment_bot_forwarded(self.user_id, shard.bot_id, count)
+            return None
+        if not shard.account_id:
+            return None
+        return await adb.increment_account_forwarded(self.user_id, shard.account_id, count)
+
+    async def _pause(self, reason: str) -> None:
+        logger.warning(f"{reason} → pausing job")
+        if self.control:
+            # Other sends in flight stop at their next permit
+            self.control.stop(JobStatus.PAUSED.value)
+        if self.job_id:
+            await adb.set_job_status(self.user_id, self.job_id, JobStatus.PAUSED.value, reason)
+
+    async def _credit(self, shard: Shard, lane: TargetLane, count: int) -> bool:
+        """Book `count` delivered messages. False → no account left, stop."""
+        await stats_buffer.add_entity(self.user_id, "target", str(lane.chat_id), {"forwarded": count})
+        if shard.bot_id:
+            await stats_buffer.add_entity(self.user_id, "bot", shard.bot_id, {"forwarded": count})
+            shard.uncredited += count
+            if shard.uncredited >= Config.ACCOUNT_CREDIT_BATCH:
+                await self.flush_account_credit(shard)
+            return True
+        if not shard.account_id:
+            return True
+
+        await stats_buffer.add_entity(self.user_id, "account", shard.account_id, {"forwarded": count})
+
+        # Credit the account every ACCOUNT_CREDIT_BATCH sends (1 = every send);
+        # the limit can be overshot by at most batch - 1 messages.
+        shard.uncredited += count
+        if shard.uncredited < Config.ACCOUNT_CREDIT_BATCH:
+            return True
+
+        # ---------- Account Limit + Rotation ----------
+        updated = await self.flush_account_credit(shard)
+        if updated and updated.get("status") == AccountStatus.SLEEPING.value:
+            logger.info(f"Account {shard.account_id} reached limit")
+            if not await self._retire(shard):
+                await self._pause("All accounts sleeping or unavailable")
+                return False
+        return True
+
+    async def _recover_dead_account(self, shard: Shard, e: Exception) -> bool:
+        logger.error(f"{shard.label} is dead: {e}")
+        # Otherwise it would be picked again by the next rotation / run
+        if shard.account_id:
+            await adb.set_account_status(
+                self.user_id, shard.account_id, AccountStatus.ERROR.value, str(e)
+            )
+        elif shard.bot_id:
+            await adb.update_bot(
+                self.user_id, shard.bot_id, {"status": "error", "error_message": str(e)}
+            )
+        if await self._retire(shard):
+            return True
+        await self._pause(f"Account error: {e}")
+        return False
+
+    # ---------- sending ----------
+
+    async def _deliver(
+        self,
+        lane: TargetLane,
+        items: List[Message],
+        unique_ids: Optional[List[str]] = None
+    ) -> Delivery:
+        """Send one message or one album."""
+        try:
+            return await self._deliver_in_turn(lane, items, unique_ids)
+        finally:
+            if items[0].id in lane.flooded:
+                lane.flooded.discard(items[0].id)
+                lane.released.set()
+
+    async def _wait_turn(self, lane: TargetLane, first_id: int) -> None:
+        """
+        Hold a send while an earlier send to the lane retries a FloodWait or
+        is held itself, so the held sends go out in source order.
+        """
+        def blocked() -> bool:
+            return any(i < first_id for i in lane.flooded | lane.held)
+
+        if not blocked():
+            return
+        lane.held.add(first_id)
+        try:
+            while blocked() and not self._stopped():
+                lane.released.clear()
+                await lane.released.wait()
+        finally:
+            lane.held.discard(first_id)
+            lane.released.set()
+
+    async def _deliver_in_turn(
+        self,
+        lane: TargetLane,
+        items: List[Message],
+        unique_ids: Optional[List[str]]
+    ) -> Delivery:
+        for attempt in range(Config.FLOOD_RETRIES + 1):
+            shard = await self._permit(lane)
+            if shard is not None:
+                await self._wait_turn(lane, items[0].id)
+            if shard is None or self._stopped():
+                # Not delivered → resume this target on it
+                lane.cursor = min(lane.cursor, items[0].id - 1)
+                return Delivery.NOT_SENT
+            try:
+                if len(items) == 1:
+                    await _send_message(shard.client, self.source_chat_id, lane, items[0])
+                else:
+                    await _send_album(shard.client, self.source_chat_id, lane, items)
+                break
+
+            except (FloodWait, SlowmodeWait) as e:
+                # Re-queued: the next permit waits out the flood, later
+                # sends to this target wait for this one
+                lane.flooded.add(items[0].id)
+                self._flood(shard, lane, e, f"message {items[0].id}")
+
+            except (UserDeactivated, AuthKeyUnregistered, SessionRevoked) as e:
+                if await self._recover_dead_account(shard, e):
+                    continue      # retry on another account
+                lane.cursor = min(lane.cursor, items[0].id - 1)
+                return Delivery.NOT_SENT
+
+            except _NO_WRITE_ACCESS as e:
+                if self._lose_access(shard, lane, e):
+                    continue      # retry on another shard
+                logger.error(f"Message {items[0].id} → {lane.chat_id}: {shard.label} can't post: {e}")
+                self._fail(lane, items, e)
+                return Delivery.DONE
+
+            except Exception as e:
+                logger.exception(f"Error on message {items[0].id} → {lane.chat_id}: {e}")
+                self._fail(lane, items, e)
+                return Delivery.DONE
+        else:
+            logger.error(f"Message {items[0].id} → {lane.chat_id}: still flood-limited, giving up")
+            self._fail(lane, items, "FloodWait")
+            return Delivery.DONE
+
+        rate_scheduler.on_success(shard.client, lane.chat_id)
+        if lane.profile.anti_dup and unique_ids:
+            lane.sent_unique_ids.extend(unique_ids)
+
+        count = len(items)
+        lane.stats.forwarded += count
+        self._bump(lane, "forwarded", count)
+        if await self._credit(shard, lane, count):
+            return Delivery.DONE
+        return Delivery.DONE_STOP
+
+    async def flush(self, lane: TargetLane) -> bool:
+        """Send the lane's pending batch with one forward_messages call."""
+        if not lane.pending:
+            return True
+
+        message_ids = [m.id for m in lane.pending]
+        sent = False
+        error: Any = "FloodWait"
+        for _ in range(Config.FLOOD_RETRIES + 1):
+            shard = await self._permit(lane)
+            if shard is None or self._stopped():
+                # Batch stays pending → the saved cursor stops before it
+                return False
+            try:
+                await shard.client.forward_messages(
+                    chat_id=lane.chat_id,
+                    from_chat_id=self.source_chat_id,
+                    message_ids=message_ids,
+                    hide_sender_name=not lane.profile.forward_tag
+                )
+                sent = True
+                rate_scheduler.on_success(shard.client, lane.chat_id)
+                break
+
+            except (FloodWait, SlowmodeWait) as e:
+                self._flood(shard, lane, e, f"batch of {len(message_ids)}")
+
+            except (UserDeactivated, AuthKeyUnregistered, SessionRevoked) as e:
+                if not await self._recover_dead_account(shard, e):
+                    return False
+
+            except _NO_WRITE_ACCESS as e:
+                if self._lose_access(shard, lane, e):
+                    continue      # retry on another shard
+                logger.error(f"Batch → {lane.chat_id}: {shard.label} can't post: {e}")
+                error = e
+                break
+
+            except Exception as e:
+                logger.exception(
+                    f"Error on batch {message_ids[0]}..{message_ids[-1]} → {lane.chat_id}: {e}"
+                )
+                error = e
+                break
+
+        count = len(message_ids)
+        batch = lane.pending
+        unique_ids = lane.pending_unique_ids
+        lane.pending = []
+        lane.pending_unique_ids = []
+
+        if not sent:
+            self._fail(lane, batch, error)
+            return True
+
+        if lane.profile.anti_dup and unique_ids:
+            lane.sent_unique_ids.extend(unique_ids)
+
+        lane.stats.forwarded += count
+        self._bump(lane, "forwarded", count)
+        return await self._credit(shard, lane, count)
+
+    # ---------- retry queue ----------
+
+    async def record_failures(self) -> None:
+        """Write the run's failed sends to the retry queue, one call per lane."""
+        for lane in self.lanes:
+            if lane.failed:
+                msg_ids, lane.failed = lane.failed, []
+                await adb.record_failed_sends(
+                    self.user_id, self.job_id, lane.chat_id, msg_ids, lane.failed_error
+                )
+
+    async def retry_failed(self, force: bool = False) -> bool:
+        """
+        Resend the due entries of the job's retry queue, up to 100 ids per
+        round. Runs at most every SEND_RETRY_SCAN_SECONDS unless forced.
+        False → stop the run.
+        """
+        if not self.job_id:
+            return True
+        now = asyncio.get_running_loop().time()
+        if not force and self.last_retry_scan is not None \
+                and now - self.last_retry_scan < Config.SEND_RETRY_SCAN_SECONDS:
+            return True
+        self.last_retry_scan = now
+
+        for lane in self.lanes:
+            while True:
+                msg_ids = await adb.get_due_failed_sends(self.job_id, lane.chat_id, BATCH_FORWARD_SIZE)
+                if not msg_ids:
+                    break
+                messages = await self._fetch_retries(lane, msg_ids)
+                if messages is None:
+                    # Source not readable right now; entries rescheduled
+                    return True
+                if not await self._resend(lane, msg_ids, messages):
+                    return False
+                if len(msg_ids) < BATCH_FORWARD_SIZE:
+                    break
+        return True
+
+    async def _fetch_retries(self, lane: TargetLane, msg_ids: List[int]) -> Optional[List[Message]]:
+        """
+        The source messages of due retry entries. None → not fetched: the
+        entries wait out a FloodWait, or count a failed attempt (backoff,
+        then dead letter) like a failed send.
+        """
+        try:
+            messages = await self.client.get_messages(self.source_chat_id, msg_ids)
+        except FloodWait as e:
+            logger.warning(f"FloodWait {e.value}s fetching retries for {lane.chat_id}, postponed")
+            await adb.postpone_failed_sends(self.job_id, lane.chat_id, msg_ids, e.value)
+            return None
+        except Exception as e:
+            logger.warning(f"Could not fetch retries for {lane.chat_id}: {e}")
+            await adb.record_failed_sends(self.user_id, self.job_id, lane.chat_id, msg_ids, str(e))
+            return None
+        return messages if isinstance(messages, list) else [messages]
+
+    async def _resend(self, lane: TargetLane, msg_ids: List[int], messages: List[Message]) -> bool:
+        """One retry round for a lane. The lane's cursor is left alone."""
+        live = [m for m in messages if m and not m.empty]
+        live_ids = {m.id for m in live}
+        resolved = [i for i in msg_ids if i not in live_ids]     # deleted meanwhile
+
+        new_ids = await resolve_new_unique_ids(
+            self.user_id, lane.chat_id, live, lane.profile.anti_dup
+        )
+        new_ids.difference_update(lane.pending_unique_ids)
+        resend: List[Message] = []
+        unique_ids: Dict[int, str] = {}
+        for m in live:
+            unique_id = get_unique_file_id(m) if lane.profile.anti_dup else None
+            if unique_id:
+                if unique_id not in new_ids:
+                    resolved.append(m.id)      # delivered by another message
+                    continue
+                new_ids.discard(unique_id)
+                unique_ids[m.id] = unique_id
+            resend.append(m)
+
+        cursor, attempted, keep_going = lane.cursor, [], True
+        if lane.profile.batch_mode and resend:
+            # Keep aside what the main pass has batched
+            held = lane.pending, lane.pending_unique_ids
+            keep_going = await self._resend_batch(lane, resend, unique_ids)
+            if keep_going:
+                attempted = resend
+            lane.pending, lane.pending_unique_ids = held
+        else:
+            async def _each():
+                for m in resend:
+                    yield m
+            async for unit in group_media(_each()):
+                ids = [unique_ids[m.id] for m in unit if m.id in unique_ids]
+                outcome = await self._deliver(lane, unit, ids)
+                if outcome is not Delivery.NOT_SENT:
+                    attempted.extend(unit)
+                if outcome is not Delivery.DONE:
+                    keep_going = False
+                    break
+        lane.cursor = cursor
+
+        failed = set(lane.failed)
+        resolved.extend(m.id for m in attempted if m.id not in failed)
+        await adb.resolve_failed_sends(self.job_id, lane.chat_id, resolved)
+        # Count the failed attempts right away: their ids are below the cursor
+        await self.record_failures()
+        return keep_going
+
+    async def _resend_batch(
+        self,
+        lane: TargetLane,
+        messages: List[Message],
+        unique_ids: Dict[int, str]
+    ) -> bool:
+        """
+        Forward `messages` in one call. If that fails, retry both halves, so
+        one bad message doesn't keep the rest of the batch from going out.
+        """
+        lane.pending = messages
+        lane.pending_unique_ids = [unique_ids[m.id] for m in messages if m.id in unique_ids]
+        before = len(lane.failed)
+        if not await self.flush(lane):
+            return False
+        if len(lane.failed) == before or len(messages) == 1:
+            return True
+
+        # Not an error of the batch as a whole: count the halves instead
+        del lane.failed[before:]
+        lane.stats.errors -= len(messages)
+        self._bump(lane, "errors", -len(messages))
+        middle = len(messages) // 2
+        return (
+            await self._resend_batch(lane, messages[:middle], unique_ids)
+            and await self._resend_batch(lane, messages[middle:], unique_ids)
+        )
+
+    async def process(self, unit: List[Message]) -> bool:
+        """
+        Evaluate one unit (a message, or an album) for every lane.
+        False → stop the run.
+        """
+        if self.parallel and len(self.lanes) > 1 and len(self.shards) > 1:
+            # Targets don't wait for each other; each one stays in order
+            results = await asyncio.gather(
+                *(self.process_lane(lane, unit) for lane in self.lanes)
+            )
+            return all(results)
+
+        for lane in self.lanes:
+            if not await self.process_lane(lane, unit):
+                return False
+        return True
+
+    async def process_lane(self, lane: TargetLane, unit: List[Message]) -> bool:
+        """Filter, de-duplicate and send one unit to one target. False → stop."""
+        is_album = len(unit) > 1
+        items = [m for m in unit if m.id > lane.cursor]
+        if not items:
+            return True
+
+        stats = lane.stats
+        stats.fetched += len(items)
+        lane.cursor = items[-1].id
+        self._bump(lane, "fetched", len(items))
+
+        # ----- Filters -----
+        if is_album:
+            kept, reason = lane.profile.filters.filter_album(items)
+        else:
+            should, reason = lane.profile.filters.check_message(items[0])
+            kept = items if should else []
+
+        dropped = len(items) - len(kept)
+        if dropped:
+            if reason == "deleted":
+                stats.skipped_deleted += dropped
+                self._bump(lane, "skipped_deleted", dropped)
+            else:
+                stats.skipped_filter += dropped
+                self._bump(lane, "skipped_filter", dropped)
+        if not kept:
+            return True
+
+        # ----- Anti-Duplicate -----
+        # Looked up for the whole fetch batch in resolve_duplicates();
+        # an id is taken out of the set once used, so the same file
+        # twice in one batch is sent only once.
+        fresh: List[Message] = []
+        fresh_ids: List[str] = []
+        for m in kept:
+            unique_id = get_unique_file_id(m) if lane.profile.anti_dup else None
+            if unique_id:
+                if unique_id not in lane.new_unique_ids:
+                    continue
+                lane.new_unique_ids.discard(unique_id)
+                fresh_ids.append(unique_id)
+            fresh.append(m)
+
+        duplicates = len(kept) - len(fresh)
+        if duplicates:
+            stats.skipped_duplicate += duplicates
+            self._bump(lane, "skipped_duplicate", duplicates)
+        if not fresh:
+            return True
+
+        # ==================== SEND ====================
+        if lane.profile.batch_mode:
+            # Never split an album over two forward calls
+            if len(lane.pending) + len(fresh) > BATCH_FORWARD_SIZE and not await self.flush(lane):
+                return False
+            lane.pending.extend(fresh)
+            lane.pending_unique_ids.extend(fresh_ids)
+            if len(lane.pending) >= BATCH_FORWARD_SIZE and not await self.flush(lane):
+                return False
+            return True
+
+        # Up to profile.window sends overlap. Permits are reserved in source
+        # order, but sends released together (a burst of tokens) may reach
+        # Telegram in any order; window 1 (the default) keeps strict order.
+        task = asyncio.ensure_future(self._deliver(lane, fresh, fresh_ids))
+        lane.in_flight.append((fresh[0].id, task))
+        return await self._commit(lane, keep=lane.profile.window - 1)
+
+    async def _commit(self, lane: TargetLane, keep: int = 0) -> bool:
+        """
+        Commit the lane's finished sends in source order until at most `keep`
+        are left in flight. A send still waiting (e.g. out a FloodWait) holds
+        back only the sends after it on this target. The cursor is rewound
+        only to a send that did not go out. False → stop the run.
+        """
+        while lane.in_flight:
+            first_id, task = lane.in_flight[0]
+            if not task.done():
+                if len(lane.in_flight) <= keep:
+                    return True
+                await asyncio.wait({task})
+            lane.in_flight.popleft()
+
+            error = None if task.cancelled() else task.exception()
+            if task.cancelled() or error is not None or task.result() is Delivery.NOT_SENT:
+                # Not committed → resume this target on it
+                lane.cursor = min(lane.cursor, first_id - 1)
+                if error is not None:
+                    raise error
+                return False
+            if task.result() is Delivery.DONE_STOP:
+                return False
+        return True
+
+    async def settle(self) -> bool:
+        """Wait for and commit every send in flight. False → stop the run."""
+        keep_going = True
+        for lane in self.lanes:
+            while lane.in_flight:
+                try:
+                    if not await self._commit(lane):
+                        keep_going = False
+                except Exception as e:
+                    logger.exception(f"Send to {lane.chat_id} failed: {e}")
+                    keep_going = False
+        return keep_going
+
+    def abort(self) -> None:
+        """Cancel the sends in flight (the run is being cancelled)."""
+        for lane in self.lanes:
+            for _, task in lane.in_flight:
+                task.cancel()
+
+    async def resolve_duplicates(self, units: List[List[Message]]) -> None:
+        """One duplicate lookup per lane for a whole fetch batch."""
+        for lane in self.lanes:
+            if not lane.profile.anti_dup:
+                continue
+            messages = [m for unit in units for m in unit if m.id > lane.cursor]
+            new_ids = await resolve_new_unique_ids(
+                self.user_id, lane.chat_id, messages, lane.profile.anti_dup
+            )
+            # still waiting in a forward batch → not in Mongo yet
+            lane.new_unique_ids = new_ids.difference(lane.pending_unique_ids)
+
+    async def mark_sent(self) -> None:
+        """Record everything sent since the last call, one write per lane."""
+        for lane in self.lanes:
+            if lane.sent_unique_ids:
+                unique_ids, lane.sent_unique_ids = lane.sent_unique_ids, []
+                await mark_batch_forwarded(
+                    self.user_id, lane.chat_id, unique_ids, lane.profile.dup_ttl_days
+                )
+
+    async def enforce_retention(self) -> None:
+        """Apply each target's dup_max_entries cap once per run."""
+        for lane in self.lanes:
+            profile = lane.profile
+            if not (profile.anti_dup and profile.dup_max_entries) or profile.dup_local_index:
+                continue
+            deleted = await adb.trim_duplicates(self.user_id, lane.chat_id, profile.dup_max_entries)
+            if deleted:
+                # Trimmed ids would stay "maybe" in the Bloom filter forever
+                dup_cache.drop(self.user_id, lane.chat_id)
+                logger.info(f"Trimmed {deleted} old duplicate records of {lane.chat_id}")
+
+    async def run(self, units: AsyncGenerator[List[Message], None]) -> bool:
+        """Consume the unit stream. Returns False if stopped early."""
+        if not await self.retry_failed(force=True):
+            return False
+
+        batch: List[List[Message]] = []
+        size = 0
+        async for unit in units:
+            batch.append(unit)
+            size += len(unit)
+            if size >= FETCH_BATCH_SIZE:
+                if not await self.run_batch(batch):
+                    return False
+                batch, size = [], 0
+
+        if batch and not await self.run_batch(batch):
+            return False
+
+        # End of range → send whatever is still batched
+        for lane in self.lanes:
+            if not await self.flush(lane):
+                await self.persist()
+                return False
+        await self.checkpoint()
+        return await self.retry_failed(force=True)
+
+    async def run_batch(self, units: List[List[Message]]) -> bool:
+        """Process about one fetch batch of units. False → stop the run."""
+        await self.resolve_duplicates(units)
+
+        for unit in units:
+            # ----- Cancel / Job status check -----
+            if self.cancel.get(self.user_id):
+                if self.job_id:
+                    await adb.set_job_status(self.user_id, self.job_id, JobStatus.CANCELLED.value)
+                return False
+
+            if self.control and self.control.stopped:
+                logger.info(f"Job {self.job_id} stopped ({self.control.reason})")
+                return False
+
+            keep_going = await self.process(unit)
+            await self.persist(fetched=len(unit))
+            if not keep_going:
+                return False
+
+        # Nothing in flight across a checkpoint or a retry round
+        if not await self.settle():
+            return False
+        await self.checkpoint()
+        if not await self.refresh_profiles():
+            return False
+        return await self.retry_failed()
+
+    async def checkpoint(self) -> None:
+        """
+        Make the run's progress durable: duplicate marks, failed sends,
+        per-target cursors and counters. Done once per fetch batch and
+        whenever the run ends.
+        """
+        await self.mark_sent()
+        await self.record_failures()
+        await self.persist()
+        if self.job_id:
+            await stats_buffer.flush()
+        if self.parallel and len(self.shards) < len(self.account_ids or []):
+            await self.add_shards()
+
+    async def refresh_profiles(self) -> bool:
+        """
+        Job runs: swap in a new profile for targets whose settings changed
+        (settings_version), at most every PROFILE_REFRESH_SECONDS. Called
+        between fetch batches, when nothing is in flight. False → stop.
+        """
+        if not self.job_id:
+            return True
+        now = asyncio.get_running_loop().time()
+        if self.last_profile_check is not None \
+                and now - self.last_profile_check < Config.PROFILE_REFRESH_SECONDS:
+            return True
+        self.last_profile_check = now
+
+        lanes = {lane.chat_id: lane for lane in self.lanes}
+        for target in await adb.get_targets(self.user_id, list(lanes)):
+            lane = lanes[target["chat_id"]]
+            if int(target.get("settings_version", 0)) == lane.profile.version:
+                continue
+            # A batch collected under the old settings goes out with them
+            if not await self.flush(lane):
+                return False
+            old, lane.profile = lane.profile, TargetProfile.build(target)
+            if lane.profile.anti_dup and (
+                not old.anti_dup or old.dup_local_index != lane.profile.dup_local_index
+            ):
+                await _open_dup_index(self.user_id, lane)
+            logger.info(
+                f"Job {self.job_id}: settings of target {lane.chat_id} changed "
+                f"(version {lane.profile.version})"
+            )
+        return True
+
+
+async def _open_dup_index(user_id: int, lane: TargetLane) -> None:
+    """
+    Open the on-disk index or warm the duplicate cache of an anti-duplicate
+    lane, so most lookups never reach Mongo.
+    """
+    if not lane.profile.anti_dup:
+        return
+    try:
+        if lane.profile.dup_local_index:
+            await local_dup_store.open(user_id, lane.chat_id)
+        else:
+            local_dup_store.release(user_id, lane.chat_id)
+            await dup_cache.load(user_id, lane.chat_id)
+    except Exception as e:
+        logger.warning(f"Duplicate index load failed for {lane.chat_id}: {e}")
+
+
+async def forward_to_targets(
     client: Client,
     user_id: int,
     source_chat_id: Union[int, str],
-    target: Dict[str, Any],
+    targets: List[Dict[str, Any]],
     last_msg_id: int,
     skip: int = 0,
     progress_message: Optional[Message] = None,
@@ -82,179 +1276,147 @@ async def forward_messages(
     get_new_client_callback: Optional[
         Callable[[int, List[str], str], Awaitable[Tuple[Optional[Client], Optional[str]]]]
     ] = None,
-):
-    settings = target.get("settings", {})
-    target_chat_id = target["chat_id"]
-    delay = float(settings.get("delay", 1.0))
-    forward_tag = settings.get("forward_tag", False)
-    anti_dup = settings.get("anti_duplicate", True)
-
-    stats = ForwardStats()
-    CANCEL = cancel_flag or {}
+    # Per-target resume points {chat_id: last handled msg id}; missing → skip
+    target_cursors: Optional[Dict[int, int]] = None,
+    # Stop token; registered here for job runs if the caller didn't pass one
+    control: Optional[JobControl] = None,
+    # Forward bot that owns `client` (its learned send rates are kept on it)
+    bot_id: Optional[str] = None,
+    # Parallel strategy / bot pool: more accounts or bots sending next to `client`
+    shards: Optional[List[Shard]] = None,
+    # How a message picks its shard (PoolStrategy)
+    pool_strategy: str = PoolStrategy.CAPACITY.value,
+) -> Dict[int, ForwardStats]:
+    """
+    Fan-out engine: the source range is fetched once and every message is
+    evaluated against each target's own settings, then sent to each target.
+    Returns {target_chat_id: ForwardStats}.
+    """
+    cursors = target_cursors or {}
+    lanes = [TargetLane(t, cursors.get(t["chat_id"], skip)) for t in targets]
+    if not lanes:
+        return {}
 
-    current_client = client
-    current_account_id = account_id
-
-    try:
-        async for message in custom_iter_messages(
-            current_client, source_chat_id, limit=last_msg_id, offset=skip
-        ):
-            # ----- Cancel / Job status check -----
-            if CANCEL.get(user_id):
-                if job_id:
-                    set_job_status(user_id, job_id, JobStatus.CANCELLED.value)
-                return stats
-
-            if job_id:
-                from database import get_job
-                fresh = get_job(user_id, job_id)
-                if not fresh or fresh.get("status") != JobStatus.RUNNING.value:
-                    logger.info(f"Job {job_id} stopped by user")
-                    return stats
-
-            stats.fetched += 1
-
-            # ----- Filters -----
-            should, reason = should_process_message(message, settings)
-            if not should:
-                if reason == "deleted":
-                    stats.skipped_deleted += 1
-                else:
-                    stats.skipped_filter += 1
-                if job_id:
-                    update_job_stats(user_id, job_id, {"fetched": 1}, current_msg_id=message.id)
-                continue
+    prefetch = PrefetchMetrics()
+    for lane in lanes:
+        lane.stats.prefetch = prefetch
 
-            # ----- Anti-Duplicate -----
-            is_dup = check_and_mark_duplicate(
-                user_id=user_id,
-                target_chat_id=target_chat_id,
-                message=message,
-                anti_duplicate_enabled=anti_dup
-            )
-            if is_dup:
-                stats.skipped_duplicate += 1
-                if job_id:
-                    update_job_stats(
-                        user_id, job_id,
-                        {"fetched": 1, "skipped_duplicate": 1},
-                        current_msg_id=message.id
-                    )
-                continue
+    for lane in lanes:
+        await _open_dup_index(user_id, lane)
 
-            final_caption = process_caption(message, settings)
-            reply_markup = build_inline_keyboard(settings)
+    own_control = control is None and job_id is not None
+    if own_control:
+        control = job_controls.register(user_id, job_id)
 
-            # ==================== SEND ====================
-            try:
-                if forward_tag:
-                    await current_client.forward_messages(
-                        chat_id=target_chat_id,
-                        from_chat_id=source_chat_id,
-                        message_ids=message.id
-                    )
-                else:
-                    if message.media:
-                        media = getattr(message, message.media.value, None)
-                        if media and hasattr(media, "file_id"):
-                            await current_client.send_cached_media(
-                                chat_id=target_chat_id,
-                                file_id=media.file_id,
-                                caption=final_caption,
-                                parse_mode=ParseMode.HTML,
-                                reply_markup=reply_markup
-                            )
-                        else:
-                            await current_client.copy_message(
-                                chat_id=target_chat_id,
-                                from_chat_id=source_chat_id,
-                                message_id=message.id,
-                                caption=final_caption,
-                                parse_mode=ParseMode.HTML,
-                                reply_markup=reply_markup
-                            )
-                    else:
-                        await current_client.send_message(
-                            chat_id=target_chat_id,
-                            text=final_caption or message.text or "",
-                            parse_mode=ParseMode.HTML,
-                            reply_markup=reply_markup,
-                            disable_web_page_preview=True
-                        )
-
-                stats.forwarded += 1
-
-                # ---------- Account Limit + Rotation ----------
-                if current_account_id:
-                    updated = increment_account_forwarded(user_id, current_account_id, 1)
-
-                    if updated and updated.get("status") == AccountStatus.SLEEPING.value:
-                        logger.info(f"Account {current_account_id} reached limit → rotating...")
-
-                        if get_new_client_callback and account_ids:
-                            new_client, new_acc_id = await get_new_client_callback(
-                                user_id, account_ids, strategy
-                            )
-                            if new_client and new_acc_id:
-                                current_client = new_client
-                                current_account_id = new_acc_id
-                                logger.info(f"Switched to account {new_acc_id}")
-                            else:
-                                logger.warning("No available accounts left → pausing job")
-                                if job_id:
-                                    set_job_status(
-                                        user_id, job_id,
-                                        JobStatus.PAUSED.value,
-                                        "All accounts sleeping or unavailable"
-                                    )
-                                return stats
-
-                # Stats update
-                if job_id:
-                    update_job_stats(
-                        user_id, job_id,
-                        {"fetched": 1, "forwarded": 1},
-                        current_msg_id=message.id
-                    )
-                increment_stats(user_id, "target", str(target_chat_id), {"forwarded": 1})
-                if current_account_id:
-                    increment_stats(user_id, "account", current_account_id, {"forwarded": 1})
+    run = FanOutRun(
+        client=client,
+        user_id=user_id,
+        source_chat_id=source_chat_id,
+        lanes=lanes,
+        cancel_flag=cancel_flag,
+        job_id=job_id,
+        account_id=account_id,
+        account_ids=account_ids,
+        strategy=strategy,
+        get_new_client_callback=get_new_client_callback,
+        control=control,
+        bot_id=bot_id,
+        shards=shards,
+        pool_strategy=pool_strategy,
+    )
+    await run.load_rates()
 
-            except (FloodWait, SlowmodeWait) as e:
-                wait = e.value
-                logger.warning(f"FloodWait {wait}s (account {current_account_id})")
-                await asyncio.sleep(wait)
+    # Start at the slowest target; the others skip what they already have
+    messages = custom_iter_messages(
+        client, source_chat_id, limit=last_msg_id,
+        offset=min(lane.cursor for lane in lanes),
+        metrics=prefetch
+    )
 
-            except (UserDeactivated, AuthKeyUnregistered, SessionRevoked) as e:
-                logger.error(f"Account {current_account_id} is dead: {e}")
-                if get_new_client_callback and account_ids:
-                    new_client, new_acc_id = await get_new_client_callback(
-                        user_id, account_ids, strategy
-                    )
-                    if new_client and new_acc_id:
-                        current_client = new_client
-                        current_account_id = new_acc_id
-                        logger.info(f"Recovered → switched to {new_acc_id}")
-                        continue
-
-                if job_id:
-                    set_job_status(user_id, job_id, JobStatus.PAUSED.value, f"Account error: {e}")
-                return stats
+    units = group_media(messages)
 
-            except Exception as e:
-                logger.exception(f"Error on message {message.id}: {e}")
-                stats.errors += 1
-                if job_id:
-                    update_job_stats(user_id, job_id, {"errors": 1}, current_msg_id=message.id)
-                continue
+    try:
+        await run.run(units)
 
-            if delay > 0:
-                await asyncio.sleep(delay)
+    except asyncio.CancelledError:
+        run.abort()
+        raise
 
     except Exception as e:
         logger.exception(f"Forwarder crashed: {e}")
+        await run.persist()
         if job_id:
-            set_job_status(user_id, job_id, JobStatus.FAILED.value, str(e))
+            await adb.set_job_status(user_id, job_id, JobStatus.FAILED.value, str(e))
         raise
 
-    return stats
+    finally:
+        await units.aclose()
+        await messages.aclose()
+        # Paused, cancelled, finished, crashed or interrupted (shutdown):
+        # make progress durable now
+        await run.settle()
+        await run.mark_sent()
+        try:
+            await run.record_failures()
+        except Exception as e:
+            logger.warning(f"Could not queue failed sends: {e}")
+        await run.persist()
+        try:
+            await run.enforce_retention()
+        except Exception as e:
+            logger.warning(f"Duplicate retention failed: {e}")
+        await run.flush_account_credit()
+        await run.save_rates()
+        await stats_buffer.flush()
+        await local_dup_store.drain()
+        if own_control:
+            job_controls.unregister(job_id, control)
+        logger.info(f"Prefetch ({job_id or source_chat_id}): {prefetch.summary()}")
+        for lane in lanes:
+            report = dup_cache.report(user_id, lane.chat_id)
+            if report and report["lookups"]:
+                logger.info(
+                    f"Dup cache ({lane.chat_id}): {report['local']}/{report['lookups']} "
+                    f"answered locally, {report['db_checks']} db checks, "
+                    f"fp observed={report['fp_observed']:.2%} "
+                    f"estimated={report['fp_estimated']:.2%}, {report['kib']} KiB"
+                )
+
+    return run.results
+
+
+async def forward_messages(
+    client: Client,
+    user_id: int,
+    source_chat_id: Union[int, str],
+    target: Dict[str, Any],
+    last_msg_id: int,
+    skip: int = 0,
+    progress_message: Optional[Message] = None,
+    cancel_flag: Optional[Dict] = None,
+    job_id: Optional[str] = None,
+    account_id: Optional[str] = None,
+    account_ids: Optional[List[str]] = None,
+    strategy: str = "sequential",
+    # Callback for account rotation (provided by worker)
+    get_new_client_callback: Optional[
+        Callable[[int, List[str], str], Awaitable[Tuple[Optional[Client], Optional[str]]]]
+    ] = None,
+) -> ForwardStats:
+    """Single-target convenience wrapper around forward_to_targets()."""
+    results = await forward_to_targets(
+        client=client,
+        user_id=user_id,
+        source_chat_id=source_chat_id,
+        targets=[target],
+        last_msg_id=last_msg_id,
+        skip=skip,
+        progress_message=progress_message,
+        cancel_flag=cancel_flag,
+        job_id=job_id,
+        account_id=account_id,
+        account_ids=account_ids,
+        strategy=strategy,
+        get_new_client_callback=get_new_client_callback,
+    )
+    return results[target["chat_id"]]
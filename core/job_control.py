@@ -0,0 +1,107 @@
+# core/job_control.py
+#
+# In-memory stop tokens for running jobs.
+# The send loop used to call get_job() for every message just to see whether
+# the job was still RUNNING. Now every running job owns a JobControl; the
+# Pause / Cancel / Delete handlers signal it directly, and a single watcher
+# task polls the statuses of all running jobs in one query to catch changes
+# made by other processes (e.g. bot.py vs worker.py). While the job
+# scheduler's change stream is connected it delivers those changes instead and
+# the poll is skipped.
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from config import Config
+from database import adb, JobStatus
+
+logger = logging.getLogger(__name__)
+
+
+class JobControl:
+    def __init__(self, user_id: int, job_id: str):
+        self.user_id = user_id
+        self.job_id = job_id
+        self.reason: Optional[str] = None     # status that stopped the job
+        self._stop = asyncio.Event()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def stop(self, reason: str) -> None:
+        if not self._stop.is_set():
+            self.reason = reason
+            self._stop.set()
+
+    async def sleep(self, seconds: float) -> bool:
+        """
+        Sleep that wakes up early when the job is stopped.
+        Returns True if the job was stopped meanwhile.
+        """
+        if seconds <= 0:
+            return self.stopped
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        return self.stopped
+
+
+class JobControlRegistry:
+    def __init__(self):
+        self._controls: Dict[str, JobControl] = {}
+        self.stream_connected = False    # set by core.job_scheduler
+
+    def register(self, user_id: int, job_id: str) -> JobControl:
+        control = self._controls.get(job_id)
+        if control is None or control.stopped:
+            control = JobControl(user_id, job_id)
+            self._controls[job_id] = control
+        return control
+
+    def unregister(self, job_id: str, control: Optional[JobControl] = None) -> None:
+        # Only drop the entry if it is still the caller's token
+        if control is None or self._controls.get(job_id) is control:
+            self._controls.pop(job_id, None)
+
+    def get(self, job_id: str) -> Optional[JobControl]:
+        return self._controls.get(job_id)
+
+    def signal(self, job_id: str, reason: str) -> bool:
+        """Stop a running job in this process. Returns False if not running here."""
+        control = self._controls.get(job_id)
+        if control is None:
+            return False
+        control.stop(reason)
+        return True
+
+    async def watch(self, interval: float = Config.JOB_WATCH_SECONDS) -> None:
+        """
+        Pick up status changes made outside this process with one batched
+        status query per interval. Call once at startup:
+        asyncio.create_task(job_controls.watch())
+        """
+        while True:
+            await asyncio.sleep(interval)
+            if self.stream_connected:
+                continue
+            job_ids = [jid for jid, c in self._controls.items() if not c.stopped]
+            if not job_ids:
+                continue
+            try:
+                statuses = await adb.get_job_statuses(job_ids)
+            except Exception:
+                logger.exception("Job status watch failed")
+                continue
+
+            for job_id in job_ids:
+                status = statuses.get(job_id, "deleted")
+                if status != JobStatus.RUNNING.value:
+                    logger.info(f"Job {job_id} is now {status} → stopping")
+                    self.signal(job_id, status)
+
+
+# Process-wide registry
+job_controls = JobControlRegistry()
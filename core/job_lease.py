@@ -0,0 +1,87 @@
+# core/job_lease.py
+#
+# Cross-process ownership of running jobs. Before running a job a worker
+# claims the job's lease with one atomic find_one_and_update; while the job
+# runs a heartbeat task renews it every JOB_LEASE_SECONDS / 3. A worker that
+# dies stops renewing, the lease expires, and the scheduler of any other
+# process re-launches the job (core.job_scheduler). This lets bot.py and any
+# number of worker.py processes share one job queue.
+
+import asyncio
+import logging
+import os
+import socket
+from typing import Any, Dict, Optional
+
+from config import Config
+from database import adb
+from core.job_control import JobControl
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = Config.WORKER_ID or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobLease:
+    def __init__(
+        self,
+        user_id: int,
+        job_id: str,
+        control: Optional[JobControl] = None,
+        lease_seconds: float = Config.JOB_LEASE_SECONDS
+    ):
+        self.user_id = user_id
+        self.job_id = job_id
+        self.control = control
+        self.lease_seconds = lease_seconds
+        self.held = False
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def acquire(self) -> Optional[Dict[str, Any]]:
+        """
+        Claim the lease and start heart-beating. Returns the fresh job, or
+        None if it is no longer RUNNING or another worker holds it.
+        """
+        job = await adb.claim_job_lease(self.user_id, self.job_id, WORKER_ID, self.lease_seconds)
+        if not job:
+            return None
+        self.held = True
+        self._heartbeat = asyncio.create_task(self._beat())
+        return job
+
+    def _lost(self) -> None:
+        logger.warning(f"Job {self.job_id}: lease lost → stopping")
+        self.held = False
+        if self.control:
+            self.control.stop("lease_lost")
+
+    async def _beat(self) -> None:
+        loop = asyncio.get_running_loop()
+        last_renewed = loop.time()
+        while self.held:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await adb.renew_job_lease(self.job_id, WORKER_ID, self.lease_seconds)
+            except Exception as e:
+                # Mongo hiccup: keep trying until the lease would have expired,
+                # after that another worker may already own the job
+                logger.warning(f"Lease heartbeat for job {self.job_id} failed: {e}")
+                if loop.time() - last_renewed >= self.lease_seconds:
+                    self._lost()
+                continue
+            if not renewed:
+                self._lost()
+                continue
+            last_renewed = loop.time()
+
+    async def release(self) -> None:
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self.held:
+            self.held = False
+            try:
+                await adb.release_job_lease(self.job_id, WORKER_ID)
+            except Exception as e:
+                # It simply expires
+                logger.warning(f"Could not release lease of job {self.job_id}: {e}")
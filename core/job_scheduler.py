@@ -0,0 +1,265 @@
+# core/job_scheduler.py
+#
+# Event-driven job dispatch. Instead of every process scanning all active /
+# paused jobs every few seconds, the scheduler follows a Mongo change stream
+# on forward_jobs (status changes only):
+#   status → running       launch the job (the launcher skips duplicates)
+#   status → anything else stop the job's JobControl at once
+#   document deleted       stop the job
+# Without change streams (standalone mongod) it falls back to a poll of
+# RUNNING jobs whose dispatch_at fell due since the last poll, served by the
+# (status, dispatch_at) index. dispatch_at is set on every status change
+# (database.update_job) and by rearm_job(), never by progress writes, so a
+# job that is merely making progress is not dispatched again. A
+# future_new_posts job re-arms itself when a pass ends; a dispatch_at in the
+# future is held on a timer until it is due. Handlers in the same process
+# call wake() so a start never waits for the next poll. RUNNING jobs whose
+# lease expired (their worker died, see core.job_lease) are picked up by a
+# separate, indexed scan. Launchers go through launch_once(), which keeps a
+# RUNNING event that arrives while the job's previous task is still finishing.
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from config import Config
+from database import adb, watch_job_changes, JobStatus
+from core.job_control import job_controls
+
+logger = logging.getLogger(__name__)
+
+Launcher = Callable[[Dict[str, Any]], None]
+
+# job_id -> latest job document dispatched while its task was still running
+_RELAUNCH: Dict[str, Dict[str, Any]] = {}
+
+
+def launch_once(
+    tasks: Dict[str, asyncio.Task],
+    job: Dict[str, Any],
+    start: Callable[[Dict[str, Any]], Awaitable[None]]
+) -> None:
+    """
+    Run start(job) as the job's task in `tasks` unless one is still running.
+    If one is (e.g. paused and started again before its finally block ran),
+    the job is launched again once that task ends; the new run's lease
+    re-checks the status, so a job that is no longer RUNNING just returns.
+    """
+    job_id = job["job_id"]
+    task = tasks.get(job_id)
+    if task is None or task.done():
+        tasks[job_id] = asyncio.create_task(start(job))
+        return
+
+    if job_id not in _RELAUNCH:
+        def relaunch(finished: asyncio.Task) -> None:
+            latest = _RELAUNCH.pop(job_id, None)
+            # cancelled = process shutting down: the job stays for the next one
+            if latest is not None and not finished.cancelled():
+                launch_once(tasks, latest, start)
+
+        task.add_done_callback(relaunch)
+    _RELAUNCH[job_id] = job
+
+
+class JobScheduler:
+    def __init__(
+        self,
+        poll_interval: float = Config.JOB_POLL_SECONDS,
+        full_scan_interval: float = Config.JOB_FULL_SCAN_SECONDS
+    ):
+        self.poll_interval = poll_interval
+        self.full_scan_interval = full_scan_interval
+        self.streaming = False         # change stream currently connected
+        self._ever_connected = False
+
+        self._launch: Optional[Launcher] = None
+        self._wake = asyncio.Event()
+        self._resume_token: Optional[Dict[str, Any]] = None
+        self._closing = False
+        self._job_ids: Dict[Any, str] = {}     # document _id -> job_id (for deletes)
+        self._armed: Dict[str, asyncio.TimerHandle] = {}   # job_id -> due dispatch
+        # The blocking change-stream iterator gets a thread of its own
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-stream")
+
+    def wake(self) -> None:
+        """Re-scan now (a job was started / resumed in this process)."""
+        self._wake.set()
+
+    # ---------- dispatch ----------
+
+    def _dispatch(self, job: Dict[str, Any]) -> None:
+        job_id = job["job_id"]
+        status = job.get("status")
+        armed = self._armed.pop(job_id, None)
+        if armed is not None:
+            armed.cancel()
+        if status == JobStatus.RUNNING.value:
+            self._job_ids[job["_id"]] = job_id
+            delay = self._until_due(job)
+            if delay > 0:
+                # Re-armed for later (future_new_posts): launch when due
+                self._armed[job_id] = asyncio.get_running_loop().call_later(
+                    delay, self._launch_due, job
+                )
+                return
+            self._launch(job)
+        else:
+            self._job_ids.pop(job["_id"], None)
+            job_controls.signal(job_id, status)
+
+    @staticmethod
+    def _until_due(job: Dict[str, Any]) -> float:
+        due = job.get("dispatch_at")
+        if due is None:
+            return 0.0
+        if due.tzinfo is None:          # PyMongo returns naive UTC datetimes
+            due = due.replace(tzinfo=timezone.utc)
+        return (due - datetime.now(timezone.utc)).total_seconds()
+
+    def _launch_due(self, job: Dict[str, Any]) -> None:
+        self._armed.pop(job["job_id"], None)
+        # The lease re-checks the job is still RUNNING
+        self._launch(job)
+
+    def _handle_change(self, change: Dict[str, Any]) -> None:
+        if change["operationType"] == "delete":
+            job_id = self._job_ids.pop(change["documentKey"]["_id"], None)
+            if job_id:
+                job_controls.signal(job_id, "deleted")
+            return
+
+        job = change.get("fullDocument")
+        if job:              # None if the job was deleted right after the update
+            self._dispatch(job)
+
+    async def rescan(
+        self,
+        dispatched_since: Optional[datetime] = None,
+        dispatched_until: Optional[datetime] = None
+    ) -> None:
+        for job in await adb.get_running_jobs(dispatched_since, dispatched_until):
+            self._dispatch(job)
+
+    # ---------- change stream ----------
+
+    def _watch_blocking(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue) -> None:
+        with watch_job_changes(resume_after=self._resume_token) as stream:
+            self.streaming = self._ever_connected = True
+            job_controls.stream_connected = True
+            logger.info("Job scheduler: change stream connected")
+            while not self._closing and stream.alive:
+                change = stream.try_next()      # waits up to max_await_ms
+                if change is not None:
+                    loop.call_soon_threadsafe(queue.put_nowait, change)
+                self._resume_token = stream.resume_token
+
+    async def _follow_stream(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        watcher = loop.run_in_executor(self._thread, self._watch_blocking, loop, queue)
+        last_full_scan = loop.time()
+        try:
+            while not (watcher.done() and queue.empty()):
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait(
+                    {getter, watcher}, timeout=1.0, return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter in done:
+                    self._handle_change(getter.result())
+                else:
+                    getter.cancel()
+
+                if self._wake.is_set() or loop.time() - last_full_scan >= self.full_scan_interval:
+                    self._wake.clear()
+                    last_full_scan = loop.time()
+                    await self.rescan()
+            watcher.result()        # re-raise whatever ended the stream
+        finally:
+            self.streaming = False
+            job_controls.stream_connected = False
+
+    # ---------- fallback poll ----------
+
+    async def _poll(self) -> None:
+        logger.info(f"Job scheduler: polling every {self.poll_interval}s")
+        loop = asyncio.get_running_loop()
+        last_full_scan = loop.time()
+        since = datetime.now(timezone.utc)
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            now = datetime.now(timezone.utc)
+            try:
+                if loop.time() - last_full_scan >= self.full_scan_interval:
+                    last_full_scan = loop.time()
+                    await self.rescan()
+                else:
+                    # overlap the window a little: clocks of other processes drift
+                    await self.rescan(since - timedelta(seconds=self.poll_interval), now)
+                since = now
+            except Exception:
+                logger.exception("Job scheduler poll failed")
+
+    # ---------- orphaned jobs ----------
+
+    async def _reclaim_expired(self) -> None:
+        while True:
+            await asyncio.sleep(Config.JOB_LEASE_SECONDS)
+            try:
+                for job in await adb.get_jobs_with_expired_lease():
+                    logger.info(f"Job {job['job_id']}: lease of {job['lease'].get('owner')} expired")
+                    self._dispatch(job)
+            except Exception:
+                logger.exception("Expired lease scan failed")
+
+    # ---------- entry point ----------
+
+    async def run(self, launch: Launcher) -> None:
+        """
+        Call once per process: asyncio.create_task(job_scheduler.run(launch)).
+        `launch(job)` starts a job unless it is already running here.
+        """
+        self._launch = launch
+        await self.rescan()          # jobs that were RUNNING before we started
+        reclaimer = asyncio.create_task(self._reclaim_expired())
+        try:
+            await self._run_dispatch()
+        finally:
+            reclaimer.cancel()
+
+    async def _run_dispatch(self) -> None:
+
+        while True:
+            try:
+                await self._follow_stream()
+            except OperationFailure as e:
+                if not self._ever_connected:
+                    # Never connected: this server has no change streams
+                    logger.info(f"Change streams unavailable ({e.code}): {e}")
+                    await self._poll()
+                    return
+                logger.warning(f"Job change stream lost: {e}; reconnecting")
+                self._resume_token = None     # token may be stale → start fresh
+                await self.rescan()
+            except PyMongoError as e:
+                logger.warning(f"Job change stream error: {e}; reconnecting")
+                await asyncio.sleep(2)
+            except asyncio.CancelledError:
+                self._closing = True
+                raise
+            except Exception:
+                logger.exception("Job scheduler crashed; restarting")
+                await asyncio.sleep(5)
+
+
+# Process-wide scheduler
+job_scheduler = JobScheduler()
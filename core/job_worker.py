@@ -1,7 +1,7 @@
 # core/job_worker.py
 #
-# A background loop that polls MongoDB for jobs with status "running"
-# and actually forwards them, using your existing forward_messages() engine.
+# Runs jobs whose status becomes "running" (delivered by core.job_scheduler)
+# using the forward_to_targets() fan-out engine.
 #
 # One job runs at a time per job_id (tracked in RUNNING_JOB_TASKS) so pressing
 # Start twice doesn't launch it twice, and Pause/Stop can cancel the task.
@@ -9,16 +9,15 @@
 import asyncio
 import logging
 
-from database import (
-    get_active_jobs, get_job, get_target, get_user_accounts,
-    get_account, update_job, JobStatus
-)
-from core.forwarder import forward_messages
+from config import Config
+from database import adb, get_target_cursors, JobStatus, AccountStrategy, PoolStrategy
+from core.forwarder import forward_to_targets, Shard
+from core.job_control import job_controls
+from core.job_scheduler import job_scheduler, launch_once
+from core.job_lease import JobLease
 
 logger = logging.getLogger(__name__)
 
-POLL_INTERVAL_SECONDS = 5
-
 # job_id -> asyncio.Task, so we can avoid double-starting / can cancel on pause/stop
 RUNNING_JOB_TASKS: dict[str, asyncio.Task] = {}
 
@@ -28,85 +27,126 @@ async def job_worker_loop(client):
     Call this once at bot startup: asyncio.create_task(job_worker_loop(app))
     """
     logger.info("Job worker started.")
-    while True:
-        try:
-            jobs = get_active_jobs()  # all jobs with status == "running", across users
-            for job in jobs:
-                job_id = job["job_id"]
-                # Skip if already being executed
-                task = RUNNING_JOB_TASKS.get(job_id)
-                if task and not task.done():
-                    continue
-                # Launch it
-                RUNNING_JOB_TASKS[job_id] = asyncio.create_task(
-                    run_single_job(client, job)
-                )
-        except Exception:
-            logger.exception("Job worker poll iteration failed")
 
-        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+    def launch(job: dict) -> None:
+        # Skip if already being executed (or relaunch once it is done)
+        launch_once(RUNNING_JOB_TASKS, job, lambda j: run_single_job(client, j))
+
+    await job_scheduler.run(launch)
 
 
 async def run_single_job(client, job: dict):
     user_id = job["user_id"]
     job_id = job["job_id"]
+    control = job_controls.register(user_id, job_id)
+    lease = JobLease(user_id, job_id, control)
 
     try:
-        for target_chat_id in job.get("target_chat_ids", []):
-            # Re-fetch job each loop in case it was paused/stopped mid-run
-            fresh = get_job(user_id, job_id)
-            if not fresh or fresh.get("status") != JobStatus.RUNNING.value:
-                logger.info(f"Job {job_id} no longer running, stopping.")
+        # Claim the job; this also re-checks it is still RUNNING (it may
+        # have been paused/stopped, or another process may be running it)
+        fresh = await lease.acquire()
+        if not fresh:
+            logger.info(f"Job {job_id} not running or owned by another worker, skipping.")
+            return
+
+        targets = [
+            t for t in [
+                await adb.get_target(user_id, cid) for cid in fresh.get("target_chat_ids", [])
+            ]
+            if t
+        ]
+        if not targets:
+            await adb.update_job(user_id, job_id, {"status": JobStatus.FAILED.value})
+            return
+
+        account_ids = fresh.get("account_ids") or []
+        strategy = fresh.get("account_strategy", AccountStrategy.SEQUENTIAL.value)
+        account_id = None
+        bot_id = None
+        shards = []
+        if fresh.get("method") == "bot":
+            # Bot pool, as in worker.run_job: every active forward bot of the
+            # job sends. A job without forward bots uses the main app client.
+            exec_client = client
+            pool_bot_ids = fresh.get("bot_ids") or [b for b in [fresh.get("bot_id")] if b]
+            pool = []
+            for pool_bot_id in pool_bot_ids:
+                bot = await adb.get_bot(user_id, pool_bot_id)
+                if not bot or bot.get("status") != "active":
+                    logger.warning(f"Job {job_id}: bot {pool_bot_id} not available or disabled")
+                    continue
+                bot_client = await _get_bot_client(bot)
+                if bot_client:
+                    pool.append(Shard(bot_client, bot_id=pool_bot_id))
+            if pool_bot_ids and not pool:
+                await adb.set_job_status(
+                    user_id, job_id, JobStatus.FAILED.value,
+                    "No bot available or could not start bot client"
+                )
                 return
-
-            target = get_target(user_id, target_chat_id)
-            if not target:
-                continue
-
-            if job.get("method") == "bot":
-                # Forwarding via the main client (or a dedicated bot client if you
-                # spin one up per forward_bot — for now this uses the main app client).
-                exec_client = client
-            else:
-                # method == "user": pick an account and build a Pyrogram client from
-                # its stored session_string. Simple sequential strategy for now.
-                account_ids = job.get("account_ids") or []
-                exec_client = None
-                for acc_id in account_ids:
-                    account = get_account(user_id, acc_id)
-                    if not account or account.get("status") != "active":
-                        continue
-                    exec_client = await _get_account_client(account)
-                    if exec_client:
-                        break
+            if pool:
+                exec_client, bot_id, shards = pool[0].client, pool[0].bot_id, pool[1:]
+        else:
+            # method == "user": build Pyrogram clients from the accounts'
+            # stored session_string; the first one that starts sends, in
+            # parallel mode every other one sends alongside.
+            exec_client = None
+            for account in await adb.get_available_accounts(user_id, account_ids):
+                acc_client = await _get_account_client(account)
+                if not acc_client:
+                    continue
                 if exec_client is None:
-                    logger.warning(f"Job {job_id}: no available account, pausing job.")
-                    update_job(user_id, job_id, {"status": JobStatus.PAUSED.value})
-                    return
-
-            stats = await forward_messages(
-                client=exec_client,
-                user_id=user_id,
-                source_chat_id=job.get("source_chat_id"),
-                target=target,
-                last_msg_id=job.get("last_msg_id", 0),
-                skip=job.get("current_msg_id", job.get("skip", 0)),
-                job_id=job_id,
-            )
-
-            # Persist progress
-            update_job(user_id, job_id, {
-                "current_msg_id": job.get("skip", 0) + stats.fetched,
-            })
-
-        # All targets done -> mark completed (unless future_new_posts should keep it alive)
-        if not job.get("future_new_posts"):
-            update_job(user_id, job_id, {"status": JobStatus.COMPLETED.value})
+                    exec_client, account_id = acc_client, account["account_id"]
+                    if strategy != AccountStrategy.PARALLEL.value:
+                        break
+                else:
+                    shards.append(Shard(acc_client, account_id=account["account_id"]))
+            if exec_client is None:
+                logger.warning(f"Job {job_id}: no available account, pausing job.")
+                await adb.update_job(user_id, job_id, {"status": JobStatus.PAUSED.value})
+                return
+
+        # One pass over the source for all targets; progress is persisted
+        # per target (targets_progress) by the engine as it goes.
+        await forward_to_targets(
+            client=exec_client,
+            user_id=user_id,
+            source_chat_id=fresh.get("source_chat_id"),
+            targets=targets,
+            last_msg_id=fresh.get("last_msg_id", 0),
+            skip=fresh.get("skip", 0),
+            job_id=job_id,
+            account_id=account_id,
+            account_ids=account_ids,
+            strategy=strategy,
+            get_new_client_callback=_next_account_client if account_id else None,
+            target_cursors=get_target_cursors(fresh),
+            control=control,
+            bot_id=bot_id,
+            shards=shards,
+            pool_strategy=fresh.get("pool_strategy", PoolStrategy.CAPACITY.value),
+        )
+
+        # Paused / cancelled / deleted mid-run → leave the status alone
+        if control.stopped:
+            return
+        fresh = await adb.get_job(user_id, job_id)
+        if not fresh or fresh.get("status") != JobStatus.RUNNING.value:
+            return
+
+        # All targets done -> mark completed, or (future_new_posts) have the
+        # scheduler run the next pass in FUTURE_POSTS_RECHECK_SECONDS
+        if not fresh.get("future_new_posts"):
+            await adb.update_job(user_id, job_id, {"status": JobStatus.COMPLETED.value})
+        else:
+            await adb.rearm_job(user_id, job_id, Config.FUTURE_POSTS_RECHECK_SECONDS)
 
     except Exception:
         logger.exception(f"Job {job_id} crashed")
-        update_job(user_id, job_id, {"status": JobStatus.FAILED.value})
+        await adb.update_job(user_id, job_id, {"status": JobStatus.FAILED.value})
     finally:
+        await lease.release()
+        job_controls.unregister(job_id, control)
         RUNNING_JOB_TASKS.pop(job_id, None)
 
 
@@ -116,6 +156,32 @@ async def run_single_job(client, job: dict):
 # instead of the bot. Cache these so we don't reconnect every poll.
 # ------------------------------------------------------------------
 _ACCOUNT_CLIENTS: dict[str, "Client"] = {}
+_BOT_CLIENTS: dict[str, "Client"] = {}
+
+
+async def _get_bot_client(bot: dict):
+    """Connected client of a forward bot (its bot_token), cached per bot_id."""
+    from pyrogram import Client
+    from config import Config
+
+    bot_id = bot["bot_id"]
+    if bot_id in _BOT_CLIENTS:
+        return _BOT_CLIENTS[bot_id]
+
+    try:
+        bot_client = Client(
+            name=f"fwd_bot_{bot_id}",
+            api_id=Config.API_ID,
+            api_hash=Config.API_HASH,
+            bot_token=bot["bot_token"],
+            in_memory=True,
+        )
+        await bot_client.start()
+        _BOT_CLIENTS[bot_id] = bot_client
+        return bot_client
+    except Exception:
+        logger.exception(f"Failed to start client for bot {bot_id}")
+        return None
 
 
 async def _get_account_client(account: dict):
@@ -143,4 +209,13 @@ async def _get_account_client(account: dict):
         return acc_client
     except Exception:
         logger.exception(f"Failed to start client for account {acc_id}")
-        return None
\ No newline at end of file
+        return None
+
+
+async def _next_account_client(user_id: int, account_ids: list, strategy: str):
+    """Rotation callback for the forwarder: next available account that starts."""
+    for account in await adb.get_available_accounts(user_id, account_ids):
+        acc_client = await _get_account_client(account)
+        if acc_client:
+            return acc_client, account["account_id"]
+    return None, None
@@ -0,0 +1,58 @@
+# core/loop_monitor.py
+#
+# Measures event-loop lag: how late an asyncio.sleep() wakes up.
+# Any blocking call on the loop (a synchronous PyMongo round trip, heavy
+# CPU work) shows up directly as lag, for every job and UI callback at once.
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.1, window: int = 3000):
+        self.interval = interval
+        self.samples: deque = deque(maxlen=window)   # lag in seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        """Lag percentiles in milliseconds over the current window."""
+        if not self.samples:
+            return {"p50": 0.0, "p99": 0.0, "max": 0.0, "samples": 0}
+
+        ordered = sorted(self.samples)
+        n = len(ordered)
+        return {
+            "p50": ordered[n // 2] * 1000,
+            "p99": ordered[min(n - 1, int(n * 0.99))] * 1000,
+            "max": ordered[-1] * 1000,
+            "samples": n,
+        }
+
+    async def run(self, log_every: int = Config.LOOP_LAG_LOG_SECONDS):
+        """
+        Call once at startup: asyncio.create_task(loop_monitor.run())
+        """
+        last_log = time.monotonic()
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.samples.append(max(0.0, now - started - self.interval))
+
+            if log_every and now - last_log >= log_every:
+                last_log = now
+                s = self.snapshot()
+                logger.info(
+                    f"Event loop lag: p50={s['p50']:.1f}ms p99={s['p99']:.1f}ms "
+                    f"max={s['max']:.1f}ms (tasks={len(asyncio.all_tasks())})"
+                )
+
+
+# Process-wide instance
+loop_monitor = LoopLagMonitor()
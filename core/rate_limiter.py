@@ -0,0 +1,196 @@
+# core/rate_limiter.py
+#
+# Process-wide send pacing. Every send request first reserves a permit from
+# two token buckets shared by all jobs in the process:
+#   client bucket  one per bot / user account (Telegram: ~30 msg/s per bot)
+#   chat bucket    one per (client, target chat) (~1 msg/s per chat,
+#                  20 msg/min in groups; a target's `delay` slows it further)
+# Reservations are FIFO: tokens may go negative and each caller is told how
+# long to wait, so concurrent jobs on one bot interleave at the allowed rate
+# instead of each sleeping a fixed delay.
+#
+# The configured rates are ceilings. Each bucket runs AIMD below its ceiling:
+# a successful send raises the rate by RATE_INCREASE x ceiling, a FloodWait
+# multiplies it by RATE_DECREASE and blocks the bucket for the wait. The
+# learned rates are saved on the bot / account document (see learned()) and
+# seed the buckets of the next run.
+#
+# One API call counts as one token, also a forward of up to 100 message ids.
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import Config
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, ceiling: Optional[float] = None):
+        self.ceiling = ceiling or rate   # configured maximum (msg/s)
+        self.rate = min(rate, self.ceiling)   # current tokens per second
+        self.capacity = capacity         # burst size
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float, cost: float = 1.0) -> float:
+        """Seconds reserve() would make a caller wait, without taking tokens."""
+        tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate) - cost
+        return -tokens / self.rate if tokens < 0 else 0.0
+
+    def reserve(self, now: float, cost: float = 1.0) -> float:
+        """Take `cost` tokens; returns seconds to wait until they are covered."""
+        self._refill(now)
+        self.tokens -= cost
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def set_ceiling(self, ceiling: float, capacity: float) -> None:
+        if ceiling != self.ceiling or capacity != self.capacity:
+            self._refill(time.monotonic())
+            self.ceiling, self.capacity = ceiling, capacity
+            self.rate = min(self.rate, ceiling)
+            self.tokens = min(self.tokens, capacity)
+
+    # ---------- AIMD ----------
+
+    def increase(self) -> None:
+        if self.rate < self.ceiling:
+            self._refill(time.monotonic())
+            self.rate = min(self.ceiling, self.rate + self.ceiling * Config.RATE_INCREASE)
+
+    def decrease(self, wait: float) -> None:
+        """FloodWait of `wait` seconds: cut the rate, nobody sends before it ends."""
+        self._refill(time.monotonic())
+        self.rate = max(
+            min(Config.MIN_SEND_RATE, self.ceiling), self.rate * Config.RATE_DECREASE
+        )
+        self.tokens = min(self.tokens, -wait * self.rate)
+
+
+def client_key(client: Any) -> Tuple[str, bool]:
+    """(bucket key, is_bot) for a Pyrogram client; one bucket per session."""
+    is_bot = bool(getattr(client, "bot_token", None))
+    return f"{getattr(client, 'name', None) or id(client)}", is_bot
+
+
+def chat_rate(target: Dict[str, Any], delay: float) -> float:
+    """Highest msg/s allowed into a target chat; `delay` is the minimum gap."""
+    if target.get("chat_type") in ("group", "supergroup"):
+        rate = Config.GROUP_SEND_PER_MINUTE / 60
+    else:
+        rate = Config.CHAT_SEND_RATE
+    if delay > 0:
+        rate = min(rate, 1 / delay)
+    return rate
+
+
+class RateScheduler:
+    def __init__(self):
+        self._clients: Dict[str, TokenBucket] = {}
+        self._chats: Dict[Tuple[str, int], TokenBucket] = {}
+        # Rates saved by earlier runs, used when a chat bucket is created
+        self._seeds: Dict[Tuple[str, int], float] = {}
+
+    def _client_bucket(self, key: str, is_bot: bool) -> TokenBucket:
+        bucket = self._clients.get(key)
+        if bucket is None:
+            rate = Config.BOT_SEND_RATE if is_bot else Config.USER_SEND_RATE
+            bucket = self._clients[key] = TokenBucket(rate, max(1.0, rate))
+        return bucket
+
+    def _chat_bucket(self, key: str, chat_id: int, ceiling: float) -> TokenBucket:
+        capacity = min(Config.CHAT_SEND_BURST, max(1.0, ceiling))
+        bucket = self._chats.get((key, chat_id))
+        if bucket is None:
+            rate = self._seeds.pop((key, chat_id), ceiling)
+            bucket = self._chats[(key, chat_id)] = TokenBucket(rate, capacity, ceiling)
+        else:
+            bucket.set_ceiling(ceiling, capacity)
+        return bucket
+
+    def seed(self, client: Any, doc: Optional[Dict[str, Any]]) -> None:
+        """
+        Start a client's buckets at the rates learned by earlier runs
+        (`send_rate`, `chat_rates` of its bot / account document). Buckets
+        that already exist in this process know better and are kept.
+        """
+        if not doc:
+            return
+        key, is_bot = client_key(client)
+        if key not in self._clients and doc.get("send_rate"):
+            bucket = self._client_bucket(key, is_bot)
+            bucket.rate = min(bucket.ceiling, float(doc["send_rate"]))
+        for chat_id, rate in (doc.get("chat_rates") or {}).items():
+            if (key, int(chat_id)) not in self._chats:
+                self._seeds[(key, int(chat_id))] = float(rate)
+
+    def reserve(
+        self,
+        client: Any,
+        chat_id: int,
+        rate: float,
+        cost: float = 1.0
+    ) -> float:
+        """
+        Reserve a send permit for `client` → `chat_id` (chat limited to `rate`
+        msg/s). Returns how long the caller must wait before sending.
+        """
+        key, is_bot = client_key(client)
+        now = time.monotonic()
+        wait_client = self._client_bucket(key, is_bot).reserve(now, cost)
+        wait_chat = self._chat_bucket(key, chat_id, rate).reserve(now, cost)
+        return max(wait_client, wait_chat)
+
+    def peek(self, client: Any, chat_id: int, rate: float, cost: float = 1.0) -> float:
+        """Wait a reserve() would get now; used to pick among several clients."""
+        key, is_bot = client_key(client)
+        now = time.monotonic()
+        return max(
+            self._client_bucket(key, is_bot).wait_time(now, cost),
+            self._chat_bucket(key, chat_id, rate).wait_time(now, cost)
+        )
+
+    def on_success(self, client: Any, chat_id: int) -> None:
+        key, _ = client_key(client)
+        for bucket in (self._clients.get(key), self._chats.get((key, chat_id))):
+            if bucket is not None:
+                bucket.increase()
+
+    def on_flood(self, client: Any, chat_id: int, wait: float, slowmode: bool = False) -> None:
+        """
+        Back off after a FloodWait. A SlowmodeWait only concerns the chat; a
+        FloodWait does not say what it limits, so both buckets back off.
+        """
+        key, _ = client_key(client)
+        buckets = [self._chats.get((key, chat_id))]
+        if not slowmode:
+            buckets.append(self._clients.get(key))
+        for bucket in buckets:
+            if bucket is not None:
+                bucket.decrease(wait)
+
+    def learned(self, client: Any, chat_ids: List[int]) -> Dict[str, float]:
+        """
+        $set fields with the current rates of a client and its chats, for the
+        bot / account document.
+        """
+        key, _ = client_key(client)
+        fields: Dict[str, float] = {}
+        bucket = self._clients.get(key)
+        if bucket is not None:
+            fields["send_rate"] = round(bucket.rate, 4)
+        for chat_id in chat_ids:
+            bucket = self._chats.get((key, chat_id))
+            if bucket is not None:
+                fields[f"chat_rates.{chat_id}"] = round(bucket.rate, 4)
+        return fields
+
+    def snapshot(self) -> Dict[str, float]:
+        """Current rate per client bucket (for logs)."""
+        return {key: round(b.rate, 2) for key, b in self._clients.items()}
+
+
+# Process-wide scheduler shared by every job
+rate_scheduler = RateScheduler()
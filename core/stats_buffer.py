@@ -0,0 +1,124 @@
+# core/stats_buffer.py
+#
+# Write-behind accumulator for job progress and dashboard statistics.
+# The forwarder used to make 3-4 Mongo writes per message (job stats, target
+# stats, account stats). Increments are now merged in memory and written with
+# one bulk_write per collection every STATS_FLUSH_EVERY updates or
+# STATS_FLUSH_SECONDS, and whenever a run stops (pause / cancel / finish).
+#
+# A job's counters and its cursors live in the same update document, so a
+# flushed current_msg_id is always consistent with the flushed counters.
+
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+from config import Config
+from database import adb, build_job_stats_update
+
+logger = logging.getLogger(__name__)
+
+
+class StatsBuffer:
+    def __init__(
+        self,
+        flush_every: int = Config.STATS_FLUSH_EVERY,
+        flush_seconds: float = Config.STATS_FLUSH_SECONDS
+    ):
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+
+        # (user_id, job_id) -> {"$inc": {...}, "$set": {...}}
+        self._jobs: Dict[Tuple[int, str], Dict[str, Dict[str, Any]]] = {}
+        # (user_id, entity_type, entity_id) -> {"forwarded": n, ...}
+        self._entities: Dict[Tuple[int, str, str], Dict[str, int]] = {}
+        self._pending = 0
+        # Flushes must not overlap, or an older cursor could land last
+        self._lock = asyncio.Lock()
+
+    # ---------- accumulate ----------
+
+    def _merge_job(self, key: Tuple[int, str], update: Dict[str, Dict[str, Any]]) -> None:
+        entry = self._jobs.setdefault(key, {"$inc": {}, "$set": {}})
+        for field, value in update.get("$inc", {}).items():
+            entry["$inc"][field] = entry["$inc"].get(field, 0) + value
+        # cursors only move forward, so the latest $set wins
+        entry["$set"].update(update.get("$set", {}))
+
+    def _merge_entity(self, key: Tuple[int, str, str], increments: Dict[str, int]) -> None:
+        entry = self._entities.setdefault(key, {})
+        for field, value in increments.items():
+            entry[field] = entry.get(field, 0) + value
+
+    async def add_job(
+        self,
+        user_id: int,
+        job_id: str,
+        stats_increment: Dict[str, int],
+        current_msg_id: Optional[int] = None,
+        target_increments: Optional[Dict[int, Dict[str, int]]] = None,
+        target_cursors: Optional[Dict[int, int]] = None
+    ) -> None:
+        """Buffered equivalent of database.update_job_stats()."""
+        update = build_job_stats_update(
+            stats_increment, current_msg_id, target_increments, target_cursors
+        )
+        self._merge_job((user_id, job_id), update)
+        await self._tick()
+
+    async def add_entity(
+        self,
+        user_id: int,
+        entity_type: str,
+        entity_id: str,
+        increments: Dict[str, int]
+    ) -> None:
+        """Buffered equivalent of database.increment_stats()."""
+        self._merge_entity((user_id, entity_type, entity_id), increments)
+        await self._tick()
+
+    async def _tick(self) -> None:
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            await self.flush()
+
+    # ---------- flush ----------
+
+    async def flush(self) -> None:
+        """Write everything buffered so far."""
+        async with self._lock:
+            if not self._jobs and not self._entities:
+                return
+
+            jobs, entities = self._jobs, self._entities
+            self._jobs, self._entities = {}, {}
+            self._pending = 0
+
+            try:
+                await adb.apply_stats_batch(jobs, entities)
+            except Exception as e:
+                # Put it back so nothing is lost; newer data wins on $set
+                logger.error(f"Stats flush failed, will retry: {e}")
+                for key, update in jobs.items():
+                    newer = self._jobs.pop(key, None)
+                    self._merge_job(key, update)
+                    if newer:
+                        self._merge_job(key, newer)
+                for key, increments in entities.items():
+                    self._merge_entity(key, increments)
+
+    async def run(self) -> None:
+        """
+        Timer-based flushing. Call once at startup:
+        asyncio.create_task(stats_buffer.run())
+        """
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Stats flush loop iteration failed")
+
+
+# Process-wide instance shared by every job
+stats_buffer = StatsBuffer()
@@ -0,0 +1,85 @@
+# core/target_profile.py
+#
+# A target's settings, prepared once instead of per message: the compiled
+# filter program and replacements, the caption template, the inline keyboard
+# and the send / anti-duplicate flags. A run builds one profile per target
+# when it starts. update_target_settings bumps the target's settings_version;
+# a running job re-reads its targets every PROFILE_REFRESH_SECONDS and swaps
+# in a new profile at its next checkpoint (FanOutRun.refresh_profiles).
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from pyrogram.types import InlineKeyboardMarkup, Message
+
+from config import Config
+from core.caption import (
+    Replacer, build_inline_keyboard, compile_replacements, compile_template,
+    message_text, rewrite_caption
+)
+from core.entities import RichText
+from core.filters import FilterProgram, compile_filters
+from core.rate_limiter import chat_rate
+
+
+@dataclass(frozen=True, slots=True)
+class TargetProfile:
+    chat_id: int
+    version: int                           # target's settings_version
+    filters: FilterProgram
+    replacer: Optional[Replacer]           # None unless replacements are on
+    remove_links: bool
+    template: Optional[RichText]           # parsed caption template
+    keyboard: Optional[InlineKeyboardMarkup]
+    forward_tag: bool
+    batch_mode: bool
+    delay: float
+    rate: float                            # msg/s into this chat
+    window: int                            # sends in flight at once
+    anti_dup: bool
+    dup_ttl_days: int
+    dup_max_entries: int
+    dup_local_index: bool
+
+    @classmethod
+    def build(cls, target: Dict[str, Any]) -> "TargetProfile":
+        settings = target.get("settings", {})
+        delay = float(settings.get("delay", 1.0))
+        forward_tag = settings.get("forward_tag", False)
+        replacer = None
+        if settings.get("replace_enabled", False):
+            replacer = compile_replacements(settings) or None
+        remove_links = settings.get("remove_links", False)
+        template = compile_template(settings)
+        keyboard = build_inline_keyboard(settings)
+        # Batch mode: up to 100 ids per forward_messages call, either with the
+        # forward header or as a header-less copy (hide_sender_name), which only
+        # works if nothing gets rewritten
+        rewrite = bool(replacer or remove_links or template is not None or keyboard)
+        return cls(
+            chat_id=target["chat_id"],
+            version=int(target.get("settings_version", 0)),
+            filters=compile_filters(settings),
+            replacer=replacer,
+            remove_links=remove_links,
+            template=template,
+            keyboard=keyboard,
+            forward_tag=forward_tag,
+            batch_mode=bool(settings.get("batch_forward", True) and (forward_tag or not rewrite)),
+            delay=delay,
+            rate=chat_rate(target, delay),
+            window=min(
+                Config.MAX_SEND_WINDOW,
+                max(1, int(settings.get("send_window") or Config.SEND_WINDOW))
+            ),
+            anti_dup=settings.get("anti_duplicate", True),
+            dup_ttl_days=int(settings.get("dup_ttl_days", 0) or 0),
+            dup_max_entries=int(settings.get("dup_max_entries", 0) or 0),
+            dup_local_index=settings.get("dup_local_index", False),
+        )
+
+    def caption(self, message: Message) -> Optional[RichText]:
+        """The message's caption / text as this target sends it (None = none)."""
+        return rewrite_caption(
+            message_text(message), self.replacer, self.remove_links, self.template
+        )
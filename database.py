@@ -3,14 +3,19 @@
 # Python 3.14 | PyMongo 4.17.0 | Compatible with kurigram 2.2.24
 
 from datetime import datetime, timezone, timedelta
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Union, Tuple
 from bson import ObjectId
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne, ReturnDocument
 from pymongo.database import Database as MongoDatabase
 from pymongo.collection import Collection
-from pymongo.errors import DuplicateKeyError
+from pymongo.errors import DuplicateKeyError, BulkWriteError, OperationFailure
+import asyncio
 import copy
+import functools
+import hashlib
+import inspect
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 
 from config import Config
@@ -46,6 +51,17 @@ class MethodType(str, Enum):
 class AccountStrategy(str, Enum):
     SEQUENTIAL = "sequential"
     MANUAL = "manual"
+    PARALLEL = "parallel"       # all available accounts send at once
+
+
+class PoolStrategy(str, Enum):
+    CAPACITY = "capacity"          # the bot / account with a permit first
+    ROUND_ROBIN = "round_robin"    # in turn, skipping flood-limited ones
+
+
+class FailedSendStatus(str, Enum):
+    PENDING = "pending"      # waiting for its next retry
+    DEAD = "dead"            # gave up after SEND_MAX_ATTEMPTS
 
 
 # ============================================================
@@ -60,11 +76,13 @@ class Database:
         self.users: Optional[Collection] = None
         self.targets: Optional[Collection] = None
         self.duplicates: Optional[Collection] = None
+        self.duplicate_hashes: Optional[Collection] = None
         self.forward_accounts: Optional[Collection] = None
         self.forward_bots: Optional[Collection] = None
         self.forward_jobs: Optional[Collection] = None
         self.statistics: Optional[Collection] = None
         self.job_logs: Optional[Collection] = None
+        self.failed_sends: Optional[Collection] = None
 
     def connect(self) -> None:
         """Connect to MongoDB and create indexes."""
@@ -80,11 +98,13 @@ class Database:
             self.users = self.db["users"]
             self.targets = self.db["targets"]
             self.duplicates = self.db["duplicates"]
+            self.duplicate_hashes = self.db["duplicate_hashes"]
             self.forward_accounts = self.db["forward_accounts"]
             self.forward_bots = self.db["forward_bots"]
             self.forward_jobs = self.db["forward_jobs"]
             self.statistics = self.db["statistics"]
             self.job_logs = self.db["job_logs"]
+            self.failed_sends = self.db["failed_sends"]
 
             self._create_indexes()
             logger.info("✅ MongoDB connected successfully")
@@ -113,7 +133,29 @@ class Database:
             ],
             unique=True
         )
-        self.duplicates.create_index([("created_at", ASCENDING)])
+        self.duplicates.create_index(
+            [("user_id", ASCENDING), ("target_chat_id", ASCENDING), ("created_at", ASCENDING)]
+        )
+        self.duplicates.create_index(
+            [("expires_at", ASCENDING)], expireAfterSeconds=0, sparse=True
+        )
+        try:
+            # superseded by the per-target created_at index above
+            self.duplicates.drop_index("created_at_1")
+        except OperationFailure:
+            pass
+
+        # duplicate_hashes (compact layout, see DUPLICATES section)
+        self.duplicate_hashes.create_index(
+            [("u", ASCENDING), ("t", ASCENDING), ("h", ASCENDING)],
+            unique=True
+        )
+        self.duplicate_hashes.create_index(
+            [("u", ASCENDING), ("t", ASCENDING), ("c", ASCENDING)]
+        )
+        self.duplicate_hashes.create_index(
+            [("x", ASCENDING)], expireAfterSeconds=0, sparse=True
+        )
 
         # forward_accounts
         self.forward_accounts.create_index([("user_id", ASCENDING)])
@@ -137,6 +179,12 @@ class Database:
         self.forward_jobs.create_index(
             [("user_id", ASCENDING), ("status", ASCENDING)]
         )
+        self.forward_jobs.create_index(
+            [("status", ASCENDING), ("dispatch_at", ASCENDING)]
+        )
+        self.forward_jobs.create_index(
+            [("status", ASCENDING), ("lease.expires_at", ASCENDING)]
+        )
 
         # statistics
         self.statistics.create_index(
@@ -148,6 +196,20 @@ class Database:
         self.job_logs.create_index([("job_id", ASCENDING)])
         self.job_logs.create_index([("created_at", DESCENDING)])
 
+        # failed_sends (retry queue / dead letters)
+        self.failed_sends.create_index(
+            [("job_id", ASCENDING), ("target_chat_id", ASCENDING), ("msg_id", ASCENDING)],
+            unique=True
+        )
+        self.failed_sends.create_index(
+            [
+                ("job_id", ASCENDING),
+                ("target_chat_id", ASCENDING),
+                ("status", ASCENDING),
+                ("next_attempt_at", ASCENDING)
+            ]
+        )
+
         logger.info("✅ Database indexes created")
 
     def close(self) -> None:
@@ -206,8 +268,13 @@ DEFAULT_TARGET_SETTINGS = {
     "inline_buttons": [],                  # [[{"text": "...", "url": "..."}]]
     "media_types": ["photo", "video", "document", "audio", "animation", "voice"],
     "forward_tag": False,
+    "batch_forward": True,                 # up to 100 ids per forward call when possible
     "delay": 1.0,
+    "send_window": Config.SEND_WINDOW,     # sends in flight at once (>1: order not guaranteed)
     "anti_duplicate": True,
+    "dup_ttl_days": 0,                     # forget duplicate records after N days (0 = never)
+    "dup_max_entries": 0,                  # keep at most N newest records (0 = unlimited)
+    "dup_local_index": False,              # on-disk fingerprint index instead of Mongo lookups
     "future_new_posts": False,             # NEW
 }
 
@@ -216,7 +283,8 @@ def add_target(
     user_id: int,
     chat_id: int,
     title: str,
-    username: Optional[str] = None
+    username: Optional[str] = None,
+    chat_type: Optional[str] = None
 ) -> Optional[Dict[str, Any]]:
     """Add a new target. Returns the document or None if already exists."""
     existing = db.targets.find_one({"user_id": user_id, "chat_id": chat_id})
@@ -229,6 +297,7 @@ def add_target(
         "chat_id": chat_id,
         "title": title,
         "username": username,
+        "chat_type": chat_type,            # "channel" / "supergroup" / "group" (send pacing)
         "settings": copy.deepcopy(DEFAULT_TARGET_SETTINGS),
         "created_at": now,
         "updated_at": now
@@ -249,6 +318,11 @@ def get_target(user_id: int, chat_id: int) -> Optional[Dict[str, Any]]:
     return db.targets.find_one({"user_id": user_id, "chat_id": chat_id})
 
 
+def get_targets(user_id: int, chat_ids: List[int]) -> List[Dict[str, Any]]:
+    """Several targets of a user in one query (e.g. the targets of a job)."""
+    return list(db.targets.find({"user_id": user_id, "chat_id": {"$in": chat_ids}}))
+
+
 def get_target_by_id(target_id: Union[str, ObjectId]) -> Optional[Dict[str, Any]]:
     if isinstance(target_id, str):
         try:
@@ -270,9 +344,10 @@ def update_target_settings(
     set_fields = {f"settings.{k}": v for k, v in settings_update.items()}
     set_fields["updated_at"] = datetime.now(timezone.utc)
 
+    # settings_version tells running jobs to rebuild their target profile
     result = db.targets.update_one(
         {"user_id": user_id, "chat_id": chat_id},
-        {"$set": set_fields}
+        {"$set": set_fields, "$inc": {"settings_version": 1}}
     )
     return result.modified_count > 0
 
@@ -289,7 +364,8 @@ def update_full_settings(
             "$set": {
                 "settings": full_settings,
                 "updated_at": datetime.now(timezone.utc)
-            }
+            },
+            "$inc": {"settings_version": 1}
         }
     )
     return result.modified_count > 0
@@ -299,10 +375,8 @@ def delete_target(user_id: int, chat_id: int) -> bool:
     """Delete a target and all its duplicate records."""
     result = db.targets.delete_one({"user_id": user_id, "chat_id": chat_id})
     if result.deleted_count > 0:
-        db.duplicates.delete_many({
-            "user_id": user_id,
-            "target_chat_id": chat_id
-        })
+        clear_duplicates(user_id, chat_id)
+        db.failed_sends.delete_many({"user_id": user_id, "target_chat_id": chat_id})
         return True
     return False
 
@@ -328,32 +402,111 @@ def get_setting(target: Dict[str, Any], key: str, default: Any = None) -> Any:
 # ============================================================
 # DUPLICATES (FULLY PRESERVED)
 # ============================================================
+#
+# Two storage layouts, chosen with Config.DUP_STORAGE:
+#   "full"    → `duplicates`:       {user_id, target_chat_id, unique_file_id, created_at}
+#   "compact" → `duplicate_hashes`: {u, t, h, c} where h is a 64-bit hash of
+#               the unique_file_id (fixed 8 bytes in the document and index
+#               instead of a ~30 char string) and the field names are short.
+# Either layout may carry an expiry date (`expires_at` / `x`) that a TTL index
+# honours; targets without retention never get one. Use migrate_duplicates.py
+# to move existing records to the compact layout.
+
+COMPACT_DUPLICATES = Config.DUP_STORAGE == "compact"
+
+
+def duplicate_hash(unique_file_id: str) -> int:
+    """Stable signed 64-bit fingerprint of a unique_file_id (a BSON Int64)."""
+    digest = hashlib.blake2b(unique_file_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def duplicate_key(unique_file_id: str) -> Union[str, int]:
+    """The value actually stored (and cached) for a unique_file_id."""
+    return duplicate_hash(unique_file_id) if COMPACT_DUPLICATES else unique_file_id
+
+
+def _dup_collection() -> Collection:
+    return db.duplicate_hashes if COMPACT_DUPLICATES else db.duplicates
+
+
+def _dup_fields() -> Tuple[str, str, str, str, str]:
+    """(user, target, key, created, expires) field names of the active layout."""
+    if COMPACT_DUPLICATES:
+        return "u", "t", "h", "c", "x"
+    return "user_id", "target_chat_id", "unique_file_id", "created_at", "expires_at"
+
+
+def _dup_target_filter(user_id: int, target_chat_id: int) -> Dict[str, Any]:
+    user_f, target_f, _, _, _ = _dup_fields()
+    return {user_f: user_id, target_f: target_chat_id}
+
+
+def _dup_docs(
+    user_id: int,
+    target_chat_id: int,
+    unique_file_ids: List[str],
+    ttl_days: int = 0
+) -> List[Dict[str, Any]]:
+    user_f, target_f, key_f, created_f, expires_f = _dup_fields()
+    now = datetime.now(timezone.utc)
+    docs = []
+    for unique_file_id in unique_file_ids:
+        doc = {
+            user_f: user_id,
+            target_f: target_chat_id,
+            key_f: duplicate_key(unique_file_id),
+            created_f: now
+        }
+        if ttl_days > 0:
+            doc[expires_f] = now + timedelta(days=ttl_days)
+        docs.append(doc)
+    return docs
+
 
 def is_duplicate(user_id: int, target_chat_id: int, unique_file_id: str) -> bool:
-    doc = db.duplicates.find_one({
-        "user_id": user_id,
-        "target_chat_id": target_chat_id,
-        "unique_file_id": unique_file_id
-    })
-    return doc is not None
+    _, _, key_f, _, _ = _dup_fields()
+    query = _dup_target_filter(user_id, target_chat_id)
+    query[key_f] = duplicate_key(unique_file_id)
+    return _dup_collection().find_one(query, {"_id": 1}) is not None
+
+
+def get_new_unique_ids(
+    user_id: int,
+    target_chat_id: int,
+    unique_file_ids: List[str]
+) -> List[str]:
+    """
+    Batch version of is_duplicate(): resolve many ids with one $in query.
+    Returns the ids NOT forwarded yet, in input order, without repeats.
+    """
+    wanted = list(dict.fromkeys(unique_file_ids))
+    if not wanted:
+        return []
+
+    _, _, key_f, _, _ = _dup_fields()
+    keys = {unique_file_id: duplicate_key(unique_file_id) for unique_file_id in wanted}
+    query = _dup_target_filter(user_id, target_chat_id)
+    query[key_f] = {"$in": list(keys.values())}
+
+    existing = {doc[key_f] for doc in _dup_collection().find(query, {"_id": 0, key_f: 1})}
+    return [unique_file_id for unique_file_id in wanted if keys[unique_file_id] not in existing]
 
 
 def mark_as_forwarded(
     user_id: int,
     target_chat_id: int,
-    unique_file_id: str
+    unique_file_id: str,
+    ttl_days: int = 0
 ) -> bool:
     """
     Save unique_file_id for this user + target.
     Returns True if inserted, False if already exists.
     """
     try:
-        db.duplicates.insert_one({
-            "user_id": user_id,
-            "target_chat_id": target_chat_id,
-            "unique_file_id": unique_file_id,
-            "created_at": datetime.now(timezone.utc)
-        })
+        _dup_collection().insert_one(
+            _dup_docs(user_id, target_chat_id, [unique_file_id], ttl_days)[0]
+        )
         return True
     except DuplicateKeyError:
         return False
@@ -362,19 +515,178 @@ def mark_as_forwarded(
         return False
 
 
+def mark_many_as_forwarded(
+    user_id: int,
+    target_chat_id: int,
+    unique_file_ids: List[str],
+    ttl_days: int = 0
+) -> int:
+    """
+    Save several unique_file_ids in one round trip.
+    Already existing ids are ignored. Returns number inserted.
+    """
+    if not unique_file_ids:
+        return 0
+
+    docs = _dup_docs(user_id, target_chat_id, unique_file_ids, ttl_days)
+    try:
+        result = _dup_collection().insert_many(docs, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        # Duplicate keys (code 11000) are expected; anything else is logged
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors):
+            logger.error(f"Error marking duplicates: {errors[:3]}")
+        return e.details.get("nInserted", 0)
+    except Exception as e:
+        logger.error(f"Error marking duplicates: {e}")
+        return 0
+
+
 def clear_duplicates(user_id: int, target_chat_id: int) -> int:
-    result = db.duplicates.delete_many({
-        "user_id": user_id,
-        "target_chat_id": target_chat_id
-    })
-    return result.deleted_count
+    """Delete a target's records from both layouts (covers half-migrated data)."""
+    deleted = 0
+    for collection, query in (
+        (db.duplicates, {"user_id": user_id, "target_chat_id": target_chat_id}),
+        (db.duplicate_hashes, {"u": user_id, "t": target_chat_id}),
+    ):
+        deleted += collection.delete_many(query).deleted_count
+    return deleted
 
 
 def get_duplicate_count(user_id: int, target_chat_id: int) -> int:
-    return db.duplicates.count_documents({
-        "user_id": user_id,
-        "target_chat_id": target_chat_id
-    })
+    return _dup_collection().count_documents(_dup_target_filter(user_id, target_chat_id))
+
+
+def trim_duplicates(user_id: int, target_chat_id: int, max_entries: int) -> int:
+    """
+    Enforce a per-target cap: delete the oldest records beyond max_entries.
+    Returns how many were deleted.
+    """
+    if max_entries <= 0:
+        return 0
+
+    _, _, _, created_f, _ = _dup_fields()
+    collection = _dup_collection()
+    query = _dup_target_filter(user_id, target_chat_id)
+
+    # Newest record that must go: everything older than it is deleted
+    cutoff = list(
+        collection.find(query, {"_id": 0, created_f: 1})
+        .sort(created_f, DESCENDING)
+        .skip(max_entries)
+        .limit(1)
+    )
+    if not cutoff:
+        return 0
+    cutoff = cutoff[0][created_f]
+    deleted = collection.delete_many({**query, created_f: {"$lt": cutoff}}).deleted_count
+
+    # A bulk insert shares one timestamp, so records at the cutoff may still
+    # be partly within the cap: keep the newest of them (by _id) that fit
+    newer = collection.count_documents({**query, created_f: {"$gt": cutoff}})
+    ties = [
+        doc["_id"] for doc in
+        collection.find({**query, created_f: cutoff}, {"_id": 1}).sort("_id", DESCENDING)
+    ]
+    surplus = ties[max(0, max_entries - newer):]
+    if surplus:
+        deleted += collection.delete_many({"_id": {"$in": surplus}}).deleted_count
+    return deleted
+
+
+def get_duplicate_ids_page(
+    user_id: int,
+    target_chat_id: int,
+    after: Optional[Union[str, int]] = None,
+    limit: int = 10000
+) -> List[Union[str, int]]:
+    """
+    One page of a target's stored keys (see duplicate_key) in index order,
+    for cache loading. Pass the last key of the previous page as `after`.
+    """
+    _, _, key_f, _, _ = _dup_fields()
+    query = _dup_target_filter(user_id, target_chat_id)
+    if after is not None:
+        query[key_f] = {"$gt": after}
+
+    cursor = (
+        _dup_collection().find(query, {"_id": 0, key_f: 1})
+        .sort(key_f, ASCENDING)
+        .limit(limit)
+    )
+    return [doc[key_f] for doc in cursor]
+
+
+def get_duplicate_ids_since(
+    user_id: int,
+    target_chat_id: int,
+    since: datetime
+) -> List[Union[str, int]]:
+    """Keys of a target's records created at or after `since` (cache sync)."""
+    _, _, key_f, created_f, _ = _dup_fields()
+    query = _dup_target_filter(user_id, target_chat_id)
+    query[created_f] = {"$gte": since}
+    return [doc[key_f] for doc in _dup_collection().find(query, {"_id": 0, key_f: 1})]
+
+
+def add_duplicate_hashes(user_id: int, target_chat_id: int, hashes: List[int]) -> int:
+    """Insert ready-made fingerprints into the compact layout (local index export)."""
+    if not hashes:
+        return 0
+    now = datetime.now(timezone.utc)
+    docs = [{"u": user_id, "t": target_chat_id, "h": h, "c": now} for h in hashes]
+    try:
+        return len(db.duplicate_hashes.insert_many(docs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors):
+            logger.error(f"Error exporting duplicate hashes: {errors[:3]}")
+        return e.details.get("nInserted", 0)
+
+
+def migrate_duplicates_to_compact(batch_size: int = 5000, delete_source: bool = False) -> int:
+    """
+    Copy every `duplicates` record into `duplicate_hashes`, keeping created_at
+    and expires_at. Safe to re-run: records already copied are skipped.
+    With delete_source the copied batches are removed from `duplicates`.
+    Returns the number of records processed.
+    """
+    processed = 0
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(db.duplicates.find(query).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            break
+
+        docs = []
+        for doc in batch:
+            compact = {
+                "u": doc["user_id"],
+                "t": doc["target_chat_id"],
+                "h": duplicate_hash(doc["unique_file_id"]),
+                "c": doc.get("created_at", datetime.now(timezone.utc))
+            }
+            if doc.get("expires_at"):
+                compact["x"] = doc["expires_at"]
+            docs.append(compact)
+
+        try:
+            db.duplicate_hashes.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in errors):
+                raise
+
+        if delete_source:
+            db.duplicates.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+
+        processed += len(batch)
+        last_id = batch[-1]["_id"]
+        logger.info(f"Duplicates migrated: {processed}")
+
+    return processed
 
 
 # ============================================================
@@ -483,35 +795,41 @@ def increment_account_forwarded(
     count: int = 1
 ) -> Optional[Dict[str, Any]]:
     """
-    Atomically increment forwarded_count and total_forwarded.
-    If limit reached → put account to sleep.
-    Returns the updated account document.
+    Atomically credit `count` sends to forwarded_count and total_forwarded.
+    If the limit is reached → put account to sleep (same round trip).
+    Pass count > 1 to credit a whole batch / album at once.
+    Returns the updated account document (None if it doesn't exist).
     """
-    account = get_account(user_id, account_id)
-    if not account:
-        return None
-
-    new_count = account.get("forwarded_count", 0) + count
-    limit = account.get("forward_limit", 500)
-
-    updates = {
-        "forwarded_count": new_count,
-        "total_forwarded": account.get("total_forwarded", 0) + count,
-        "last_used_at": datetime.now(timezone.utc),
-        "updated_at": datetime.now(timezone.utc)
-    }
-
-    if new_count >= limit:
-        sleep_minutes = account.get("sleep_after_limit_minutes", 30)
-        updates["status"] = AccountStatus.SLEEPING.value
-        updates["sleep_until"] = datetime.now(timezone.utc) + timedelta(minutes=sleep_minutes)
-        updates["forwarded_count"] = 0   # reset for next cycle
+    now = datetime.now(timezone.utc)
+    new_count = {"$add": [{"$ifNull": ["$forwarded_count", 0]}, count]}
+    limit_hit = {"$gte": [new_count, {"$ifNull": ["$forward_limit", 500]}]}
+    sleep_ms = {"$multiply": [{"$ifNull": ["$sleep_after_limit_minutes", 30]}, 60_000]}
 
-    db.forward_accounts.update_one(
+    # Update pipeline: every expression sees the document *before* this
+    # update, so two concurrent jobs on one account can't lose increments.
+    return db.forward_accounts.find_one_and_update(
         {"user_id": user_id, "account_id": account_id},
-        {"$set": updates}
+        [
+            {
+                "$set": {
+                    "total_forwarded": {
+                        "$add": [{"$ifNull": ["$total_forwarded", 0]}, count]
+                    },
+                    # reset for next cycle when the limit is reached
+                    "forwarded_count": {"$cond": [limit_hit, 0, new_count]},
+                    "status": {
+                        "$cond": [limit_hit, AccountStatus.SLEEPING.value, "$status"]
+                    },
+                    "sleep_until": {
+                        "$cond": [limit_hit, {"$add": [now, sleep_ms]}, "$sleep_until"]
+                    },
+                    "last_used_at": now,
+                    "updated_at": now
+                }
+            }
+        ],
+        return_document=ReturnDocument.AFTER
     )
-    return get_account(user_id, account_id)
 
 
 def wake_sleeping_accounts(user_id: Optional[int] = None) -> int:
@@ -663,6 +981,17 @@ def increment_bot_forwarded(user_id: int, bot_id: str, count: int = 1) -> bool:
 # FORWARD JOBS
 # ============================================================
 
+def _empty_job_stats() -> Dict[str, int]:
+    return {
+        "fetched": 0,
+        "forwarded": 0,
+        "skipped_filter": 0,
+        "skipped_duplicate": 0,
+        "skipped_deleted": 0,
+        "errors": 0
+    }
+
+
 def create_job(
     user_id: int,
     source_chat_id: Union[int, str],
@@ -676,13 +1005,17 @@ def create_job(
     initial_limit: Optional[int] = None,   # None = unlimited until last_msg_id
     future_new_posts: bool = False,
     account_strategy: str = AccountStrategy.SEQUENTIAL.value,
-    name: Optional[str] = None
+    name: Optional[str] = None,
+    bot_ids: Optional[List[str]] = None,   # bot pool; bot_id defaults to the first
+    pool_strategy: str = PoolStrategy.CAPACITY.value
 ) -> Dict[str, Any]:
     """
     Create a new forward job.
     """
     now = datetime.now(timezone.utc)
     job_id = str(ObjectId())
+    if bot_ids and not bot_id:
+        bot_id = bot_ids[0]
 
     doc = {
         "user_id": user_id,
@@ -694,6 +1027,8 @@ def create_job(
         "method": method,
         "account_ids": account_ids or [],
         "bot_id": bot_id,
+        "bot_ids": bot_ids or ([bot_id] if bot_id else []),
+        "pool_strategy": pool_strategy,
         "last_msg_id": last_msg_id,
         "skip": skip,
         "current_msg_id": skip,             # progress pointer
@@ -701,13 +1036,11 @@ def create_job(
         "future_new_posts": future_new_posts,
         "account_strategy": account_strategy,
         "status": JobStatus.PENDING.value,
-        "stats": {
-            "fetched": 0,
-            "forwarded": 0,
-            "skipped_filter": 0,
-            "skipped_duplicate": 0,
-            "skipped_deleted": 0,
-            "errors": 0
+        "stats": _empty_job_stats(),
+        # per-target progress: {"<chat_id>": {"current_msg_id": .., "stats": {..}}}
+        "targets_progress": {
+            str(chat_id): {"current_msg_id": skip, "stats": _empty_job_stats()}
+            for chat_id in target_chat_ids
         },
         "started_at": None,
         "completed_at": None,
@@ -750,8 +1083,141 @@ def get_active_jobs(user_id: Optional[int] = None) -> List[Dict[str, Any]]:
     return list(db.forward_jobs.find(query).sort("created_at", 1))
 
 
+def get_job_statuses(job_ids: List[str]) -> Dict[str, str]:
+    """{job_id: status} for many jobs in one query (missing jobs are omitted)."""
+    cursor = db.forward_jobs.find(
+        {"job_id": {"$in": job_ids}},
+        {"_id": 0, "job_id": 1, "status": 1}
+    )
+    return {doc["job_id"]: doc.get("status") for doc in cursor}
+
+
+def get_running_jobs(
+    dispatched_since: Optional[datetime] = None,
+    dispatched_until: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    RUNNING jobs across users, optionally only those whose dispatch_at falls
+    in (since, until]. Served by the (status, dispatch_at) index; used by the
+    scheduler's poll.
+    """
+    query: Dict[str, Any] = {"status": JobStatus.RUNNING.value}
+    if dispatched_since is not None:
+        query["dispatch_at"] = {"$gt": dispatched_since}
+        if dispatched_until is not None:
+            query["dispatch_at"]["$lte"] = dispatched_until
+    return list(db.forward_jobs.find(query).sort("dispatch_at", 1))
+
+
+def rearm_job(user_id: int, job_id: str, delay_seconds: float) -> bool:
+    """Have the scheduler dispatch a RUNNING job again in `delay_seconds`."""
+    result = db.forward_jobs.update_one(
+        {"user_id": user_id, "job_id": job_id, "status": JobStatus.RUNNING.value},
+        {"$set": {"dispatch_at": datetime.now(timezone.utc) + timedelta(seconds=delay_seconds)}}
+    )
+    return result.modified_count > 0
+
+
+# ---------- job leases ----------
+# A RUNNING job is executed by whichever worker process holds its lease:
+# {"lease": {"owner", "claimed_at", "heartbeat_at", "expires_at"}}.
+# Lease writes never touch status / dispatch_at, so the scheduler ignores them.
+
+def claim_job_lease(
+    user_id: int,
+    job_id: str,
+    worker_id: str,
+    lease_seconds: float
+) -> Optional[Dict[str, Any]]:
+    """
+    Atomically take (or re-take) the lease of a RUNNING job if it is free,
+    already ours, or expired. Returns the job, or None if someone else holds it.
+    """
+    now = datetime.now(timezone.utc)
+    return db.forward_jobs.find_one_and_update(
+        {
+            "user_id": user_id,
+            "job_id": job_id,
+            "status": JobStatus.RUNNING.value,
+            "$or": [
+                {"lease": None},
+                {"lease.owner": worker_id},
+                {"lease.expires_at": {"$lt": now}},
+            ]
+        },
+        {"$set": {"lease": {
+            "owner": worker_id,
+            "claimed_at": now,
+            "heartbeat_at": now,
+            "expires_at": now + timedelta(seconds=lease_seconds),
+        }}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def renew_job_lease(job_id: str, worker_id: str, lease_seconds: float) -> bool:
+    """Heartbeat. False → the lease was lost (expired and taken over, or job gone)."""
+    now = datetime.now(timezone.utc)
+    result = db.forward_jobs.update_one(
+        {"job_id": job_id, "lease.owner": worker_id},
+        {"$set": {
+            "lease.heartbeat_at": now,
+            "lease.expires_at": now + timedelta(seconds=lease_seconds),
+        }}
+    )
+    return result.matched_count > 0
+
+
+def release_job_lease(job_id: str, worker_id: str) -> bool:
+    result = db.forward_jobs.update_one(
+        {"job_id": job_id, "lease.owner": worker_id},
+        {"$unset": {"lease": ""}}
+    )
+    return result.modified_count > 0
+
+
+def get_jobs_with_expired_lease() -> List[Dict[str, Any]]:
+    """RUNNING jobs whose worker stopped heart-beating (died / lost Mongo)."""
+    return list(db.forward_jobs.find({
+        "status": JobStatus.RUNNING.value,
+        "lease.expires_at": {"$lt": datetime.now(timezone.utc)}
+    }))
+
+
+def watch_job_changes(resume_after: Optional[Dict[str, Any]] = None, max_await_ms: int = 1000):
+    """
+    Change stream over forward_jobs limited to status / dispatch_at changes,
+    inserts and deletes (progress updates are filtered out server-side).
+    Raises OperationFailure when the server has no change streams
+    (standalone mongod).
+    """
+    pipeline = [{
+        "$match": {
+            "$or": [
+                {"operationType": {"$in": ["insert", "replace", "delete"]}},
+                {"updateDescription.updatedFields.status": {"$exists": True}},
+                {"updateDescription.updatedFields.dispatch_at": {"$exists": True}},
+            ]
+        }
+    }]
+    return db.forward_jobs.watch(
+        pipeline,
+        full_document="updateLookup",
+        resume_after=resume_after,
+        max_await_time_ms=max_await_ms
+    )
+
+
+def get_jobs_by_status(status: str) -> List[Dict[str, Any]]:
+    """All jobs with the given status, across users."""
+    return list(db.forward_jobs.find({"status": status}).sort("created_at", 1))
+
+
 def update_job(user_id: int, job_id: str, updates: Dict[str, Any]) -> bool:
     updates["updated_at"] = datetime.now(timezone.utc)
+    if "status" in updates:
+        # What the scheduler's poll keys on (progress only bumps updated_at)
+        updates["dispatch_at"] = updates["updated_at"]
     result = db.forward_jobs.update_one(
         {"user_id": user_id, "job_id": job_id},
         {"$set": updates}
@@ -759,28 +1225,72 @@ def update_job(user_id: int, job_id: str, updates: Dict[str, Any]) -> bool:
     return result.modified_count > 0
 
 
+def build_job_stats_update(
+    stats_increment: Dict[str, int],
+    current_msg_id: Optional[int] = None,
+    target_increments: Optional[Dict[int, Dict[str, int]]] = None,
+    target_cursors: Optional[Dict[int, int]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Build the {"$inc", "$set"} update used by update_job_stats().
+    target_increments / target_cursors go to targets_progress.<chat_id>;
+    target increments are also added to the job-wide totals.
+    """
+    inc = {f"stats.{k}": v for k, v in stats_increment.items()}
+    set_fields = {"updated_at": datetime.now(timezone.utc)}
+    if current_msg_id is not None:
+        set_fields["current_msg_id"] = current_msg_id
+
+    for chat_id, increments in (target_increments or {}).items():
+        for k, v in increments.items():
+            inc[f"targets_progress.{chat_id}.stats.{k}"] = v
+            if k != "fetched":
+                inc[f"stats.{k}"] = inc.get(f"stats.{k}", 0) + v
+    for chat_id, msg_id in (target_cursors or {}).items():
+        set_fields[f"targets_progress.{chat_id}.current_msg_id"] = msg_id
+
+    return {"$inc": inc, "$set": set_fields}
+
+
 def update_job_stats(
     user_id: int,
     job_id: str,
     stats_increment: Dict[str, int],
-    current_msg_id: Optional[int] = None
+    current_msg_id: Optional[int] = None,
+    target_increments: Optional[Dict[int, Dict[str, int]]] = None,
+    target_cursors: Optional[Dict[int, int]] = None
 ) -> bool:
     """
     Atomically increment job stats.
     Example stats_increment = {"forwarded": 1, "fetched": 1}
     """
-    inc = {f"stats.{k}": v for k, v in stats_increment.items()}
-    set_fields = {"updated_at": datetime.now(timezone.utc)}
-    if current_msg_id is not None:
-        set_fields["current_msg_id"] = current_msg_id
+    update = build_job_stats_update(
+        stats_increment, current_msg_id, target_increments, target_cursors
+    )
+    if not update["$inc"]:
+        del update["$inc"]
 
     result = db.forward_jobs.update_one(
         {"user_id": user_id, "job_id": job_id},
-        {"$inc": inc, "$set": set_fields}
+        update
     )
     return result.modified_count > 0
 
 
+def get_target_cursors(job: Dict[str, Any]) -> Dict[int, int]:
+    """
+    Resume points per target: {chat_id: last handled msg id}.
+    Jobs created before targets_progress existed fall back to current_msg_id.
+    """
+    fallback = job.get("current_msg_id", job.get("skip", 0))
+    progress = job.get("targets_progress") or {}
+    cursors = {}
+    for chat_id in job.get("target_chat_ids", []):
+        entry = progress.get(str(chat_id)) or {}
+        cursors[chat_id] = entry.get("current_msg_id", fallback)
+    return cursors
+
+
 def set_job_status(
     user_id: int,
     job_id: str,
@@ -791,8 +1301,12 @@ def set_job_status(
         "status": status,
         "updated_at": datetime.now(timezone.utc)
     }
-    if status == JobStatus.RUNNING.value and not get_job(user_id, job_id).get("started_at"):
-        updates["started_at"] = datetime.now(timezone.utc)
+    if status == JobStatus.RUNNING.value:
+        job = get_job(user_id, job_id)
+        if job is None:
+            return False  # deleted meanwhile
+        if not job.get("started_at"):
+            updates["started_at"] = datetime.now(timezone.utc)
     if status in [JobStatus.COMPLETED.value, JobStatus.CANCELLED.value, JobStatus.FAILED.value]:
         updates["completed_at"] = datetime.now(timezone.utc)
     if error_message is not None:
@@ -808,6 +1322,7 @@ def delete_job(user_id: int, job_id: str) -> bool:
     })
     if result.deleted_count > 0:
         db.job_logs.delete_many({"job_id": job_id})
+        db.failed_sends.delete_many({"job_id": job_id})
         return True
     return False
 
@@ -836,6 +1351,133 @@ def get_job_logs(job_id: str, limit: int = 100) -> List[Dict[str, Any]]:
     return list(cursor)
 
 
+# ============================================================
+# FAILED SENDS (retry queue / dead letters)
+# ============================================================
+# One document per (job, target, msg_id) that could not be delivered.
+# Retried with exponential backoff (SEND_RETRY_BASE_SECONDS * 2^(attempts-1));
+# after SEND_MAX_ATTEMPTS failures it becomes a dead letter until the user
+# retries it from the job view.
+
+def record_failed_sends(
+    user_id: int,
+    job_id: str,
+    target_chat_id: int,
+    msg_ids: List[int],
+    error: str = ""
+) -> int:
+    """Add messages to the retry queue, or count one more attempt. One round trip."""
+    if not msg_ids:
+        return 0
+    now = datetime.now(timezone.utc)
+    attempts = {"$add": [{"$ifNull": ["$attempts", 0]}, 1]}
+    backoff_ms = {
+        "$multiply": [
+            Config.SEND_RETRY_BASE_SECONDS * 1000,
+            {"$pow": [2, {"$subtract": ["$attempts", 1]}]}
+        ]
+    }
+    # Update pipeline: the second stage sees the incremented attempts
+    pipeline = [
+        {
+            "$set": {
+                "user_id": user_id,
+                "attempts": attempts,
+                "last_error": error[:300],
+                "created_at": {"$ifNull": ["$created_at", now]},
+                "updated_at": now
+            }
+        },
+        {
+            "$set": {
+                "status": {
+                    "$cond": [
+                        {"$gte": ["$attempts", Config.SEND_MAX_ATTEMPTS]},
+                        FailedSendStatus.DEAD.value,
+                        FailedSendStatus.PENDING.value
+                    ]
+                },
+                "next_attempt_at": {"$add": [now, backoff_ms]}
+            }
+        }
+    ]
+    ops = [
+        UpdateOne(
+            {"job_id": job_id, "target_chat_id": target_chat_id, "msg_id": msg_id},
+            pipeline,
+            upsert=True
+        )
+        for msg_id in dict.fromkeys(msg_ids)
+    ]
+    result = db.failed_sends.bulk_write(ops, ordered=False)
+    return result.upserted_count + result.modified_count
+
+
+def get_due_failed_sends(job_id: str, target_chat_id: int, limit: int = 100) -> List[int]:
+    """Msg ids of a target whose next retry is due, oldest message first."""
+    cursor = db.failed_sends.find(
+        {
+            "job_id": job_id,
+            "target_chat_id": target_chat_id,
+            "status": FailedSendStatus.PENDING.value,
+            "next_attempt_at": {"$lte": datetime.now(timezone.utc)}
+        },
+        {"_id": 0, "msg_id": 1}
+    ).sort("msg_id", ASCENDING).limit(limit)
+    return [doc["msg_id"] for doc in cursor]
+
+
+def postpone_failed_sends(job_id: str, target_chat_id: int, msg_ids: List[int], seconds: float) -> int:
+    """Make entries due again in `seconds`, without counting an attempt (FloodWait)."""
+    if not msg_ids:
+        return 0
+    now = datetime.now(timezone.utc)
+    result = db.failed_sends.update_many(
+        {"job_id": job_id, "target_chat_id": target_chat_id, "msg_id": {"$in": msg_ids}},
+        {"$set": {"next_attempt_at": now + timedelta(seconds=seconds), "updated_at": now}}
+    )
+    return result.modified_count
+
+
+def resolve_failed_sends(job_id: str, target_chat_id: int, msg_ids: List[int]) -> int:
+    """Drop entries that were delivered (or whose message is gone)."""
+    if not msg_ids:
+        return 0
+    result = db.failed_sends.delete_many({
+        "job_id": job_id,
+        "target_chat_id": target_chat_id,
+        "msg_id": {"$in": msg_ids}
+    })
+    return result.deleted_count
+
+
+def get_failed_send_counts(job_id: str) -> Dict[str, int]:
+    """{"pending": n, "dead": n} for a job."""
+    counts = {status.value: 0 for status in FailedSendStatus}
+    for doc in db.failed_sends.aggregate([
+        {"$match": {"job_id": job_id}},
+        {"$group": {"_id": "$status", "n": {"$sum": 1}}}
+    ]):
+        counts[doc["_id"]] = doc["n"]
+    return counts
+
+
+def retry_failed_sends(user_id: int, job_id: str) -> int:
+    """Make every pending and dead entry of a job due now, with fresh attempts."""
+    result = db.failed_sends.update_many(
+        {"user_id": user_id, "job_id": job_id},
+        {
+            "$set": {
+                "status": FailedSendStatus.PENDING.value,
+                "attempts": 0,
+                "next_attempt_at": datetime.now(timezone.utc),
+                "updated_at": datetime.now(timezone.utc)
+            }
+        }
+    )
+    return result.matched_count
+
+
 # ============================================================
 # STATISTICS (Dashboard)
 # ============================================================
@@ -870,37 +1512,74 @@ def get_or_create_stats(
     return doc
 
 
-def increment_stats(
+def _stats_upsert(
     user_id: int,
     entity_type: str,
     entity_id: str,
     increments: Dict[str, int]
-) -> None:
-    """
-    increments example: {"forwarded": 1, "duplicates": 1}
-    """
-    set_on_insert = {
-        "user_id": user_id,
-        "entity_type": entity_type,
-        "entity_id": entity_id,
-        "created_at": datetime.now(timezone.utc)
-    }
-    inc = {k: v for k, v in increments.items()}
-    db.statistics.update_one(
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(filter, update) for an upserting statistics increment."""
+    now = datetime.now(timezone.utc)
+    return (
         {
             "user_id": user_id,
             "entity_type": entity_type,
             "entity_id": entity_id
         },
         {
-            "$inc": inc,
-            "$set": {"updated_at": datetime.now(timezone.utc)},
-            "$setOnInsert": set_on_insert
-        },
-        upsert=True
+            "$inc": dict(increments),
+            "$set": {"updated_at": now},
+            "$setOnInsert": {
+                "user_id": user_id,
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "created_at": now
+            }
+        }
     )
 
 
+def increment_stats(
+    user_id: int,
+    entity_type: str,
+    entity_id: str,
+    increments: Dict[str, int]
+) -> None:
+    """
+    increments example: {"forwarded": 1, "duplicates": 1}
+    """
+    query, update = _stats_upsert(user_id, entity_type, entity_id, increments)
+    db.statistics.update_one(query, update, upsert=True)
+
+
+def apply_stats_batch(
+    job_updates: Dict[Tuple[int, str], Dict[str, Dict[str, Any]]],
+    entity_increments: Dict[Tuple[int, str, str], Dict[str, int]]
+) -> None:
+    """
+    Write merged counters in bulk (used by core.stats_buffer).
+    job_updates:       {(user_id, job_id): {"$inc": {...}, "$set": {...}}}
+    entity_increments: {(user_id, entity_type, entity_id): {"forwarded": n, ...}}
+    """
+    if job_updates:
+        ops = []
+        for (user_id, job_id), update in job_updates.items():
+            update = {k: v for k, v in update.items() if v}
+            if update:
+                ops.append(UpdateOne({"user_id": user_id, "job_id": job_id}, update))
+        if ops:
+            db.forward_jobs.bulk_write(ops, ordered=False)
+
+    if entity_increments:
+        ops = [
+            UpdateOne(*_stats_upsert(user_id, entity_type, entity_id, increments), upsert=True)
+            for (user_id, entity_type, entity_id), increments in entity_increments.items()
+            if increments
+        ]
+        if ops:
+            db.statistics.bulk_write(ops, ordered=False)
+
+
 def get_dashboard_counts(user_id: int) -> Dict[str, int]:
     """Quick counts for the main dashboard."""
     return {
@@ -911,7 +1590,7 @@ def get_dashboard_counts(user_id: int) -> Dict[str, int]:
             "user_id": user_id,
             "status": {"$in": [JobStatus.RUNNING.value, JobStatus.PENDING.value]}
         }),
-        "duplicates": db.duplicates.count_documents({"user_id": user_id}),
+        "duplicates": _dup_collection().count_documents({_dup_fields()[0]: user_id}),
     }
 
 
@@ -987,3 +1666,40 @@ def can_use_future_posts(
         return len(accounts) > 0
 
     return False
+
+
+# ============================================================
+# ASYNC FACADE
+# ============================================================
+# PyMongo is blocking. Async code must not call the functions above directly
+# (every round trip would freeze all jobs and UI callbacks); use
+#     await adb.get_job(user_id, job_id)
+# instead – same names, same arguments, run on a bounded thread pool.
+
+_DB_EXECUTOR = ThreadPoolExecutor(
+    max_workers=Config.DB_THREADS,
+    thread_name_prefix="mongo"
+)
+
+
+class AsyncDatabaseAPI:
+    """Awaitable wrappers around the public functions of this module."""
+
+    def __getattr__(self, name: str):
+        func = globals().get(name)
+        if name.startswith("_") or not inspect.isfunction(func):
+            raise AttributeError(f"database has no function {name!r}")
+
+        @functools.wraps(func)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                _DB_EXECUTOR, functools.partial(func, *args, **kwargs)
+            )
+
+        # Cache so the wrapper is only built once per function
+        setattr(self, name, call)
+        return call
+
+
+adb = AsyncDatabaseAPI()
@@ -3,12 +3,7 @@
 from pyrogram import Client, filters
 from pyrogram.types import CallbackQuery
 
-from database import (
-    is_admin, ensure_user,
-    get_user_accounts, get_account,
-    update_account, set_account_status,
-    delete_account, reset_account_cycle, AccountStatus
-)
+from database import adb, is_admin, AccountStatus
 from handlers.keyboards import (
     accounts_list_keyboard,
     account_settings_keyboard,
@@ -21,7 +16,7 @@ logger = logging.getLogger(__name__)
 
 async def show_accounts_list(client: Client, query: CallbackQuery):
     user_id = query.from_user.id
-    accounts = get_user_accounts(user_id)
+    accounts = await adb.get_user_accounts(user_id)
 
     if not accounts:
         text = (
@@ -43,7 +38,7 @@ async def accounts_callbacks(client: Client, query: CallbackQuery):
         return await query.answer("Not allowed", show_alert=True)
 
     data = query.data
-    ensure_user(user_id)
+    await adb.ensure_user(user_id)
 
     if data == "acc:list":
         await show_accounts_list(client, query)
@@ -62,7 +57,7 @@ async def accounts_callbacks(client: Client, query: CallbackQuery):
 
     if data.startswith("acc:open:"):
         account_id = data.split(":")[2]
-        account = get_account(user_id, account_id)
+        account = await adb.get_account(user_id, account_id)
         if not account:
             return await query.answer("Account not found", show_alert=True)
 
@@ -88,15 +83,15 @@ async def accounts_callbacks(client: Client, query: CallbackQuery):
 
     if data.startswith("acc:toggle_status:"):
         account_id = data.split(":")[2]
-        account = get_account(user_id, account_id)
+        account = await adb.get_account(user_id, account_id)
         if not account:
             return await query.answer("Account not found", show_alert=True)
 
         current = account.get("status", "active")
         new_status = AccountStatus.DISABLED.value if current == AccountStatus.ACTIVE.value else AccountStatus.ACTIVE.value
-        set_account_status(user_id, account_id, new_status)
+        await adb.set_account_status(user_id, account_id, new_status)
 
-        account = get_account(user_id, account_id)
+        account = await adb.get_account(user_id, account_id)
         await query.message.edit_text(
             f"**👤 Account Settings**\n\nStatus updated to `{new_status}`",
             reply_markup=account_settings_keyboard(account)
@@ -127,8 +122,8 @@ async def accounts_callbacks(client: Client, query: CallbackQuery):
 
     if data.startswith("acc:reset:"):
         account_id = data.split(":")[2]
-        reset_account_cycle(user_id, account_id)
-        account = get_account(user_id, account_id)
+        await adb.reset_account_cycle(user_id, account_id)
+        account = await adb.get_account(user_id, account_id)
         await query.answer("✅ Cycle reset", show_alert=True)
         await query.message.edit_text(
             "**👤 Account Settings**\n\nCycle has been reset.",
@@ -138,7 +133,7 @@ async def accounts_callbacks(client: Client, query: CallbackQuery):
 
     if data.startswith("acc:delete:"):
         account_id = data.split(":")[2]
-        account = get_account(user_id, account_id)
+        account = await adb.get_account(user_id, account_id)
         if not account:
             return await query.answer("Account not found", show_alert=True)
 
@@ -152,7 +147,7 @@ async def accounts_callbacks(client: Client, query: CallbackQuery):
 
     if data.startswith("acc:confirm_delete:"):
         account_id = data.split(":")[2]
-        success = delete_account(user_id, account_id)
+        success = await adb.delete_account(user_id, account_id)
         if success:
             await query.answer("✅ Account deleted", show_alert=True)
             await show_accounts_list(client, query)
@@ -2,10 +2,7 @@
 from pyrogram import Client, filters
 from pyrogram.types import CallbackQuery
 
-from database import (
-    is_admin, ensure_user, get_user_bots, get_bot,
-    add_forward_bot, update_bot, delete_bot
-)
+from database import adb, is_admin
 from handlers.keyboards import (
     bots_list_keyboard, bot_settings_keyboard,
     confirm_delete_bot_keyboard
@@ -17,7 +14,7 @@ logger = logging.getLogger(__name__)
 
 async def show_bots_list(client: Client, query: CallbackQuery):
     user_id = query.from_user.id
-    bots = get_user_bots(user_id)
+    bots = await adb.get_user_bots(user_id)
 
     if not bots:
         text = (
@@ -39,7 +36,7 @@ async def bots_callbacks(client: Client, query: CallbackQuery):
         return await query.answer("Not allowed", show_alert=True)
 
     data = query.data
-    ensure_user(user_id)
+    await adb.ensure_user(user_id)
 
     if data == "bot:list":
         await show_bots_list(client, query)
@@ -58,7 +55,7 @@ async def bots_callbacks(client: Client, query: CallbackQuery):
 
     if data.startswith("bot:open:"):
         bot_id = data.split(":")[2]
-        bot = get_bot(user_id, bot_id)
+        bot = await adb.get_bot(user_id, bot_id)
         if not bot:
             return await query.answer("Bot not found", show_alert=True)
 
@@ -78,15 +75,15 @@ async def bots_callbacks(client: Client, query: CallbackQuery):
 
     if data.startswith("bot:toggle_status:"):
         bot_id = data.split(":")[2]
-        bot = get_bot(user_id, bot_id)
+        bot = await adb.get_bot(user_id, bot_id)
         if not bot:
             return await query.answer("Bot not found", show_alert=True)
 
         current = bot.get("status", "active")
         new_status = "disabled" if current == "active" else "active"
-        update_bot(user_id, bot_id, {"status": new_status})
+        await adb.update_bot(user_id, bot_id, {"status": new_status})
 
-        bot = get_bot(user_id, bot_id)
+        bot = await adb.get_bot(user_id, bot_id)
         await query.message.edit_text(
             f"**🤖 Bot Settings**\n\nStatus updated to `{new_status}`",
             reply_markup=bot_settings_keyboard(bot)
@@ -95,7 +92,7 @@ async def bots_callbacks(client: Client, query: CallbackQuery):
 
     if data.startswith("bot:delete:"):
         bot_id = data.split(":")[2]
-        bot = get_bot(user_id, bot_id)
+        bot = await adb.get_bot(user_id, bot_id)
         if not bot:
             return await query.answer("Bot not found", show_alert=True)
 
@@ -109,7 +106,7 @@ async def bots_callbacks(client: Client, query: CallbackQuery):
 
     if data.startswith("bot:confirm_delete:"):
         bot_id = data.split(":")[2]
-        success = delete_bot(user_id, bot_id)
+        success = await adb.delete_bot(user_id, bot_id)
         if success:
             await query.answer("✅ Bot deleted", show_alert=True)
             await show_bots_list(client, query)
@@ -1,17 +1,17 @@
 # handlers/dashboard.py
 from pyrogram import Client, filters
-from pyrogram.types import Message, CallbackQuery
+from pyrogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from pyrogram.enums import ParseMode
 
-from database import is_admin, ensure_user, get_dashboard_counts
+from database import adb, is_admin
 from handlers.keyboards import dashboard_keyboard
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def build_dashboard_text(user_id: int) -> str:
-    counts = get_dashboard_counts(user_id)
+async def build_dashboard_text(user_id: int) -> str:
+    counts = await adb.get_dashboard_counts(user_id)
     return (
         "╭────────────────────────╮\n"
         "│     📊 **Dashboard**      │\n"
@@ -32,8 +32,8 @@ async def cmd_start(client: Client, message: Message):
     if not is_admin(user_id):
         return await message.reply("❌ You are not allowed to use this bot.")
 
-    ensure_user(user_id)
-    text = build_dashboard_text(user_id)
+    await adb.ensure_user(user_id)
+    text = await build_dashboard_text(user_id)
     await message.reply(text, reply_markup=dashboard_keyboard(), parse_mode=ParseMode.MARKDOWN)
 
 
@@ -46,7 +46,7 @@ async def dashboard_callbacks(client: Client, query: CallbackQuery):
     data = query.data
 
     if data in ["dash:home", "dash:refresh"]:
-        text = build_dashboard_text(user_id)
+        text = await build_dashboard_text(user_id)
         await query.message.edit_text(text, reply_markup=dashboard_keyboard(), parse_mode=ParseMode.MARKDOWN)
         return await query.answer()
 
@@ -71,7 +71,7 @@ async def dashboard_callbacks(client: Client, query: CallbackQuery):
         return
 
     if data == "dash:stats":
-        counts = get_dashboard_counts(user_id)
+        counts = await adb.get_dashboard_counts(user_id)
         text = (
             "**📊 Statistics Overview**\n\n"
             f"🎯 Targets: `{counts['targets']}`\n"
@@ -5,7 +5,6 @@ from pyrogram import Client, filters
 from pyrogram.types import CallbackQuery
 from pyrogram import Client as TempClient
 
-from database import get_user_targets, get_user_accounts, get_user_bots
 from handlers.keyboards import (
     select_targets_keyboard, select_method_keyboard,
     select_accounts_keyboard, select_bot_keyboard
@@ -13,25 +12,29 @@ from handlers.keyboards import (
 
 
 from config import Config
-from database import (
-    is_admin, ensure_user, get_user_jobs, get_job,
-    set_job_status, delete_job, JobStatus,
-    get_bot, get_next_available_account
-)
+from database import adb, is_admin, JobStatus
 from handlers.keyboards import (
     jobs_list_keyboard, job_detail_keyboard,
     confirm_delete_job_keyboard
 )
 from core.permissions import validate_job_permissions
+from core.job_control import job_controls
+from core.job_scheduler import job_scheduler
 #from core.security import decrypt_session
 import logging
+from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
 
+def _aware(dt: datetime) -> datetime:
+    """PyMongo returns naive UTC datetimes unless tz_aware is set."""
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
 async def show_jobs_list(client: Client, query: CallbackQuery):
     user_id = query.from_user.id
-    jobs = get_user_jobs(user_id, limit=30)
+    jobs = await adb.get_user_jobs(user_id, limit=30)
 
     if not jobs:
         text = (
@@ -53,7 +56,7 @@ async def jobs_callbacks(client: Client, query: CallbackQuery):
         return await query.answer("Not allowed", show_alert=True)
 
     data = query.data
-    ensure_user(user_id)
+    await adb.ensure_user(user_id)
 
     # -------------------- List --------------------
     if data == "job:list":
@@ -79,18 +82,23 @@ async def jobs_callbacks(client: Client, query: CallbackQuery):
     # -------------------- Open Job --------------------
     if data.startswith("job:open:"):
         job_id = data.split(":")[2]
-        job = get_job(user_id, job_id)
+        job = await adb.get_job(user_id, job_id)
         if not job:
             return await query.answer("Job not found", show_alert=True)
 
         stats = job.get("stats", {})
+        mode = ""
+        if job.get("account_strategy") == "parallel":
+            mode = " (parallel)"
+        elif len(job.get("bot_ids") or []) > 1:
+            mode = f" (pool of {len(job['bot_ids'])}, {job.get('pool_strategy', 'capacity')})"
         text = (
             f"**📋 Job Details**\n\n"
             f"**Name:** {job.get('name')}\n"
             f"**Status:** `{job.get('status')}`\n"
             f"**Source:** {job.get('source_title')} (`{job.get('source_chat_id')}`)\n"
             f"**Targets:** {len(job.get('target_chat_ids', []))}\n"
-            f"**Method:** `{job.get('method')}`\n"
+            f"**Method:** `{job.get('method')}`{mode}\n"
             f"**Future Posts:** `{'ON' if job.get('future_new_posts') else 'OFF'}`\n\n"
             f"**Progress:**\n"
             f"• Fetched: `{stats.get('fetched', 0)}`\n"
@@ -99,13 +107,66 @@ async def jobs_callbacks(client: Client, query: CallbackQuery):
             f"• Duplicates: `{stats.get('skipped_duplicate', 0)}`\n"
             f"• Errors: `{stats.get('errors', 0)}`"
         )
-        await query.message.edit_text(text, reply_markup=job_detail_keyboard(job))
+        targets_progress = job.get("targets_progress") or {}
+        if targets_progress:
+            text += "\n\n**Per Target:**"
+            for chat_id, entry in targets_progress.items():
+                t_stats = entry.get("stats", {})
+                text += (
+                    f"\n• `{chat_id}` → msg `{entry.get('current_msg_id', 0)}`"
+                    f" | fwd `{t_stats.get('forwarded', 0)}`"
+                    f" | dup `{t_stats.get('skipped_duplicate', 0)}`"
+                )
+        lease = job.get("lease")
+        if lease:
+            now = datetime.now(timezone.utc)
+            beat = (now - _aware(lease["heartbeat_at"])).total_seconds()
+            left = (_aware(lease["expires_at"]) - now).total_seconds()
+            state = f"expires in {left:.0f}s" if left > 0 else "**expired**"
+            text += (
+                f"\n\n**Worker:** `{lease.get('owner')}`\n"
+                f"• Heartbeat: {beat:.0f}s ago | {state}"
+            )
+        failed = await adb.get_failed_send_counts(job_id)
+        if failed["pending"] or failed["dead"]:
+            text += (
+                f"\n\n**Failed Sends:**\n"
+                f"• Retry queue: `{failed['pending']}` | Dead letters: `{failed['dead']}`"
+            )
+        await query.message.edit_text(
+            text,
+            reply_markup=job_detail_keyboard(job, failed["pending"] + failed["dead"])
+        )
         return await query.answer()
 
+    # -------------------- Retry failed sends --------------------
+    if data.startswith("job:retry:"):
+        job_id = data.split(":")[2]
+        job = await adb.get_job(user_id, job_id)
+        if not job:
+            return await query.answer("Job not found", show_alert=True)
+
+        queued = await adb.retry_failed_sends(user_id, job_id)
+        if not queued:
+            return await query.answer("Nothing to retry", show_alert=True)
+
+        # A (re)started run resends the queued ids before anything else
+        if job.get("status") != JobStatus.RUNNING.value:
+            await adb.set_job_status(user_id, job_id, JobStatus.RUNNING.value)
+        job_scheduler.wake()
+        await query.answer(f"🔁 {queued} failed send(s) queued", show_alert=True)
+
+        job = await adb.get_job(user_id, job_id)
+        await query.message.edit_text(
+            "**📋 Retrying failed sends**",
+            reply_markup=job_detail_keyboard(job)
+        )
+        return
+
     # -------------------- START JOB (with Permission Check) --------------------
     if data.startswith("job:start:"):
         job_id = data.split(":")[2]
-        job = get_job(user_id, job_id)
+        job = await adb.get_job(user_id, job_id)
         if not job:
             return await query.answer("Job not found", show_alert=True)
 
@@ -120,7 +181,7 @@ async def jobs_callbacks(client: Client, query: CallbackQuery):
         try:
             # Create temporary client for permission check
             if method == "bot":
-                bot = get_bot(user_id, job.get("bot_id"))
+                bot = await adb.get_bot(user_id, job.get("bot_id"))
                 if not bot or bot.get("status") != "active":
                     return await query.answer("Bot not available", show_alert=True)
 
@@ -135,7 +196,7 @@ async def jobs_callbacks(client: Client, query: CallbackQuery):
                 await check_client.start()
 
             elif method == "user":
-                account = get_next_available_account(user_id, job.get("account_ids", []))
+                account = await adb.get_next_available_account(user_id, job.get("account_ids", []))
                 if not account:
                     return await query.answer("No available account", show_alert=True)
 
@@ -187,10 +248,11 @@ async def jobs_callbacks(client: Client, query: CallbackQuery):
             return
 
         # All good → Start Job
-        set_job_status(user_id, job_id, JobStatus.RUNNING.value)
+        await adb.set_job_status(user_id, job_id, JobStatus.RUNNING.value)
+        job_scheduler.wake()
         await query.answer("✅ Job started (Permissions OK)", show_alert=True)
 
-        job = get_job(user_id, job_id)
+        job = await adb.get_job(user_id, job_id)
         await query.message.edit_text(
             f"**📋 Job started**\n\n"
             f"Status: `running`\n"
@@ -202,9 +264,10 @@ async def jobs_callbacks(client: Client, query: CallbackQuery):
     # -------------------- Pause --------------------
     if data.startswith("job:pause:"):
         job_id = data.split(":")[2]
-        set_job_status(user_id, job_id, JobStatus.PAUSED.value)
+        await adb.set_job_status(user_id, job_id, JobStatus.PAUSED.value)
+        job_controls.signal(job_id, JobStatus.PAUSED.value)
         await query.answer("Job paused", show_alert=True)
-        job = get_job(user_id, job_id)
+        job = await adb.get_job(user_id, job_id)
         await query.message.edit_text(
             "**📋 Job paused**",
             reply_markup=job_detail_keyboard(job)
@@ -214,9 +277,10 @@ async def jobs_callbacks(client: Client, query: CallbackQuery):
     # -------------------- Cancel --------------------
     if data.startswith("job:cancel:"):
         job_id = data.split(":")[2]
-        set_job_status(user_id, job_id, JobStatus.CANCELLED.value)
+        await adb.set_job_status(user_id, job_id, JobStatus.CANCELLED.value)
+        job_controls.signal(job_id, JobStatus.CANCELLED.value)
         await query.answer("Job cancelled", show_alert=True)
-        job = get_job(user_id, job_id)
+        job = await adb.get_job(user_id, job_id)
         await query.message.edit_text(
             "**📋 Job cancelled**",
             reply_markup=job_detail_keyboard(job)
@@ -226,7 +290,7 @@ async def jobs_callbacks(client: Client, query: CallbackQuery):
     # -------------------- Delete --------------------
     if data.startswith("job:delete:"):
         job_id = data.split(":")[2]
-        job = get_job(user_id, job_id)
+        job = await adb.get_job(user_id, job_id)
         if not job:
             return await query.answer("Job not found", show_alert=True)
 
@@ -240,7 +304,8 @@ async def jobs_callbacks(client: Client, query: CallbackQuery):
 
     if data.startswith("job:confirm_delete:"):
         job_id = data.split(":")[2]
-        success = delete_job(user_id, job_id)
+        success = await adb.delete_job(user_id, job_id)
+        job_controls.signal(job_id, "deleted")
         if success:
             await query.answer("✅ Job deleted", show_alert=True)
             await show_jobs_list(client, query)
@@ -272,7 +337,7 @@ async def job_create_callbacks(client: Client, query: CallbackQuery):
             selected.remove(chat_id)
         else:
             selected.append(chat_id)
-        targets = get_user_targets(user_id)
+        targets = await adb.get_user_targets(user_id)
         await query.message.edit_reply_markup(select_targets_keyboard(targets, selected))
         return await query.answer()
 
@@ -292,7 +357,7 @@ async def job_create_callbacks(client: Client, query: CallbackQuery):
         method = parts[2]  # "user" or "bot"
         state["method"] = method
         if method == "user":
-            accounts = get_user_accounts(user_id)
+            accounts = await adb.get_user_accounts(user_id)
             if not accounts:
                 return await query.answer(
                     "No accounts added yet. Add one first (👤 Accounts).", show_alert=True
@@ -304,14 +369,17 @@ async def job_create_callbacks(client: Client, query: CallbackQuery):
                 reply_markup=select_accounts_keyboard(accounts, [])
             )
         else:
-            bots = get_user_bots(user_id)
+            bots = await adb.get_user_bots(user_id)
             if not bots:
                 return await query.answer(
                     "No forward bots added yet. Add one first (🤖 Bots).", show_alert=True
                 )
             state["step"] = "bot"
+            state["selected_bots"] = []
             await query.message.edit_text(
-                "**📋 Create Job – Step 4**\n\nSelect the forward bot to use:",
+                "**📋 Create Job – Step 4**\n\n"
+                "Select the forward bot(s) to use. With several bots, sends are "
+                "spread over the pool:",
                 reply_markup=select_bot_keyboard(bots)
             )
         return await query.answer()
@@ -324,8 +392,19 @@ async def job_create_callbacks(client: Client, query: CallbackQuery):
             selected.remove(acc_id)
         else:
             selected.append(acc_id)
-        accounts = get_user_accounts(user_id)
-        await query.message.edit_reply_markup(select_accounts_keyboard(accounts, selected))
+        accounts = await adb.get_user_accounts(user_id)
+        await query.message.edit_reply_markup(
+            select_accounts_keyboard(accounts, selected, state.get("parallel", False))
+        )
+        return await query.answer()
+
+    # ---- parallel mode: all selected accounts send at once ----
+    if action == "toggle_parallel":
+        state["parallel"] = not state.get("parallel", False)
+        accounts = await adb.get_user_accounts(user_id)
+        await query.message.edit_reply_markup(
+            select_accounts_keyboard(accounts, state.get("selected_accounts", []), state["parallel"])
+        )
         return await query.answer()
 
     # ---- accounts confirmed -> ask message range ----
@@ -341,9 +420,36 @@ async def job_create_callbacks(client: Client, query: CallbackQuery):
         )
         return await query.answer()
 
-    # ---- bot selected -> ask message range ----
-    if action == "select_bot":
-        state["bot_id"] = parts[2]
+    # ---- toggle a bot of the pool on/off ----
+    if action == "toggle_bot":
+        bot_id = parts[2]
+        selected = state.setdefault("selected_bots", [])
+        if bot_id in selected:
+            selected.remove(bot_id)
+        else:
+            selected.append(bot_id)
+        bots = await adb.get_user_bots(user_id)
+        await query.message.edit_reply_markup(
+            select_bot_keyboard(bots, selected, state.get("round_robin", False))
+        )
+        return await query.answer()
+
+    # ---- pool: round-robin or by available capacity ----
+    if action == "toggle_pool":
+        state["round_robin"] = not state.get("round_robin", False)
+        bots = await adb.get_user_bots(user_id)
+        await query.message.edit_reply_markup(
+            select_bot_keyboard(bots, state.get("selected_bots", []), state["round_robin"])
+        )
+        return await query.answer()
+
+    # ---- bot(s) selected -> ask message range ----
+    if action in ("select_bot", "next_bot_options"):
+        if action == "select_bot":
+            state["selected_bots"] = [parts[2]]
+        if not state.get("selected_bots"):
+            return await query.answer("Select at least one bot.", show_alert=True)
+        state["bot_id"] = state["selected_bots"][0]
         state["step"] = "final_options"
         await query.message.edit_text(
             "**📋 Create Job – Final Step**\n\n"
@@ -354,7 +460,6 @@ async def job_create_callbacks(client: Client, query: CallbackQuery):
         return await query.answer()
 
 
-from database import get_user_targets, get_user_accounts, get_user_bots
 from handlers.keyboards import (
     select_targets_keyboard, select_method_keyboard,
     select_accounts_keyboard, select_bot_keyboard
@@ -384,7 +489,7 @@ async def job_create_callbacks(client: Client, query: CallbackQuery):
             selected.remove(chat_id)
         else:
             selected.append(chat_id)
-        targets = get_user_targets(user_id)
+        targets = await adb.get_user_targets(user_id)
         await query.message.edit_reply_markup(select_targets_keyboard(targets, selected))
         return await query.answer()
 
@@ -404,7 +509,7 @@ async def job_create_callbacks(client: Client, query: CallbackQuery):
         method = parts[2]  # "user" or "bot"
         state["method"] = method
         if method == "user":
-            accounts = get_user_accounts(user_id)
+            accounts = await adb.get_user_accounts(user_id)
             if not accounts:
                 return await query.answer(
                     "No accounts added yet. Add one first (👤 Accounts).", show_alert=True
@@ -416,14 +521,17 @@ async def job_create_callbacks(client: Client, query: CallbackQuery):
                 reply_markup=select_accounts_keyboard(accounts, [])
             )
         else:
-            bots = get_user_bots(user_id)
+            bots = await adb.get_user_bots(user_id)
             if not bots:
                 return await query.answer(
                     "No forward bots added yet. Add one first (🤖 Bots).", show_alert=True
                 )
             state["step"] = "bot"
+            state["selected_bots"] = []
             await query.message.edit_text(
-                "**📋 Create Job – Step 4**\n\nSelect the forward bot to use:",
+                "**📋 Create Job – Step 4**\n\n"
+                "Select the forward bot(s) to use. With several bots, sends are "
+                "spread over the pool:",
                 reply_markup=select_bot_keyboard(bots)
             )
         return await query.answer()
@@ -436,8 +544,19 @@ async def job_create_callbacks(client: Client, query: CallbackQuery):
             selected.remove(acc_id)
         else:
             selected.append(acc_id)
-        accounts = get_user_accounts(user_id)
-        await query.message.edit_reply_markup(select_accounts_keyboard(accounts, selected))
+        accounts = await adb.get_user_accounts(user_id)
+        await query.message.edit_reply_markup(
+            select_accounts_keyboard(accounts, selected, state.get("parallel", False))
+        )
+        return await query.answer()
+
+    # ---- parallel mode: all selected accounts send at once ----
+    if action == "toggle_parallel":
+        state["parallel"] = not state.get("parallel", False)
+        accounts = await adb.get_user_accounts(user_id)
+        await query.message.edit_reply_markup(
+            select_accounts_keyboard(accounts, state.get("selected_accounts", []), state["parallel"])
+        )
         return await query.answer()
 
     # ---- accounts confirmed -> ask message range ----
@@ -453,9 +572,36 @@ async def job_create_callbacks(client: Client, query: CallbackQuery):
         )
         return await query.answer()
 
-    # ---- bot selected -> ask message range ----
-    if action == "select_bot":
-        state["bot_id"] = parts[2]
+    # ---- toggle a bot of the pool on/off ----
+    if action == "toggle_bot":
+        bot_id = parts[2]
+        selected = state.setdefault("selected_bots", [])
+        if bot_id in selected:
+            selected.remove(bot_id)
+        else:
+            selected.append(bot_id)
+        bots = await adb.get_user_bots(user_id)
+        await query.message.edit_reply_markup(
+            select_bot_keyboard(bots, selected, state.get("round_robin", False))
+        )
+        return await query.answer()
+
+    # ---- pool: round-robin or by available capacity ----
+    if action == "toggle_pool":
+        state["round_robin"] = not state.get("round_robin", False)
+        bots = await adb.get_user_bots(user_id)
+        await query.message.edit_reply_markup(
+            select_bot_keyboard(bots, state.get("selected_bots", []), state["round_robin"])
+        )
+        return await query.answer()
+
+    # ---- bot(s) selected -> ask message range ----
+    if action in ("select_bot", "next_bot_options"):
+        if action == "select_bot":
+            state["selected_bots"] = [parts[2]]
+        if not state.get("selected_bots"):
+            return await query.answer("Select at least one bot.", show_alert=True)
+        state["bot_id"] = state["selected_bots"][0]
         state["step"] = "final_options"
         await query.message.edit_text(
             "**📋 Create Job – Final Step**\n\n"
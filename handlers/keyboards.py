@@ -106,14 +106,31 @@ def target_settings_keyboard(target: Dict[str, Any]) -> InlineKeyboardMarkup:
             f"↪️ Forward Tag  {on_off('forward_tag')}",
             callback_data=f"st:toggle:{chat_id}:forward_tag"
         )],
+        [InlineKeyboardButton(
+            f"📦 Batch Forward  {on_off('batch_forward', True)}",
+            callback_data=f"st:toggle:{chat_id}:batch_forward"
+        )],
         [InlineKeyboardButton(
             f"⏱ Delay  [{s.get('delay', 1.0)}s]",
             callback_data=f"st:menu:{chat_id}:delay"
         )],
+        [InlineKeyboardButton(
+            f"🚦 Send Window  [{s.get('send_window', 1)}]",
+            callback_data=f"st:menu:{chat_id}:send_window"
+        )],
         [InlineKeyboardButton(
             f"🛡 Anti-Duplicate  {on_off('anti_duplicate', True)}",
             callback_data=f"st:toggle:{chat_id}:anti_duplicate"
         )],
+        [InlineKeyboardButton(
+            f"🗂 Dup Retention  [{s.get('dup_ttl_days', 0) or '∞'}d / "
+            f"{s.get('dup_max_entries', 0) or '∞'}]",
+            callback_data=f"st:menu:{chat_id}:dup_retention"
+        )],
+        [InlineKeyboardButton(
+            f"💽 Local Dup Index  {on_off('dup_local_index')}",
+            callback_data=f"st:toggle:{chat_id}:dup_local_index"
+        )],
         [InlineKeyboardButton(
             f"🆕 Future New Posts  {on_off('future_new_posts')}",
             callback_data=f"st:toggle:{chat_id}:future_new_posts"
@@ -356,7 +373,7 @@ def jobs_list_keyboard(jobs: List[Dict]) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
-def job_detail_keyboard(job: Dict[str, Any]) -> InlineKeyboardMarkup:
+def job_detail_keyboard(job: Dict[str, Any], failed: int = 0) -> InlineKeyboardMarkup:
     job_id = job["job_id"]
     status = job.get("status", "pending")
 
@@ -372,6 +389,10 @@ def job_detail_keyboard(job: Dict[str, Any]) -> InlineKeyboardMarkup:
             InlineKeyboardButton("🛑 Cancel", callback_data=f"job:cancel:{job_id}")
         ])
 
+    if failed:
+        buttons.append([
+            InlineKeyboardButton(f"🔁 Retry Failed ({failed})", callback_data=f"job:retry:{job_id}")
+        ])
     buttons.append([
         InlineKeyboardButton("📊 Detailed Stats", callback_data=f"job:stats:{job_id}")
     ])
@@ -425,7 +446,11 @@ def select_method_keyboard() -> InlineKeyboardMarkup:
     ])
 
 
-def select_accounts_keyboard(accounts: List[Dict], selected: List[str]) -> InlineKeyboardMarkup:
+def select_accounts_keyboard(
+    accounts: List[Dict],
+    selected: List[str],
+    parallel: bool = False
+) -> InlineKeyboardMarkup:
     buttons = []
     for acc in accounts:
         name = (acc.get("name") or acc.get("phone") or "Account")[:25]
@@ -438,6 +463,12 @@ def select_accounts_keyboard(accounts: List[Dict], selected: List[str]) -> Inlin
             )
         ])
 
+    buttons.append([
+        InlineKeyboardButton(
+            f"⚡ Parallel: {'ON' if parallel else 'OFF'}",
+            callback_data="jobcreate:toggle_parallel"
+        )
+    ])
     buttons.append([
         InlineKeyboardButton("➡️ Continue", callback_data="jobcreate:next_options")
     ])
@@ -447,17 +478,33 @@ def select_accounts_keyboard(accounts: List[Dict], selected: List[str]) -> Inlin
     return InlineKeyboardMarkup(buttons)
 
 
-def select_bot_keyboard(bots: List[Dict]) -> InlineKeyboardMarkup:
+def select_bot_keyboard(
+    bots: List[Dict],
+    selected: Optional[List[str]] = None,
+    round_robin: bool = False
+) -> InlineKeyboardMarkup:
+    selected = selected or []
     buttons = []
     for b in bots:
         name = (b.get("name") or b.get("bot_username") or "Bot")[:25]
+        mark = "✅" if b["bot_id"] in selected else "🤖"
         buttons.append([
             InlineKeyboardButton(
-                f"🤖 {name}",
-                callback_data=f"jobcreate:select_bot:{b['bot_id']}"
+                f"{mark} {name}",
+                callback_data=f"jobcreate:toggle_bot:{b['bot_id']}"
             )
         ])
 
+    if len(selected) > 1:
+        buttons.append([
+            InlineKeyboardButton(
+                f"🔁 Pool: {'Round-robin' if round_robin else 'By capacity'}",
+                callback_data="jobcreate:toggle_pool"
+            )
+        ])
+    buttons.append([
+        InlineKeyboardButton("➡️ Continue", callback_data="jobcreate:next_bot_options")
+    ])
     buttons.append([
         InlineKeyboardButton("❌ Cancel", callback_data="job:list")
     ])
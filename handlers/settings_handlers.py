@@ -3,12 +3,12 @@ from pyrogram import Client, filters
 from pyrogram.types import CallbackQuery
 from pyrogram.enums import ParseMode
 
-from database import (
-    is_admin, get_target, update_target_settings, get_setting
-)
+from config import Config
+from database import adb, is_admin, get_setting
 from handlers.keyboards import (
     target_settings_keyboard, media_types_keyboard, simple_back_keyboard
 )
+from core.anti_duplicate import get_duplicate_count
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,16 +28,16 @@ async def settings_callbacks(client: Client, query: CallbackQuery):
         chat_id = int(parts[2])
         key = parts[3]
 
-        target = get_target(user_id, chat_id)
+        target = await adb.get_target(user_id, chat_id)
         if not target:
             return await query.answer("Target not found", show_alert=True)
 
         current = get_setting(target, key, False)
         new_value = not current
 
-        update_target_settings(user_id, chat_id, {key: new_value})
+        await adb.update_target_settings(user_id, chat_id, {key: new_value})
 
-        target = get_target(user_id, chat_id)
+        target = await adb.get_target(user_id, chat_id)
         title = target.get("title", "Unknown")
 
         text = (
@@ -55,7 +55,7 @@ async def settings_callbacks(client: Client, query: CallbackQuery):
         chat_id = int(parts[2])
         feature = parts[3]
 
-        target = get_target(user_id, chat_id)
+        target = await adb.get_target(user_id, chat_id)
         if not target:
             return await query.answer("Target not found", show_alert=True)
 
@@ -83,6 +83,37 @@ async def settings_callbacks(client: Client, query: CallbackQuery):
             client.settings_state[user_id] = {"action": "set_delay", "chat_id": chat_id}
             return await query.answer()
 
+        if feature == "send_window":
+            text = (
+                f"**🚦 Send Window**\n\n"
+                f"Sends in flight at once: **{s.get('send_window', 1)}**\n\n"
+                f"`1` sends one message at a time, in source order. Higher "
+                f"values overlap the sends; messages sent together may arrive "
+                f"slightly out of order.\n\n"
+                f"Send a number from 1 to {Config.MAX_SEND_WINDOW}.\n\n"
+                f"Type /cancel to go back."
+            )
+            await query.message.edit_text(text, reply_markup=simple_back_keyboard(chat_id))
+            client.settings_state = getattr(client, "settings_state", {})
+            client.settings_state[user_id] = {"action": "set_send_window", "chat_id": chat_id}
+            return await query.answer()
+
+        if feature == "dup_retention":
+            stored = await get_duplicate_count(user_id, chat_id)
+            text = (
+                f"**🗂 Duplicate Retention**\n\n"
+                f"Stored records: **{stored}**\n"
+                f"Keep records: **{s.get('dup_ttl_days', 0) or 'forever'}** days\n"
+                f"Max records: **{s.get('dup_max_entries', 0) or 'unlimited'}**\n\n"
+                f"Send `DAYS MAX` (example: `90 200000`). Use `0` for no limit.\n"
+                f"Days apply to newly recorded files.\n\n"
+                f"Type /cancel to go back."
+            )
+            await query.message.edit_text(text, reply_markup=simple_back_keyboard(chat_id))
+            client.settings_state = getattr(client, "settings_state", {})
+            client.settings_state[user_id] = {"action": "set_dup_retention", "chat_id": chat_id}
+            return await query.answer()
+
         if feature == "caption_template":
             current = s.get("caption_template", "<b>{caption}</b>")
             text = (
@@ -133,7 +164,13 @@ async def settings_callbacks(client: Client, query: CallbackQuery):
         if feature == "replacements":
             reps = s.get("replacements", [])
             if reps:
-                lines = [f"`{r['from']}` → `{r['to']}`" for r in reps]
+                lines = []
+                for r in reps:
+                    flags = "".join(
+                        f for f, key in (("r", "regex"), ("i", "ignore_case"), ("w", "whole_word"))
+                        if r.get(key)
+                    )
+                    lines.append(f"`{r['from']}` → `{r['to']}`" + (f"  [{flags}]" if flags else ""))
                 reps_text = "\n".join(lines)
             else:
                 reps_text = "No replacements set."
@@ -147,6 +184,10 @@ async def settings_callbacks(client: Client, query: CallbackQuery):
                 f"Example:\n"
                 f"`@OldChannel => @MyChannel`\n"
                 f"`cam => `   (to remove word)\n\n"
+                f"Optional flags before the text:\n"
+                f"`r|` regex, `i|` ignore case, `w|` whole word\n"
+                f"`iw|cam => cat` or `r|(\\d+)\\$ => USD \\1`\n"
+                f"All rules apply in one pass; the longest match wins.\n\n"
                 f"Send `clear` to remove all.\n"
                 f"Type /cancel to go back."
             )
@@ -183,7 +224,7 @@ async def settings_callbacks(client: Client, query: CallbackQuery):
         chat_id = int(parts[2])
         media_key = parts[3]
 
-        target = get_target(user_id, chat_id)
+        target = await adb.get_target(user_id, chat_id)
         if not target:
             return await query.answer("Target not found", show_alert=True)
 
@@ -193,9 +234,9 @@ async def settings_callbacks(client: Client, query: CallbackQuery):
         else:
             current_list.append(media_key)
 
-        update_target_settings(user_id, chat_id, {"media_types": current_list})
+        await adb.update_target_settings(user_id, chat_id, {"media_types": current_list})
 
-        target = get_target(user_id, chat_id)
+        target = await adb.get_target(user_id, chat_id)
         text = (
             f"**🎞 Media Types Filter**\n\n"
             f"Select which media types should be forwarded."
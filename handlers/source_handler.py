@@ -7,10 +7,7 @@ from pyrogram import Client, filters
 from pyrogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from pyrogram.enums import ChatType
 
-from database import (
-    is_admin, ensure_user, get_user_targets, get_target,
-    get_user_accounts, get_user_bots, create_job
-)
+from database import adb, is_admin
 from handlers.keyboards import targets_list_keyboard
 
 logger = logging.getLogger(__name__)
@@ -65,7 +62,7 @@ async def source_detector(client: Client, message: Message):
     client.job_create_state = getattr(client, "job_create_state", {})
     client.job_create_state[user_id] = None
 
-    ensure_user(user_id)
+    await adb.ensure_user(user_id)
 
     source_chat_id = None
     last_msg_id = None
@@ -107,7 +104,7 @@ async def source_detector(client: Client, message: Message):
     if source_chat.type not in [ChatType.CHANNEL, ChatType.GROUP, ChatType.SUPERGROUP]:
         return await message.reply("❌ Source must be a Channel or Group.")
 
-    targets = get_user_targets(user_id)
+    targets = await adb.get_user_targets(user_id)
     if not targets:
         return await message.reply(
             "❌ You have no targets set.\n"
@@ -166,7 +163,7 @@ async def source_options_callback(client: Client, query: CallbackQuery):
             "selected_targets": []
         }
 
-        targets = get_user_targets(user_id)
+        targets = await adb.get_user_targets(user_id)
 
         from handlers.keyboards import select_targets_keyboard
 
@@ -187,7 +184,7 @@ async def source_options_callback(client: Client, query: CallbackQuery):
         except Exception:
             return await query.answer("Invalid data", show_alert=True)
 
-        targets = get_user_targets(user_id)
+        targets = await adb.get_user_targets(user_id)
 
         buttons = []
         for t in targets:
@@ -249,7 +246,7 @@ async def forward_callbacks(client: Client, query: CallbackQuery):
         except Exception:
             return await query.answer("Invalid data", show_alert=True)
 
-        target = get_target(user_id, target_chat_id)
+        target = await adb.get_target(user_id, target_chat_id)
         if not target:
             return await query.answer("Target not found", show_alert=True)
 
@@ -3,14 +3,13 @@ from pyrogram import Client, filters
 from pyrogram.types import Message, CallbackQuery
 from pyrogram.enums import ChatType
 
-from database import (
-    ensure_user, is_admin, add_target, get_user_targets,
-    get_target, delete_target
-)
+from database import adb, is_admin
 from handlers.keyboards import (
     targets_list_keyboard, target_settings_keyboard,
     confirm_delete_keyboard
 )
+from core.dup_cache import dup_cache
+from core.dup_store import local_dup_store
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,7 +18,7 @@ logger = logging.getLogger(__name__)
 async def cmd_targets_internal(client: Client, query: CallbackQuery):
     """Called from Dashboard"""
     user_id = query.from_user.id
-    targets = get_user_targets(user_id)
+    targets = await adb.get_user_targets(user_id)
 
     if not targets:
         text = (
@@ -39,8 +38,8 @@ async def cmd_targets(client: Client, message: Message):
     if not is_admin(message.from_user.id):
         return await message.reply("❌ You are not allowed to use this bot.")
 
-    ensure_user(message.from_user.id)
-    targets = get_user_targets(message.from_user.id)
+    await adb.ensure_user(message.from_user.id)
+    targets = await adb.get_user_targets(message.from_user.id)
 
     if not targets:
         text = (
@@ -61,10 +60,10 @@ async def target_callbacks(client: Client, query: CallbackQuery):
         return await query.answer("Not allowed", show_alert=True)
 
     data = query.data
-    ensure_user(user_id)
+    await adb.ensure_user(user_id)
 
     if data == "tg:list":
-        targets = get_user_targets(user_id)
+        targets = await adb.get_user_targets(user_id)
         text = f"**🎯 Your Targets** ({len(targets)})\n\nSelect a target to manage settings:"
         if not targets:
             text = "**🎯 Your Targets**\n\nNo targets found. Click Add Target."
@@ -84,7 +83,7 @@ async def target_callbacks(client: Client, query: CallbackQuery):
 
     if data.startswith("tg:open:"):
         chat_id = int(data.split(":")[2])
-        target = get_target(user_id, chat_id)
+        target = await adb.get_target(user_id, chat_id)
         if not target:
             return await query.answer("Target not found", show_alert=True)
 
@@ -100,7 +99,7 @@ async def target_callbacks(client: Client, query: CallbackQuery):
 
     if data.startswith("tg:delete:"):
         chat_id = int(data.split(":")[2])
-        target = get_target(user_id, chat_id)
+        target = await adb.get_target(user_id, chat_id)
         if not target:
             return await query.answer("Target not found", show_alert=True)
 
@@ -115,10 +114,12 @@ async def target_callbacks(client: Client, query: CallbackQuery):
 
     if data.startswith("tg:confirm_delete:"):
         chat_id = int(data.split(":")[2])
-        success = delete_target(user_id, chat_id)
+        success = await adb.delete_target(user_id, chat_id)
         if success:
+            dup_cache.drop(user_id, chat_id)
+            local_dup_store.delete(user_id, chat_id)
             await query.answer("✅ Target deleted", show_alert=True)
-            targets = get_user_targets(user_id)
+            targets = await adb.get_user_targets(user_id)
             text = f"**🎯 Your Targets** ({len(targets)})"
             await query.message.edit_text(text, reply_markup=targets_list_keyboard(targets))
         else:
@@ -10,11 +10,7 @@ import logging
 import re
 
 from config import Config
-from database import (
-    is_admin, update_target_settings, get_target, get_user_targets,
-    add_target, add_forward_bot, add_forward_account, update_account,
-    create_job, get_user_accounts, get_user_bots, get_user_jobs
-)
+from database import adb, is_admin, AccountStrategy, PoolStrategy
 from handlers.keyboards import (
     target_settings_keyboard, targets_list_keyboard,
     accounts_list_keyboard, bots_list_keyboard, jobs_list_keyboard
@@ -125,7 +121,7 @@ async def handle_all_text_input(client: Client, message: Message):
                 await temp_client.disconnect()
 
                 # Save to database
-                result = add_forward_account(
+                result = await adb.add_forward_account(
                     user_id=user_id,
                     phone=phone,
                     session_string=session_string,
@@ -144,7 +140,7 @@ async def handle_all_text_input(client: Client, message: Message):
                     f"You can now use this account for forwarding jobs."
                 )
 
-                accounts = get_user_accounts(user_id)
+                accounts = await adb.get_user_accounts(user_id)
                 await message.reply(
                     f"**👤 My Accounts** ({len(accounts)})",
                     reply_markup=accounts_list_keyboard(accounts)
@@ -192,7 +188,7 @@ async def handle_all_text_input(client: Client, message: Message):
                 session_string = await temp_client.export_session_string()
                 await temp_client.disconnect()
 
-                result = add_forward_account(
+                result = await adb.add_forward_account(
                     user_id=user_id,
                     phone=phone,
                     session_string=session_string,
@@ -210,7 +206,7 @@ async def handle_all_text_input(client: Client, message: Message):
                     f"**Account ID:** `{result['account_id']}`"
                 )
 
-                accounts = get_user_accounts(user_id)
+                accounts = await adb.get_user_accounts(user_id)
                 await message.reply(
                     f"**👤 My Accounts** ({len(accounts)})",
                     reply_markup=accounts_list_keyboard(accounts)
@@ -233,17 +229,16 @@ async def handle_all_text_input(client: Client, message: Message):
         except ValueError:
             return await message.reply("❌ Please send a number. Example: `0` or `100`")
 
-        from core.forwarder import forward_messages
+        from core.forwarder import forward_to_targets
         from handlers.source_handler import FORWARDING, CANCEL_FLAGS
-        from database import get_target, get_user_targets
 
         source_chat_id = fwd_state["source_chat_id"]
         last_msg_id = fwd_state["last_msg_id"]
 
         if fwd_state["action"] == "waiting_skip":
-            targets = [get_target(user_id, fwd_state["target_chat_id"])]
+            targets = [await adb.get_target(user_id, fwd_state["target_chat_id"])]
         else:
-            targets = get_user_targets(user_id)
+            targets = await adb.get_user_targets(user_id)
         targets = [t for t in targets if t]
 
         client.forward_state[user_id] = None
@@ -255,13 +250,12 @@ async def handle_all_text_input(client: Client, message: Message):
         progress = await message.reply("**🚀 Starting forward...**")
 
         try:
-            for target in targets:
-                await forward_messages(
-                    client=client, user_id=user_id,
-                    source_chat_id=source_chat_id, target=target,
-                    last_msg_id=last_msg_id, skip=skip,
-                    progress_message=progress, cancel_flag=CANCEL_FLAGS,
-                )
+            await forward_to_targets(
+                client=client, user_id=user_id,
+                source_chat_id=source_chat_id, targets=targets,
+                last_msg_id=last_msg_id, skip=skip,
+                progress_message=progress, cancel_flag=CANCEL_FLAGS,
+            )
             await progress.edit_text("**✅ Forwarding finished.**")
         except Exception as e:
             logger.exception("Quick forward failed")
@@ -284,11 +278,12 @@ async def handle_all_text_input(client: Client, message: Message):
             if chat.type not in [ChatType.CHANNEL, ChatType.SUPERGROUP, ChatType.GROUP]:
                 return await message.reply("❌ Only Channels and Groups are supported.")
 
-            result = add_target(
+            result = await adb.add_target(
                 user_id=user_id,
                 chat_id=chat.id,
                 title=chat.title or "Unknown",
-                username=getattr(chat, "username", None)
+                username=getattr(chat, "username", None),
+                chat_type=chat.type.value
             )
 
             client.target_add_state[user_id] = False
@@ -302,7 +297,7 @@ async def handle_all_text_input(client: Client, message: Message):
                 f"**ID:** `{chat.id}`"
             )
 
-            targets = get_user_targets(user_id)
+            targets = await adb.get_user_targets(user_id)
             await message.reply(
                 f"**🎯 Your Targets** ({len(targets)})",
                 reply_markup=targets_list_keyboard(targets)
@@ -355,7 +350,7 @@ async def handle_all_text_input(client: Client, message: Message):
             bot_name = me.first_name or f"Bot {token[:8]}"
 
             # Save to database
-            result = add_forward_bot(
+            result = await adb.add_forward_bot(
                 user_id=user_id,
                 bot_token=token,
                 bot_username=bot_username,
@@ -375,7 +370,7 @@ async def handle_all_text_input(client: Client, message: Message):
                 f"Ab aap is bot ko Jobs mein use kar sakte ho."
             )
 
-            bots = get_user_bots(user_id)
+            bots = await adb.get_user_bots(user_id)
             await message.reply(
                 f"**🤖 Forward Bots** ({len(bots)})",
                 reply_markup=bots_list_keyboard(bots)
@@ -416,20 +411,19 @@ async def handle_all_text_input(client: Client, message: Message):
                 limit = int(text)
                 if limit < 1:
                     return await message.reply("Limit must be at least 1.")
-                update_account(user_id, account_id, {"forward_limit": limit})
+                await adb.update_account(user_id, account_id, {"forward_limit": limit})
                 await message.reply(f"✅ Forward limit set to **{limit}**")
 
             elif action == "set_sleep":
                 minutes = int(text)
                 if minutes < 1:
                     return await message.reply("Sleep time must be at least 1 minute.")
-                update_account(user_id, account_id, {"sleep_after_limit_minutes": minutes})
+                await adb.update_account(user_id, account_id, {"sleep_after_limit_minutes": minutes})
                 await message.reply(f"✅ Sleep after limit set to **{minutes} minutes**")
 
             client.account_edit_state[user_id] = None
 
-            from handlers.accounts_handlers import get_account
-            account = get_account(user_id, account_id)
+            account = await adb.get_account(user_id, account_id)
             if account:
                 from handlers.keyboards import account_settings_keyboard
                 await message.reply(
@@ -455,11 +449,35 @@ async def handle_all_text_input(client: Client, message: Message):
                 delay = float(text)
                 if delay < 0:
                     return await message.reply("Delay cannot be negative.")
-                update_target_settings(user_id, chat_id, {"delay": delay})
+                await adb.update_target_settings(user_id, chat_id, {"delay": delay})
                 await message.reply(f"✅ Delay set to **{delay}s**")
 
+            elif action == "set_send_window":
+                window = int(text)
+                if not 1 <= window <= Config.MAX_SEND_WINDOW:
+                    return await message.reply(
+                        f"Send window must be between 1 and {Config.MAX_SEND_WINDOW}."
+                    )
+                await adb.update_target_settings(user_id, chat_id, {"send_window": window})
+                await message.reply(f"✅ Send window set to **{window}**")
+
+            elif action == "set_dup_retention":
+                parts = text.split()
+                days = int(parts[0])
+                max_entries = int(parts[1]) if len(parts) > 1 else 0
+                if days < 0 or max_entries < 0:
+                    return await message.reply("Values cannot be negative.")
+                await adb.update_target_settings(
+                    user_id, chat_id,
+                    {"dup_ttl_days": days, "dup_max_entries": max_entries}
+                )
+                await message.reply(
+                    f"✅ Duplicate retention: **{days or 'forever'}** days, "
+                    f"max **{max_entries or 'unlimited'}** records"
+                )
+
             elif action == "set_caption_template":
-                update_target_settings(user_id, chat_id, {"caption_template": text})
+                await adb.update_target_settings(user_id, chat_id, {"caption_template": text})
                 await message.reply("✅ Caption template updated.")
 
             elif action == "set_block_words":
@@ -467,7 +485,7 @@ async def handle_all_text_input(client: Client, message: Message):
                     words = []
                 else:
                     words = [w.strip() for w in text.split(",") if w.strip()]
-                update_target_settings(user_id, chat_id, {"block_words": words})
+                await adb.update_target_settings(user_id, chat_id, {"block_words": words})
                 await message.reply(f"✅ Block words updated ({len(words)} words)")
 
             elif action == "set_whitelist":
@@ -475,7 +493,7 @@ async def handle_all_text_input(client: Client, message: Message):
                     words = []
                 else:
                     words = [w.strip() for w in text.split(",") if w.strip()]
-                update_target_settings(user_id, chat_id, {"whitelist": words})
+                await adb.update_target_settings(user_id, chat_id, {"whitelist": words})
                 await message.reply(f"✅ Whitelist updated ({len(words)} words)")
 
             elif action == "set_replacements":
@@ -486,8 +504,23 @@ async def handle_all_text_input(client: Client, message: Message):
                     for line in text.splitlines():
                         if "=>" in line:
                             left, right = line.split("=>", 1)
-                            reps.append({"from": left.strip(), "to": right.strip()})
-                update_target_settings(user_id, chat_id, {"replacements": reps})
+                            rule = {"from": left.strip(), "to": right.strip()}
+                            # optional flags: `riw| old => new`
+                            flags = re.match(r"([riw]{1,3})\|", rule["from"])
+                            if flags:
+                                rule["from"] = rule["from"][flags.end():].strip()
+                                rule["regex"] = "r" in flags.group(1)
+                                rule["ignore_case"] = "i" in flags.group(1)
+                                rule["whole_word"] = "w" in flags.group(1)
+                            if rule.get("regex"):
+                                try:
+                                    re.compile(rule["from"])
+                                except re.error as e:
+                                    return await message.reply(
+                                        f"❌ Invalid regex `{rule['from']}`: {e}"
+                                    )
+                            reps.append(rule)
+                await adb.update_target_settings(user_id, chat_id, {"replacements": reps})
                 await message.reply(f"✅ Replacements updated ({len(reps)} rules)")
 
             elif action == "set_inline_buttons":
@@ -504,11 +537,11 @@ async def handle_all_text_input(client: Client, message: Message):
                                 row.append({"text": btn_text.strip(), "url": btn_url.strip()})
                         if row:
                             buttons.append(row)
-                update_target_settings(user_id, chat_id, {"inline_buttons": buttons})
+                await adb.update_target_settings(user_id, chat_id, {"inline_buttons": buttons})
                 await message.reply(f"✅ Inline buttons updated ({len(buttons)} rows)")
 
             client.settings_state[user_id] = None
-            target = get_target(user_id, chat_id)
+            target = await adb.get_target(user_id, chat_id)
             if target:
                 title = target.get("title", "Unknown")
                 await message.reply(
@@ -536,7 +569,7 @@ async def handle_all_text_input(client: Client, message: Message):
             if last_msg_id < 0 or skip < 0:
                 return await message.reply("❌ Values cannot be negative.")
 
-            job = create_job(
+            job = await adb.create_job(
                 user_id=user_id,
                 source_chat_id=job_state.get("source_chat_id"),
                 source_title=job_state.get("source_title", "Unknown"),
@@ -544,9 +577,18 @@ async def handle_all_text_input(client: Client, message: Message):
                 method=job_state.get("method"),
                 account_ids=job_state.get("selected_accounts"),
                 bot_id=job_state.get("bot_id"),
+                bot_ids=job_state.get("selected_bots"),
+                pool_strategy=(
+                    PoolStrategy.ROUND_ROBIN.value if job_state.get("round_robin")
+                    else PoolStrategy.CAPACITY.value
+                ),
                 last_msg_id=last_msg_id,
                 skip=skip,
                 future_new_posts=False,
+                account_strategy=(
+                    AccountStrategy.PARALLEL.value if job_state.get("parallel")
+                    else AccountStrategy.SEQUENTIAL.value
+                ),
                 name=f"Job {job_state.get('source_title', '')[:20]}"
             )
 
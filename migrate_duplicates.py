@@ -0,0 +1,86 @@
+# migrate_duplicates.py
+# One-off migration of the `duplicates` collection to the compact layout
+# (`duplicate_hashes`, 64-bit hashes). Safe to run several times.
+#
+#   python migrate_duplicates.py                  # copy only
+#   python migrate_duplicates.py --delete-source  # copy, then drop copied records
+#
+# Afterwards start bot/worker with DUP_STORAGE=compact.
+#
+# Local on-disk index of one target (core/dup_store.py):
+#   python migrate_duplicates.py --local-import USER_ID TARGET_CHAT_ID
+#   python migrate_duplicates.py --local-export USER_ID TARGET_CHAT_ID
+
+import argparse
+import asyncio
+import logging
+import sys
+
+from database import db, migrate_duplicates_to_compact
+from core.dup_store import local_dup_store
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - [MIGRATE] - [%(levelname)s] - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S"
+)
+logger = logging.getLogger("migrate_duplicates")
+logging.getLogger("pymongo").setLevel(logging.WARNING)
+
+
+async def transfer_local(args):
+    try:
+        if args.local_import:
+            user_id, target_chat_id = args.local_import
+            count = await local_dup_store.import_from_mongo(user_id, target_chat_id)
+            logger.info(f"✅ Imported {count} fingerprints into the local index")
+        else:
+            user_id, target_chat_id = args.local_export
+            count = await local_dup_store.export_to_mongo(user_id, target_chat_id)
+            logger.info(f"✅ Exported {count} new fingerprints to duplicate_hashes")
+    finally:
+        local_dup_store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert duplicates to compact hashed storage")
+    parser.add_argument("--batch", type=int, default=5000, help="records per round trip")
+    parser.add_argument(
+        "--delete-source", action="store_true",
+        help="remove records from `duplicates` once copied"
+    )
+    parser.add_argument(
+        "--local-import", nargs=2, type=int, metavar=("USER_ID", "TARGET_CHAT_ID"),
+        help="load a target's records from Mongo into its on-disk index"
+    )
+    parser.add_argument(
+        "--local-export", nargs=2, type=int, metavar=("USER_ID", "TARGET_CHAT_ID"),
+        help="write a target's on-disk index to Mongo (compact layout only)"
+    )
+    args = parser.parse_args()
+
+    try:
+        db.connect()
+    except Exception as e:
+        logger.error(f"❌ MongoDB connection failed: {e}")
+        sys.exit(1)
+
+    if args.local_import or args.local_export:
+        asyncio.run(transfer_local(args))
+        db.close()
+        return
+
+    before = db.duplicates.estimated_document_count()
+    logger.info(f"Migrating {before} duplicate records...")
+
+    processed = migrate_duplicates_to_compact(args.batch, args.delete_source)
+
+    logger.info(
+        f"✅ Done: {processed} processed, "
+        f"{db.duplicate_hashes.estimated_document_count()} in duplicate_hashes"
+    )
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
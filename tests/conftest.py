@@ -0,0 +1,10 @@
+# tests/conftest.py
+#
+# Run from the repository root:  python -m pytest -q tests
+# The modules under test import pyrogram (kurigram) and pymongo; tests that
+# need them are skipped when they are not installed.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,74 @@
+# tests/test_dup_cache.py
+#
+# DuplicateCache: lookups are answered locally between syncs; ids another
+# process records while the cache is in use are picked up by the next sync.
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+import core.dup_cache as dup_cache_module
+from core.dup_cache import DuplicateCache
+
+
+class FakeAdb:
+    def __init__(self):
+        self.records = {}         # key -> created_at
+        self.in_queries = 0
+        self.since_queries = 0
+
+    async def get_duplicate_count(self, user_id, target_chat_id):
+        return len(self.records)
+
+    async def get_duplicate_ids_page(self, user_id, target_chat_id, after=None, limit=0):
+        return sorted(k for k in self.records if after is None or k > after)
+
+    async def get_duplicate_ids_since(self, user_id, target_chat_id, since):
+        self.since_queries += 1
+        return [k for k, created in self.records.items() if created >= since]
+
+    async def get_new_unique_ids(self, user_id, target_chat_id, unique_ids):
+        self.in_queries += 1
+        return [uid for uid in unique_ids if uid not in self.records]
+
+
+def test_marks_from_other_writers_are_seen(monkeypatch):
+    from datetime import datetime, timezone
+
+    fake = FakeAdb()
+    monkeypatch.setattr(dup_cache_module, "adb", fake)
+
+    async def scenario():
+        fake.records["old"] = datetime.now(timezone.utc)
+        cache = DuplicateCache()
+        await cache.load(1, 5)
+        first = await cache.filter_new(1, 5, ["old", "a", "b"])
+        fake.records["a"] = datetime.now(timezone.utc)       # another process
+        cache._get(1, 5).next_sync = 0                       # sync interval up
+        second = await cache.filter_new(1, 5, ["a", "b", "c"])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == {"a", "b"}
+    assert second == {"b", "c"}
+    assert fake.since_queries == 1
+
+
+def test_lookups_between_syncs_stay_local(monkeypatch):
+    fake = FakeAdb()
+    monkeypatch.setattr(dup_cache_module, "adb", fake)
+
+    async def scenario():
+        cache = DuplicateCache()
+        await cache.load(1, 5)
+        for i in range(50):
+            assert await cache.filter_new(1, 5, [f"new{i}"]) == {f"new{i}"}
+            assert await cache.filter_new(1, 5, [f"a{i}", f"b{i}"]) == {f"a{i}", f"b{i}"}
+        return cache.report(1, 5)
+
+    report = asyncio.run(scenario())
+    assert fake.since_queries == 0
+    assert fake.in_queries == 0
+    assert report["local"] == report["lookups"] == 150
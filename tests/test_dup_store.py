@@ -0,0 +1,157 @@
+# tests/test_dup_store.py
+#
+# FingerprintIndex: fingerprints survive compaction and a reopen, a torn
+# log record is ignored, two processes on one directory see each other's
+# fingerprints, and LocalDuplicateStore writes every added id to Mongo
+# behind the index.
+
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+import core.dup_store as dup_store
+from config import Config
+from core.dup_store import FingerprintIndex, LocalDuplicateStore, RECORD
+
+
+def open_index(directory) -> FingerprintIndex:
+    index = FingerprintIndex(str(directory), 1, -100)
+    index.open()
+    return index
+
+
+def test_add_only_counts_new_fingerprints(tmp_path):
+    index = open_index(tmp_path)
+    assert index.add([5, 3, 5, -7]) == 3
+    assert index.add([3, 9]) == 1
+    assert len(index) == 4
+    assert 9 in index and -7 in index and 4 not in index
+    index.close()
+
+
+def test_compaction_merges_log_into_sorted_file(tmp_path):
+    index = open_index(tmp_path)
+    index.add([40, -2, 17])
+
+    asyncio.run(index.compact())
+    index.add([40, 1])            # 40 is already in the mapped file
+
+    assert os.path.getsize(index.log_path) == RECORD
+    assert list(index._view) == [-2, 17, 40]
+    assert len(index) == 4
+    assert all(fp in index for fp in (-2, 1, 17, 40))
+
+    asyncio.run(index.compact())
+    assert list(index._view) == [-2, 1, 17, 40]
+    assert os.path.getsize(index.log_path) == 0
+    index.close()
+
+
+def test_reopen_keeps_file_and_log(tmp_path):
+    index = open_index(tmp_path)
+    index.add(range(0, 1000, 3))
+    asyncio.run(index.compact())
+    index.add([1, 2])
+    index.close()
+
+    reopened = open_index(tmp_path)
+    assert len(reopened) == len(range(0, 1000, 3)) + 2
+    assert all(fp in reopened for fp in range(0, 1000, 3))
+    assert 1 in reopened and 2 in reopened and 4 not in reopened
+    reopened.close()
+
+
+def test_torn_log_record_is_ignored(tmp_path):
+    index = open_index(tmp_path)
+    index.add([11, 12])
+    index.close()
+    with open(index.log_path, "ab") as f:
+        f.write(b"\x01\x02\x03")          # crash in the middle of a write
+
+    reopened = open_index(tmp_path)
+    assert len(reopened) == 2
+    assert 11 in reopened and 12 in reopened
+    reopened.close()
+
+
+def test_store_compacts_and_writes_behind(tmp_path, monkeypatch):
+    written = []
+
+    class FakeAdb:
+        async def mark_many_as_forwarded(self, user_id, target_chat_id, unique_ids, ttl_days=0):
+            await asyncio.sleep(0)
+            written.append((target_chat_id, list(unique_ids), ttl_days))
+            return len(unique_ids)
+
+    monkeypatch.setattr(dup_store, "adb", FakeAdb())
+    monkeypatch.setattr(Config, "DUP_LOCAL_COMPACT_EVERY", 3)
+
+    async def scenario():
+        store = LocalDuplicateStore(str(tmp_path))
+        index = await store.open(1, -100, seed=False)
+        await store.add(1, -100, ["a", "b"], ttl_days=30)
+        await store.add(1, -100, ["b"])                 # nothing new: no write
+        await store.add(1, -100, ["c", "d"])            # 4 in the log → compact
+        await store.drain()
+        compacted = index._view is not None and len(index._view) == 4
+        new = store.filter_new(1, -100, list("abcde"))
+        count = store.count(1, -100)
+        store.close()
+        return compacted, new, count
+
+    compacted, new, count = asyncio.run(scenario())
+    assert compacted
+    assert new == {"e"}
+    assert count == 4
+    assert written == [(-100, ["a", "b"], 30), (-100, ["c", "d"], 0)]
+
+
+def test_two_indexes_on_one_directory(tmp_path):
+    # bot and worker (or two workers) on one target's files
+    a, b = open_index(tmp_path), open_index(tmp_path)
+
+    a.add([1, 2])
+    b.refresh()
+    assert 1 in b and 2 in b
+    assert b.add([2, 3]) == 1               # 2 came from the other process
+
+    # a never looked up 3; its compaction must not erase it
+    asyncio.run(a.compact())
+    b.add([4])
+    asyncio.run(a.compact())
+
+    b.refresh()
+    assert all(fp in b for fp in (1, 2, 3, 4))
+    assert b.add([1, 2, 3, 4]) == 0
+    a.close()
+    b.close()
+
+    reopened = open_index(tmp_path)
+    assert len(reopened) == 4
+    assert list(reopened._view) == [1, 2, 3, 4]
+    reopened.close()
+
+
+def test_compaction_elsewhere_mid_merge_is_kept(tmp_path, monkeypatch):
+    a, b = open_index(tmp_path), open_index(tmp_path)
+    a.add([10, 20])
+    merge = FingerprintIndex._write_merged
+
+    def other_compacts_first(self, snapshot):
+        if self is a:
+            b.add([30])
+            asyncio.run(b.compact())        # separate loop, as in another process
+        return merge(self, snapshot)
+
+    monkeypatch.setattr(FingerprintIndex, "_write_merged", other_compacts_first)
+    asyncio.run(a.compact())
+
+    a.refresh()
+    assert all(fp in a for fp in (10, 20, 30))
+    assert list(a._view) == [10, 20, 30]
+    assert not [p for p in os.listdir(tmp_path) if p.endswith(".tmp")]
+    a.close()
+    b.close()
@@ -0,0 +1,109 @@
+# tests/test_entities.py
+#
+# RichText keeps entity spans in code points and converts to Telegram's
+# UTF-16 offsets at the edges; characters outside the BMP (most emoji) are
+# two UTF-16 units but one code point.
+
+import pytest
+
+pytest.importorskip("pyrogram")
+
+from pyrogram.enums import MessageEntityType
+from pyrogram.types import MessageEntity
+
+from core.entities import RichText, parse_html
+
+
+def entity(kind, offset, length, **extra):
+    return MessageEntity(type=kind, offset=offset, length=length, **extra)
+
+
+def spans(rich: RichText):
+    return [(e.type, e.offset, e.length) for e in rich.to_entities()]
+
+
+def test_utf16_offsets_map_to_code_points_and_back():
+    text = "😀 bold 👍🏽 end"
+    bold = entity(MessageEntityType.BOLD, 3, 4)          # "bold" after 😀 + space
+    italic = entity(MessageEntityType.ITALIC, 8, 4)      # "👍🏽": 2 + 2 units
+    rich = RichText.from_message(text, [bold, italic])
+
+    assert [(s, e) for s, e, _ in rich.spans] == [(2, 6), (7, 9)]
+    assert rich.text[2:6] == "bold"
+    assert rich.text[7:9] == "👍🏽"
+    assert spans(rich) == [
+        (MessageEntityType.BOLD, 3, 4),
+        (MessageEntityType.ITALIC, 8, 4),
+    ]
+
+
+def test_to_entities_does_not_touch_the_source_entities():
+    bold = entity(MessageEntityType.BOLD, 2, 1)
+    rich = RichText.from_message("😀x", [bold])
+    edited = rich.edit([(0, 1, "ab")])
+
+    assert spans(edited) == [(MessageEntityType.BOLD, 2, 1)]
+    assert (bold.offset, bold.length) == (2, 1)
+
+
+def test_edit_shifts_entities_by_utf16_length():
+    rich = RichText.from_message("hi bold", [entity(MessageEntityType.BOLD, 3, 4)])
+    edited = rich.edit([(0, 2, "😀😀")])
+
+    assert edited.text == "😀😀 bold"
+    assert spans(edited) == [(MessageEntityType.BOLD, 5, 4)]
+
+
+def test_replacement_inside_an_entity_stretches_it():
+    rich = RichText.from_message("a cat b", [entity(MessageEntityType.BOLD, 2, 3)])
+    edited = rich.edit([(3, 4, "🐈‍⬛")])
+
+    assert edited.text == "a c🐈‍⬛t b"
+    # "c" + 🐈 (2) + ZWJ (1) + ⬛ (1) + "t"
+    assert spans(edited) == [(MessageEntityType.BOLD, 2, 6)]
+
+
+def test_entity_of_removed_text_is_dropped():
+    rich = RichText.from_message("see link here", [entity(MessageEntityType.URL, 4, 4)])
+    edited = rich.edit([(4, 9, "")])
+
+    assert edited.text == "see here"
+    assert edited.to_entities() == []
+
+
+def test_strip_moves_entities_with_the_text():
+    rich = RichText.from_message("  😀 x  ", [entity(MessageEntityType.BOLD, 5, 1)])
+    stripped = rich.strip()
+
+    assert stripped.text == "😀 x"
+    assert spans(stripped) == [(MessageEntityType.BOLD, 3, 1)]
+
+
+def test_out_of_range_entity_is_clamped():
+    rich = RichText.from_message("abc", [entity(MessageEntityType.BOLD, 1, 10)])
+    assert spans(rich) == [(MessageEntityType.BOLD, 1, 2)]
+
+
+def test_parse_html_offsets_after_emoji():
+    rich = parse_html('😀 <b>bold</b> <a href="https://t.me/x">🔗 link</a>')
+
+    assert rich.text == "😀 bold 🔗 link"
+    entities = rich.to_entities()
+    assert [(e.type, e.offset, e.length) for e in entities] == [
+        (MessageEntityType.BOLD, 3, 4),
+        (MessageEntityType.TEXT_LINK, 8, 7),
+    ]
+    assert entities[1].url == "https://t.me/x"
+
+
+def test_template_caption_inserted_with_its_own_entities():
+    template = parse_html("<i>{caption}</i> 😀")
+    caption = RichText.from_message("👍 ok", [entity(MessageEntityType.BOLD, 3, 2)])
+    start = template.text.index("{caption}")
+    merged = template.edit([(start, start + len("{caption}"), caption)])
+
+    assert merged.text == "👍 ok 😀"
+    assert spans(merged) == [
+        (MessageEntityType.ITALIC, 0, 5),
+        (MessageEntityType.BOLD, 3, 2),
+    ]
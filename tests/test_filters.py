@@ -0,0 +1,140 @@
+# tests/test_filters.py
+#
+# FilterProgram (one compiled trie regex per target) must decide exactly
+# like the matcher it replaced, which tested every word with `in`.
+
+import random
+import re
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pyrogram")
+
+from pyrogram.enums import MessageMediaType
+
+from core.filters import FilterProgram, compile_filters, trie_pattern
+
+
+def reference_check_text(text_content, settings):
+    """The former check_text_filters, word by word."""
+    text_lower = text_content.lower() if text_content else ""
+
+    block_words = settings.get("block_words", [])
+    if block_words and text_lower:
+        for word in block_words:
+            if word.lower() in text_lower:
+                return False, f"blocked_word:{word}"
+
+    if settings.get("whitelist_mode", False):
+        whitelist = settings.get("whitelist", [])
+        if not whitelist:
+            return False, "whitelist_empty"
+        if text_lower:
+            if not any(w.lower() in text_lower for w in whitelist):
+                return False, "whitelist_miss"
+        else:
+            return False, "whitelist_no_text"
+
+    return True, "ok"
+
+
+def reference_check_message(message, settings):
+    """The former should_process_message."""
+    if message.empty:
+        return False, "deleted"
+    if message.media and message.media.value not in settings.get("media_types", []):
+        return False, f"media_type:{message.media.value}"
+    return reference_check_text(message.caption or message.text or "", settings)
+
+
+ALPHABET = "abcAB ÉéİßẞΣσς.*("
+
+
+def random_word(rng, longest=4):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, longest)))
+
+
+def random_settings(rng):
+    return {
+        "block_words": [random_word(rng) for _ in range(rng.randint(0, 4))],
+        "whitelist_mode": rng.random() < 0.5,
+        "whitelist": [random_word(rng) for _ in range(rng.randint(0, 4))],
+        "media_types": rng.sample(["photo", "video", "document", "audio"], rng.randint(0, 4)),
+    }
+
+
+def same_decision(expected, actual, text):
+    ok, reason = expected
+    assert actual[0] == ok
+    assert actual[1].split(":")[0] == reason.split(":")[0]
+    if reason.startswith("blocked_word:"):
+        # Several block words may match; any of them is a correct reason
+        word = actual[1].split(":", 1)[1]
+        assert word.lower() in text.lower()
+
+
+def test_check_text_matches_reference():
+    rng = random.Random(7)
+    for _ in range(5000):
+        settings = random_settings(rng)
+        text = random_word(rng, 30) if rng.random() < 0.9 else ""
+        program = FilterProgram(settings)
+        same_decision(reference_check_text(text, settings), program.check_text(text), text)
+
+
+def test_check_message_matches_reference():
+    rng = random.Random(11)
+    media_types = [None, MessageMediaType.PHOTO, MessageMediaType.VIDEO, MessageMediaType.STICKER]
+    for _ in range(2000):
+        settings = random_settings(rng)
+        text = random_word(rng, 20)
+        message = SimpleNamespace(
+            empty=rng.random() < 0.05,
+            media=rng.choice(media_types),
+            caption=text if rng.random() < 0.5 else None,
+            text=text,
+        )
+        program = compile_filters(settings)
+        same_decision(
+            reference_check_message(message, settings), program.check_message(message), text
+        )
+
+
+def test_block_reason_names_the_configured_word():
+    program = FilterProgram({"block_words": ["Spam", "SPAMMER"]})
+    assert program.check_text("no spammers here") == (False, "blocked_word:Spam")
+
+
+def test_whitelist_hit_then_block_word_later_in_text():
+    settings = {"block_words": ["ad"], "whitelist_mode": True, "whitelist": ["news"]}
+    program = FilterProgram(settings)
+    assert program.check_text("news and an ad")[0] is False
+    assert program.check_text("news only")[0] is True
+    assert program.check_text("")[1] == "whitelist_no_text"
+
+
+def test_album_filters_caption_once_and_media_per_item():
+    program = FilterProgram({"media_types": ["photo"], "block_words": ["x"]})
+    photo = SimpleNamespace(empty=False, media=MessageMediaType.PHOTO, caption="hello")
+    video = SimpleNamespace(empty=False, media=MessageMediaType.VIDEO, caption=None)
+
+    assert program.filter_album([photo, video]) == ([photo], "ok")
+    photo.caption = "x marks"
+    assert program.filter_album([photo, video]) == ([], "blocked_word:x")
+
+
+def test_trie_pattern_prefixes():
+    words = ["car", "cart", "carbon", "cat", "dog"]
+    shortest = re.compile(trie_pattern(words))
+    longest = re.compile(trie_pattern(words, longest=True))
+    assert shortest.match("carbon").group() == "car"
+    assert longest.match("carbon").group() == "carbon"
+    assert longest.match("carton").group() == "cart"
+    assert shortest.match("bird") is None
+
+
+def test_compile_filters_caches_by_settings():
+    settings = {"block_words": ["a"], "media_types": ["photo"]}
+    assert compile_filters(settings) is compile_filters(dict(settings))
+    assert compile_filters(settings) is not compile_filters({"block_words": ["b"]})
@@ -0,0 +1,72 @@
+# tests/test_forwarder_batch.py
+#
+# FanOutRun.flush: batch mode forwards through the real Client signature
+# (a spec'd mock rejects keywords kurigram does not accept).
+
+import asyncio
+from unittest.mock import create_autospec
+
+import pytest
+
+pytest.importorskip("pyrogram")
+pytest.importorskip("pymongo")
+
+from pyrogram import Client
+
+from core.forwarder import FanOutRun, TargetLane
+
+
+class SpecClient:
+    """forward_messages checked against Client.forward_messages' signature."""
+
+    def __init__(self):
+        self.spec = create_autospec(Client.forward_messages)
+
+    async def forward_messages(self, *args, **kwargs):
+        return self.spec(self, *args, **kwargs)
+
+
+class FakeMessage:
+    def __init__(self, msg_id: int):
+        self.id = msg_id
+        self.media = None
+
+
+async def no_credit(self, shard, lane, count):
+    return True
+
+
+def flush(forward_tag: bool):
+    client = SpecClient()
+    target = {"chat_id": 5, "settings": {"delay": 0, "anti_duplicate": False,
+                                         "forward_tag": forward_tag}}
+    lane = TargetLane(target, 0)
+    assert lane.profile.batch_mode
+    run = FanOutRun(client=client, user_id=1, source_chat_id=100, lanes=[lane])
+    lane.pending = [FakeMessage(1), FakeMessage(2), FakeMessage(3)]
+
+    result = asyncio.run(run.flush(lane))
+    return result, lane, client.spec
+
+
+@pytest.fixture(autouse=True)
+def _no_credit(monkeypatch):
+    monkeypatch.setattr(FanOutRun, "_credit", no_credit)
+
+
+def test_batch_without_forward_tag_hides_the_sender():
+    result, lane, forward = flush(forward_tag=False)
+    assert result is True
+    assert forward.call_count == 1
+    assert forward.call_args.kwargs == {
+        "chat_id": 5, "from_chat_id": 100, "message_ids": [1, 2, 3], "hide_sender_name": True
+    }
+    assert lane.stats.forwarded == 3
+    assert lane.stats.errors == 0
+
+
+def test_batch_with_forward_tag_keeps_the_header():
+    result, lane, forward = flush(forward_tag=True)
+    assert result is True
+    assert forward.call_args.kwargs["hide_sender_name"] is False
+    assert lane.stats.errors == 0
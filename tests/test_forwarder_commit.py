@@ -0,0 +1,141 @@
+# tests/test_forwarder_commit.py
+#
+# FanOutRun._commit: the lane cursor is rewound only to a send that did not
+# go out, never to one that was delivered before the run had to stop.
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("pyrogram")
+pytest.importorskip("pymongo")
+
+import core.forwarder as forwarder
+from core.forwarder import Delivery, FanOutRun, TargetLane
+
+
+def make_run(cursor: int = 10):
+    target = {"chat_id": 5, "settings": {"delay": 0, "anti_duplicate": False, "batch_forward": False}}
+    lane = TargetLane(target, cursor)
+    run = FanOutRun(client=object(), user_id=1, source_chat_id=100, lanes=[lane])
+    return run, lane
+
+
+def finished(result=None, error=None, cancelled=False) -> asyncio.Future:
+    future = asyncio.get_running_loop().create_future()
+    if cancelled:
+        future.cancel()
+    elif error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+
+def commit(*sends, keep: int = 0, cursor: int = 10):
+    """Run _commit over (first_id, future factory) sends; (result, cursor, left)."""
+    async def scenario():
+        run, lane = make_run(cursor)
+        for first_id, make in sends:
+            lane.in_flight.append((first_id, make()))
+        result = await run._commit(lane, keep=keep)
+        return result, lane.cursor, [first_id for first_id, _ in lane.in_flight]
+    return asyncio.run(scenario())
+
+
+def test_delivered_sends_are_committed():
+    result, cursor, left = commit(
+        (8, lambda: finished(Delivery.DONE)),
+        (9, lambda: finished(Delivery.DONE)),
+    )
+    assert (result, cursor, left) == (True, 10, [])
+
+
+def test_sent_then_stop_keeps_the_cursor():
+    # Forward limit hit / all accounts sleeping after the message went out
+    result, cursor, left = commit(
+        (8, lambda: finished(Delivery.DONE)),
+        (9, lambda: finished(Delivery.DONE_STOP)),
+    )
+    assert result is False
+    assert cursor == 10
+    assert left == []
+
+
+def test_not_sent_rewinds_to_the_send():
+    result, cursor, left = commit(
+        (7, lambda: finished(Delivery.DONE)),
+        (8, lambda: finished(Delivery.NOT_SENT)),
+        (9, lambda: finished(Delivery.DONE)),
+    )
+    assert result is False
+    assert cursor == 7
+    assert left == [9]
+
+
+def test_cancelled_send_rewinds():
+    result, cursor, _ = commit((8, lambda: finished(cancelled=True)))
+    assert (result, cursor) == (False, 7)
+
+
+def test_failed_send_rewinds_and_raises():
+    with pytest.raises(RuntimeError):
+        commit((8, lambda: finished(error=RuntimeError("boom"))))
+
+
+def test_keep_leaves_running_sends_in_flight():
+    async def scenario():
+        run, lane = make_run()
+        pending = asyncio.get_running_loop().create_future()
+        lane.in_flight.append((8, finished(Delivery.DONE)))
+        lane.in_flight.append((9, pending))
+        result = await run._commit(lane, keep=1)
+        pending.cancel()
+        return result, [first_id for first_id, _ in lane.in_flight], lane.safe_cursor()
+
+    result, left, safe = asyncio.run(scenario())
+    assert result is True
+    assert left == [9]
+    assert safe == 8
+
+
+class FakeMessage:
+    def __init__(self, msg_id: int):
+        self.id = msg_id
+        self.media = None
+
+
+def test_deliver_reports_done_stop_when_credit_stops(monkeypatch):
+    sent = []
+
+    async def fake_send(client, source_chat_id, lane, message):
+        sent.append(message.id)
+
+    async def credit_exhausted(self, shard, lane, count):
+        return False
+
+    monkeypatch.setattr(forwarder, "_send_message", fake_send)
+    monkeypatch.setattr(FanOutRun, "_credit", credit_exhausted)
+
+    async def scenario():
+        run, lane = make_run(cursor=9)
+        lane.cursor = 9
+        outcome = await run._deliver(lane, [FakeMessage(9)])
+        return outcome, lane.cursor
+
+    outcome, cursor = asyncio.run(scenario())
+    assert sent == [9]
+    assert outcome is Delivery.DONE_STOP
+    assert cursor == 9
+
+
+def test_pause_stops_the_other_sends_in_flight():
+    from core.job_control import JobControl
+
+    async def scenario():
+        run, lane = make_run()
+        run.control = JobControl(1, "job")
+        await run._pause("All accounts sleeping or unavailable")
+        return run._stopped()
+
+    assert asyncio.run(scenario()) is True
@@ -0,0 +1,113 @@
+# tests/test_forwarder_pool.py
+#
+# Bot pool failover: a bot that was kicked from a target (or lost its
+# rights there) leaves that target to the other bots of the pool; the
+# message still goes out.
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("pyrogram")
+pytest.importorskip("pymongo")
+
+from pyrogram.errors import ChatWriteForbidden
+
+import core.forwarder as forwarder
+from core.forwarder import Delivery, FanOutRun, Shard, TargetLane
+
+
+class FakeMessage:
+    def __init__(self, msg_id: int):
+        self.id = msg_id
+        self.media = None
+        self.text = f"message {msg_id}"
+        self.entities = None
+        self.caption = None
+        self.caption_entities = None
+
+
+class BotClient:
+    def __init__(self, kicked_from=()):
+        self.kicked_from = set(kicked_from)
+        self.sent = []
+
+    async def _post(self, chat_id, ids):
+        if chat_id in self.kicked_from:
+            raise ChatWriteForbidden()
+        self.sent.append((chat_id, ids))
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._post(chat_id, [text])
+
+    async def forward_messages(self, chat_id, from_chat_id, message_ids, **kwargs):
+        await self._post(chat_id, list(message_ids))
+
+
+async def no_credit(self, shard, lane, count):
+    return True
+
+
+@pytest.fixture(autouse=True)
+def _no_credit(monkeypatch):
+    monkeypatch.setattr(FanOutRun, "_credit", no_credit)
+
+
+def make_run(monkeypatch, batch: bool, kicked: BotClient, other: BotClient, chat_id: int = 5):
+    # The kicked bot always has the first permit, so it is tried first
+    monkeypatch.setattr(
+        forwarder.rate_scheduler, "peek",
+        lambda client, chat_id, rate, cost=1.0: 0.0 if client is kicked else 1.0
+    )
+    target = {"chat_id": chat_id, "settings": {"delay": 0, "anti_duplicate": False,
+                                               "batch_forward": batch}}
+    lane = TargetLane(target, 0)
+    run = FanOutRun(
+        client=kicked, user_id=1, source_chat_id=100, lanes=[lane], job_id="job",
+        bot_id="b1", shards=[Shard(other, bot_id="b2")]
+    )
+    return run, lane
+
+
+def test_kicked_bot_hands_the_target_to_the_pool(monkeypatch):
+    kicked, other = BotClient(kicked_from={5}), BotClient()
+
+    async def scenario():
+        run, lane = make_run(monkeypatch, False, kicked, other)
+        first = await run._deliver(lane, [FakeMessage(1)])
+        second = await run._deliver(lane, [FakeMessage(2)])
+        return run, lane, first, second
+
+    run, lane, first, second = asyncio.run(scenario())
+    assert first is Delivery.DONE and second is Delivery.DONE
+    assert other.sent == [(5, ["message 1"]), (5, ["message 2"])]
+    assert run.shards[0].no_access == {5}
+    assert lane.failed == [] and lane.stats.forwarded == 2
+
+
+def test_kicked_bot_batch_is_forwarded_by_another_bot(monkeypatch):
+    kicked, other = BotClient(kicked_from={5}), BotClient()
+
+    async def scenario():
+        run, lane = make_run(monkeypatch, True, kicked, other)
+        lane.pending = [FakeMessage(1), FakeMessage(2)]
+        return await run.flush(lane), lane
+
+    result, lane = asyncio.run(scenario())
+    assert result is True
+    assert other.sent == [(5, [1, 2])]
+    assert lane.failed == []
+
+
+def test_kicked_from_every_bot_goes_to_the_retry_queue(monkeypatch):
+    kicked, other = BotClient(kicked_from={5}), BotClient(kicked_from={5})
+
+    async def scenario():
+        run, lane = make_run(monkeypatch, False, kicked, other)
+        outcome = await run._deliver(lane, [FakeMessage(1)])
+        return outcome, lane
+
+    outcome, lane = asyncio.run(scenario())
+    assert outcome is Delivery.DONE
+    assert lane.failed == [1]
+    assert "CHAT_WRITE_FORBIDDEN" in lane.failed_error
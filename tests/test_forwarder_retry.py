@@ -0,0 +1,67 @@
+# tests/test_forwarder_retry.py
+#
+# FanOutRun.retry_failed: when the source messages of due retry entries
+# can't be fetched, the entries are rescheduled and the run goes on.
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("pyrogram")
+pytest.importorskip("pymongo")
+
+from pyrogram.errors import FloodWait, ChannelPrivate
+
+import core.forwarder as forwarder
+from core.forwarder import FanOutRun, TargetLane
+
+
+class FakeAdb:
+    def __init__(self, due):
+        self.due = list(due)
+        self.calls = []
+
+    async def get_due_failed_sends(self, job_id, target_chat_id, limit=100):
+        due, self.due = self.due, []
+        return due
+
+    async def postpone_failed_sends(self, job_id, target_chat_id, msg_ids, seconds):
+        self.calls.append(("postpone", target_chat_id, list(msg_ids), seconds))
+
+    async def record_failed_sends(self, user_id, job_id, target_chat_id, msg_ids, error=""):
+        self.calls.append(("record", target_chat_id, list(msg_ids)))
+
+    async def resolve_failed_sends(self, job_id, target_chat_id, msg_ids):
+        self.calls.append(("resolve", target_chat_id, list(msg_ids)))
+
+
+class FailingReader:
+    def __init__(self, error):
+        self.error = error
+
+    async def get_messages(self, chat_id, message_ids):
+        raise self.error
+
+
+def retry(error, monkeypatch):
+    fake = FakeAdb([5, 6])
+    monkeypatch.setattr(forwarder, "adb", fake)
+    target = {"chat_id": 7, "settings": {"delay": 0, "anti_duplicate": False}}
+    lane = TargetLane(target, 10)
+    run = FanOutRun(client=FailingReader(error), user_id=1, source_chat_id=100,
+                    lanes=[lane], job_id="job")
+    result = asyncio.run(run.retry_failed(force=True))
+    return result, fake.calls, lane
+
+
+def test_flood_wait_postpones_the_entries(monkeypatch):
+    result, calls, lane = retry(FloodWait(value=42), monkeypatch)
+    assert result is True
+    assert calls == [("postpone", 7, [5, 6], 42)]
+    assert lane.cursor == 10
+
+
+def test_other_errors_count_an_attempt(monkeypatch):
+    result, calls, _ = retry(ChannelPrivate(), monkeypatch)
+    assert result is True
+    assert calls == [("record", 7, [5, 6])]
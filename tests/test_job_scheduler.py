@@ -0,0 +1,119 @@
+# tests/test_job_scheduler.py
+#
+# launch_once: one task per job; a RUNNING event that arrives while the
+# previous task is still finishing launches the job again afterwards.
+# JobScheduler: a re-armed job is launched when its dispatch_at is due, and
+# the fallback poll only asks for jobs whose dispatch_at fell due.
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from core.job_scheduler import launch_once
+
+
+def test_dispatch_while_finishing_relaunches_with_latest_document():
+    runs = []
+
+    async def start(job):
+        runs.append(job["rev"])
+        await asyncio.sleep(0.01)
+
+    async def scenario():
+        tasks = {}
+        launch_once(tasks, {"job_id": "j", "rev": 1}, start)
+        await asyncio.sleep(0)
+        launch_once(tasks, {"job_id": "j", "rev": 2}, start)
+        launch_once(tasks, {"job_id": "j", "rev": 3}, start)
+        await asyncio.sleep(0.05)
+        return runs
+
+    assert asyncio.run(scenario()) == [1, 3]
+
+
+def test_cancelled_task_is_not_relaunched():
+    runs = []
+
+    async def start(job):
+        runs.append(job["rev"])
+        await asyncio.sleep(1)
+
+    async def scenario():
+        tasks = {}
+        launch_once(tasks, {"job_id": "j", "rev": 1}, start)
+        await asyncio.sleep(0)
+        launch_once(tasks, {"job_id": "j", "rev": 2}, start)
+        tasks["j"].cancel()          # worker shutting down
+        await asyncio.sleep(0.01)
+        return runs, tasks["j"].cancelled()
+
+    assert asyncio.run(scenario()) == ([1], True)
+
+
+def test_rearmed_job_is_launched_when_due():
+    from datetime import datetime, timedelta, timezone
+
+    from core.job_scheduler import JobScheduler
+    from database import JobStatus
+
+    async def scenario():
+        scheduler = JobScheduler()
+        launched = []
+        scheduler._launch = launched.append
+        due = datetime.now(timezone.utc) + timedelta(seconds=0.05)
+        job = {"_id": 1, "job_id": "j", "status": JobStatus.RUNNING.value, "dispatch_at": due}
+        scheduler._dispatch(job)
+        before = list(launched)
+        await asyncio.sleep(0.1)
+        return before, launched
+
+    before, after = asyncio.run(scenario())
+    assert before == []
+    assert [job["job_id"] for job in after] == ["j"]
+
+
+def test_status_change_disarms_a_rearmed_job():
+    from datetime import datetime, timedelta, timezone
+
+    from core.job_scheduler import JobScheduler
+    from database import JobStatus
+
+    async def scenario():
+        scheduler = JobScheduler()
+        launched = []
+        scheduler._launch = launched.append
+        due = datetime.now(timezone.utc) + timedelta(seconds=0.05)
+        scheduler._dispatch({"_id": 1, "job_id": "j", "status": JobStatus.RUNNING.value,
+                             "dispatch_at": due})
+        scheduler._dispatch({"_id": 1, "job_id": "j", "status": JobStatus.PAUSED.value})
+        await asyncio.sleep(0.1)
+        return launched
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_poll_asks_for_jobs_that_fell_due(monkeypatch):
+    import core.job_scheduler as job_scheduler_module
+    from core.job_scheduler import JobScheduler
+
+    windows = []
+
+    class FakeAdb:
+        async def get_running_jobs(self, dispatched_since=None, dispatched_until=None):
+            windows.append((dispatched_since, dispatched_until))
+            return []
+
+    monkeypatch.setattr(job_scheduler_module, "adb", FakeAdb())
+
+    async def scenario():
+        scheduler = JobScheduler(poll_interval=0.01, full_scan_interval=3600)
+        poll = asyncio.ensure_future(scheduler._poll())
+        await asyncio.sleep(0.05)
+        poll.cancel()
+
+    asyncio.run(scenario())
+    assert windows
+    assert all(since is not None and until is not None and since < until
+               for since, until in windows)
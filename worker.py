@@ -6,7 +6,7 @@ import asyncio
 import logging
 import signal
 import sys
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, List, Tuple
 
 from pyrogram import Client
 from pyrogram.errors import (
@@ -18,20 +18,20 @@ from pyrogram.enums import ParseMode
 from config import Config
 from database import (
     db,
-    get_active_jobs,
-    get_job,
-    set_job_status,
-    update_job_stats,
-    get_target,
-    get_bot,
-    get_account,
-    get_next_available_account,
-    wake_sleeping_accounts,
+    adb,
+    get_target_cursors,
     JobStatus,
     MethodType,
     AccountStatus,
+    AccountStrategy,
+    PoolStrategy,
 )
-from core.forwarder import forward_messages
+from core.forwarder import forward_to_targets, Shard
+from core.loop_monitor import loop_monitor
+from core.stats_buffer import stats_buffer
+from core.job_control import job_controls
+from core.job_scheduler import job_scheduler, launch_once
+from core.job_lease import JobLease
 
 # ==================== LOGGING ====================
 logging.basicConfig(
@@ -110,8 +110,7 @@ async def get_user_client(account_doc: dict) -> Optional[Client]:
         return client
     except (UserDeactivated, AuthKeyUnregistered, SessionRevoked) as e:
         logger.error(f"❌ Account {account_id} session invalid: {e}")
-        from database import set_account_status
-        set_account_status(
+        await adb.set_account_status(
             account_doc["user_id"],
             account_id,
             AccountStatus.ERROR.value,
@@ -123,6 +122,22 @@ async def get_user_client(account_doc: dict) -> Optional[Client]:
         return None
 
 
+async def next_account_client(
+    user_id: int,
+    account_ids: List[str],
+    strategy: str
+) -> Tuple[Optional[Client], Optional[str]]:
+    """
+    Rotation callback for the forwarder: the first available account of
+    `account_ids` whose client starts.
+    """
+    for account in await adb.get_available_accounts(user_id, account_ids):
+        client = await get_user_client(account)
+        if client:
+            return client, account["account_id"]
+    return None, None
+
+
 async def close_all_clients():
     for key, client in list(ACTIVE_CLIENTS.items()):
         try:
@@ -138,144 +153,195 @@ async def close_all_clients():
 async def run_job(job: dict):
     job_id = job["job_id"]
     user_id = job["user_id"]
-    method = job.get("method")
-    source_chat_id = job["source_chat_id"]
-    target_chat_ids = job.get("target_chat_ids", [])
-    last_msg_id = job.get("last_msg_id", 0)
-    current_msg_id = job.get("current_msg_id", job.get("skip", 0))
-    account_ids = job.get("account_ids", [])
-    bot_id = job.get("bot_id")
-    strategy = job.get("account_strategy", "sequential")
-
-    logger.info(
-        f"🚀 Job {job_id} started | method={method} | "
-        f"from msg {current_msg_id} → {last_msg_id}"
-    )
+    control = job_controls.register(user_id, job_id)
+    lease = JobLease(user_id, job_id, control)
 
     try:
+        # ---------- Claim (another worker may be running it) ----------
+        # Settings come from the claimed document: the dispatched one may
+        # predate edits made while the job was queued
+        job = await lease.acquire()
+        if not job:
+            logger.info(f"Job {job_id} not running or owned by another worker, skipping.")
+            return
+
+        method = job.get("method")
+        source_chat_id = job["source_chat_id"]
+        target_chat_ids = job.get("target_chat_ids", [])
+        last_msg_id = job.get("last_msg_id", 0)
+        current_msg_id = job.get("current_msg_id", job.get("skip", 0))
+        account_ids = job.get("account_ids", [])
+        bot_id = job.get("bot_id")
+        strategy = job.get("account_strategy", "sequential")
+        logger.info(
+            f"🚀 Job {job_id} started | method={method} | "
+            f"from msg {current_msg_id} → {last_msg_id}"
+        )
+
         # ---------- Get Client ----------
         client = None
         current_account_id = None
+        shards: List[Shard] = []
 
         if method == MethodType.BOT.value:
-            bot = get_bot(user_id, bot_id)
-            if not bot or bot.get("status") != "active":
-                set_job_status(user_id, job_id, JobStatus.FAILED.value, "Bot not available or disabled")
+            # Bot pool: every active bot of the job sends (clients are cached
+            # in ACTIVE_CLIENTS); a job with one bot is a pool of one
+            pool: List[Shard] = []
+            for pool_bot_id in job.get("bot_ids") or [bot_id]:
+                bot = await adb.get_bot(user_id, pool_bot_id)
+                if not bot or bot.get("status") != "active":
+                    logger.warning(f"Job {job_id}: bot {pool_bot_id} not available or disabled")
+                    continue
+                bot_client = await get_bot_client(bot)
+                if bot_client:
+                    pool.append(Shard(bot_client, bot_id=pool_bot_id))
+            if not pool:
+                await adb.set_job_status(user_id, job_id, JobStatus.FAILED.value, "No bot available or could not start bot client")
                 return
 
-            client = await get_bot_client(bot)
-            if not client:
-                set_job_status(user_id, job_id, JobStatus.FAILED.value, "Could not start bot client")
-                return
+            client, bot_id, shards = pool[0].client, pool[0].bot_id, pool[1:]
 
         elif method == MethodType.USER.value:
             # Wake sleeping accounts
-            wake_sleeping_accounts(user_id)
+            await adb.wake_sleeping_accounts(user_id)
 
-            account = get_next_available_account(user_id, account_ids, strategy)
+            account = await adb.get_next_available_account(user_id, account_ids, strategy)
             if not account:
-                set_job_status(user_id, job_id, JobStatus.PAUSED.value, "No available accounts")
+                await adb.set_job_status(user_id, job_id, JobStatus.PAUSED.value, "No available accounts")
                 logger.warning(f"Job {job_id}: No available accounts → Paused")
                 return
 
             current_account_id = account["account_id"]
             client = await get_user_client(account)
             if not client:
-                set_job_status(user_id, job_id, JobStatus.PAUSED.value, "Account client failed")
+                await adb.set_job_status(user_id, job_id, JobStatus.PAUSED.value, "Account client failed")
                 return
+
+            if strategy == AccountStrategy.PARALLEL.value:
+                # Every other available account sends alongside
+                for other in await adb.get_available_accounts(user_id, account_ids):
+                    if other["account_id"] == current_account_id:
+                        continue
+                    other_client = await get_user_client(other)
+                    if other_client:
+                        shards.append(Shard(other_client, account_id=other["account_id"]))
+                logger.info(f"Job {job_id}: sharded over {len(shards) + 1} account(s)")
         else:
-            set_job_status(user_id, job_id, JobStatus.FAILED.value, f"Unknown method: {method}")
+            await adb.set_job_status(user_id, job_id, JobStatus.FAILED.value, f"Unknown method: {method}")
             return
 
-        # ---------- Process each Target ----------
-        for target_chat_id in target_chat_ids:
-            # Check if job was paused/cancelled meanwhile
-            fresh = get_job(user_id, job_id)
-            if not fresh or fresh.get("status") != JobStatus.RUNNING.value:
-                logger.info(f"Job {job_id} is no longer RUNNING. Stopping.")
-                return
+        # ---------- Process all Targets in one pass ----------
+        # Check if job was paused/cancelled meanwhile
+        fresh = await adb.get_job(user_id, job_id)
+        if not fresh or fresh.get("status") != JobStatus.RUNNING.value:
+            logger.info(f"Job {job_id} is no longer RUNNING. Stopping.")
+            return
 
-            target = get_target(user_id, target_chat_id)
+        targets = []
+        for target_chat_id in target_chat_ids:
+            target = await adb.get_target(user_id, target_chat_id)
             if not target:
                 logger.warning(f"Target {target_chat_id} not found, skipping")
                 continue
+            targets.append(target)
 
-            logger.info(f"Job {job_id} → Target: {target.get('title')} ({target_chat_id})")
-
-            # Call the core engine
-            await forward_messages(
-                client=client,
-                user_id=user_id,
-                source_chat_id=source_chat_id,
-                target=target,
-                last_msg_id=last_msg_id,
-                skip=current_msg_id,
-                progress_message=None,
-                cancel_flag=None,
-                job_id=job_id,
-                account_id=current_account_id,
-                account_ids=account_ids,
-                strategy=strategy
-            )
-
-        # All targets done
-        set_job_status(user_id, job_id, JobStatus.COMPLETED.value)
+        logger.info(
+            f"Job {job_id} → {len(targets)} target(s): "
+            f"{', '.join(str(t.get('title')) for t in targets)}"
+        )
+
+        # Call the core engine: source is fetched once, fanned out to every target
+        await forward_to_targets(
+            client=client,
+            user_id=user_id,
+            source_chat_id=source_chat_id,
+            targets=targets,
+            last_msg_id=last_msg_id,
+            skip=current_msg_id,
+            progress_message=None,
+            cancel_flag=None,
+            job_id=job_id,
+            account_id=current_account_id,
+            account_ids=account_ids,
+            strategy=strategy,
+            get_new_client_callback=next_account_client if method == MethodType.USER.value else None,
+            target_cursors=get_target_cursors(fresh),
+            control=control,
+            bot_id=bot_id if method == MethodType.BOT.value else None,
+            shards=shards,
+            pool_strategy=job.get("pool_strategy", PoolStrategy.CAPACITY.value)
+        )
+
+        if control.stopped:
+            logger.info(f"Job {job_id} stopped ({control.reason})")
+            return
+        fresh = await adb.get_job(user_id, job_id)
+        if not fresh or fresh.get("status") != JobStatus.RUNNING.value:
+            logger.info(f"Job {job_id} stopped with status {fresh and fresh.get('status')}")
+            return
+
+        # All targets done; a future_new_posts job runs its next pass later
+        if fresh.get("future_new_posts"):
+            await adb.rearm_job(user_id, job_id, Config.FUTURE_POSTS_RECHECK_SECONDS)
+            logger.info(f"Job {job_id} pass done, next in {Config.FUTURE_POSTS_RECHECK_SECONDS:.0f}s")
+            return
+        await adb.set_job_status(user_id, job_id, JobStatus.COMPLETED.value)
         logger.info(f"✅ Job {job_id} completed")
 
     except asyncio.CancelledError:
-        logger.info(f"Job {job_id} cancelled")
-        set_job_status(user_id, job_id, JobStatus.CANCELLED.value)
+        # Worker shutting down: the job stays RUNNING and its lease is
+        # released, so the next worker resumes each target at its checkpoint
+        logger.info(f"Job {job_id} interrupted, will resume from its checkpoint")
+        raise
     except Exception as e:
         logger.exception(f"Job {job_id} crashed: {e}")
-        set_job_status(user_id, job_id, JobStatus.FAILED.value, str(e))
+        await adb.set_job_status(user_id, job_id, JobStatus.FAILED.value, str(e))
+    finally:
+        await lease.release()
+        job_controls.unregister(job_id, control)
 
 
 # ==================== MAIN LOOP ====================
 
 # worker.py → worker_loop
+# Jobs are started by core.job_scheduler (change stream / indexed poll);
+# this loop only does account housekeeping.
+
+PAUSED_RECHECK_SECONDS = 60
+
+
+def launch_job(job: dict) -> None:
+    launch_once(CURRENT_TASKS, job, run_job)
+
 
 async def worker_loop():
     logger.info("Worker loop started")
+    loop = asyncio.get_running_loop()
+    last_paused_check = 0.0
 
     while RUNNING:
         try:
             # 1. Wake sleeping accounts
-            woken = wake_sleeping_accounts()
+            woken = await adb.wake_sleeping_accounts()
             if woken > 0:
                 logger.info(f"Woke up {woken} account(s)")
 
-            # 2. Auto-resume PAUSED jobs if accounts are now available
-            from database import get_user_jobs, JobStatus
-            paused_jobs = []
-            # You can make a helper get_paused_jobs() later
-            all_jobs = get_active_jobs()  # currently only RUNNING + PENDING
-            # Better: create get_jobs_by_status
-
-            # For now simple version:
-            from database import db
-            paused = list(db.forward_jobs.find({"status": JobStatus.PAUSED.value}))
-            
-            for job in paused:
-                user_id = job["user_id"]
-                account_ids = job.get("account_ids", [])
-                
-                if job.get("method") == "user" and account_ids:
-                    available = get_next_available_account(user_id, account_ids)
-                    if available:
-                        logger.info(f"Resuming paused job {job['job_id']} (accounts available)")
-                        set_job_status(user_id, job["job_id"], JobStatus.RUNNING.value)
-
-            # 3. Normal running jobs processing (same as before)
-            jobs = get_active_jobs()
-            running_jobs = [j for j in jobs if j.get("status") == JobStatus.RUNNING.value]
-
-            for job in running_jobs:
-                job_id = job["job_id"]
-                if job_id in CURRENT_TASKS and not CURRENT_TASKS[job_id].done():
-                    continue
+            # 2. Auto-resume PAUSED jobs if accounts are now available.
+            #    Only worth a scan when accounts woke up (or once a minute).
+            if woken > 0 or loop.time() - last_paused_check >= PAUSED_RECHECK_SECONDS:
+                last_paused_check = loop.time()
+                paused = await adb.get_jobs_by_status(JobStatus.PAUSED.value)
+
+                for job in paused:
+                    user_id = job["user_id"]
+                    account_ids = job.get("account_ids", [])
 
-                task = asyncio.create_task(run_job(job))
-                CURRENT_TASKS[job_id] = task
+                    if job.get("method") == "user" and account_ids:
+                        available = await adb.get_next_available_account(user_id, account_ids)
+                        if available:
+                            logger.info(f"Resuming paused job {job['job_id']} (accounts available)")
+                            await adb.set_job_status(user_id, job["job_id"], JobStatus.RUNNING.value)
+                            job_scheduler.wake()
 
             # Cleanup finished
             finished = [jid for jid, t in CURRENT_TASKS.items() if t.done()]
@@ -301,7 +367,15 @@ async def main():
         sys.exit(1)
 
     logger.info("Starting Forwarding Worker...")
-    await worker_loop()
+    asyncio.create_task(loop_monitor.run())
+    asyncio.create_task(stats_buffer.run())
+    asyncio.create_task(job_controls.watch())
+    asyncio.create_task(job_scheduler.run(launch_job))
+    try:
+        await worker_loop()
+    finally:
+        # Shutdown: don't lose buffered counters / cursors
+        await stats_buffer.flush()
 
 
 if __name__ == "__main__":